@@ -13,21 +13,63 @@ Usage from Python:
     blob_data, key = blob_crypto.encrypt_blob(patch_data, pat_sha224)
     patch_data = blob_crypto.decrypt_blob(blob_data, key, patchblob1_sha224)
 
+Streaming decode (decode_blob / decode_blob_file):
+    patch_data = blob_crypto.decode_blob_file(blob_path, key, patchblob1_sha224, pat_sha224)
+    The blob is read in chunks (mmap for files) through the outer LZMA
+    decompressor, base64 and Fernet (HMAC-SHA256 + AES-CBC) stages and the
+    inner LZMA decompressor, hashing input and output on the way, so the
+    decompressed token and the Fernet plaintext are never held whole.
+
 Usage from JavaScript:
     const result = execSync('python3 blob_crypto.py encrypt <input_file> <output_file> <pat_sha224>');
     const result = execSync('python3 blob_crypto.py decrypt <input_file> <output_file> <key>');
+
+Worker mode (one warm process for many blobs):
+    python3 blob_crypto.py serve [--workers N]
+    Reads one JSON request per line on stdin and writes one JSON response
+    per line on stdout, tagged with the request's "id".  Blobs and patches
+    are given as file paths ("input" / "output") or base64 ("data"):
+        {"id": 1, "op": "encrypt", "input": "p.bps", "output": "p.blob", "pat_sha224": "..."}
+        {"id": 2, "op": "decrypt", "input": "p.blob", "key": "...", "blob_sha224": "...", "pat_sha224": "..."}
+        {"id": 3, "op": "info", "data": "<base64 blob>", "key": "...", "blob_sha224": "..."}
+        {"id": 4, "op": "ping"}
+    Responses carry "success" plus the fields the matching CLI command
+    prints (encrypt: "metadata"), or "error" and "error_type".  With
+    --workers N requests run on N threads and responses come back in
+    completion order.  The process exits at end of input.
 """
 
 import sys
 import os
+import io
+import mmap
 import base64
+import binascii
 import hashlib
 import lzma
 import json
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
+import threading
+import concurrent.futures
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+CHUNK_SIZE = 1 << 18           # blob bytes fed to the decoder per step
+OUTPUT_CHUNK = 1 << 20         # largest piece a decompressor may return per call
+STAGE_LIMIT = 4 << 20          # Fernet tokens up to this size are decompressed whole first
+FERNET_VERSION = 0x80
+FERNET_HEADER = 1 + 8 + 16     # version, timestamp, IV
+FERNET_HMAC = 32
+URLSAFE_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+STANDARD_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+
+class BlobHashError(ValueError):
+    """The blob's SHA-224 is not the expected patchblob1_sha224"""
+    pass
+
 def encrypt_blob(patch_data, pat_sha224):
     """
     Encrypt patch data to create blob.
@@ -96,47 +138,346 @@ def decrypt_blob(blob_data, patchblob1_key, patchblob1_sha224, pat_sha224=None,
     Raises:
         ValueError: If hashes don't match
     """
-    # Verify blob hash
-    actual_blob_hash = hashlib.sha224(blob_data).hexdigest()
-    if actual_blob_hash != patchblob1_sha224:
-        raise ValueError(f"Blob hash mismatch: expected {patchblob1_sha224}, got {actual_blob_hash}")
-    
-    # Step 1: Decompress blob
-    decomp_blob = lzma.decompress(blob_data)
-    
-    # Step 2: Decrypt with Fernet
-    # Decode the double-encoded key
-    key = base64.urlsafe_b64decode(patchblob1_key.encode('ascii'))
-    frn = Fernet(key)
-    decrypted_blob = frn.decrypt(decomp_blob)
-    
-    # Step 3: Decompress decrypted data
-    # Auto-detect format: Python format vs JavaScript format
-    if detect_format:
+    # One streaming pass: the blob is hashed while it is decompressed and
+    # decrypted, and only the patch is kept whole (see decode_blob)
+    return decode_blob(blob_data, patchblob1_key, patchblob1_sha224, pat_sha224, detect_format)
+
+
+class _LzmaStream:
+    """
+    lzma.decompress() in pieces: concatenated streams are decoded in turn
+    and trailing garbage after the first stream is ignored, as
+    lzma.decompress() does.  Each call returns at most OUTPUT_CHUNK bytes
+    to ``sink`` at a time.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.streams = 0
+        self._dec = lzma.LZMADecompressor()
+        self._ignore = False
+
+    def feed(self, data):
+        if self._ignore:
+            return
+        while True:
+            if self._dec.eof:
+                data = self._dec.unused_data + bytes(data)
+                if not data:
+                    return
+                self._dec = lzma.LZMADecompressor()
+                try:
+                    out = self._dec.decompress(data, max_length=OUTPUT_CHUNK)
+                except lzma.LZMAError:
+                    self._ignore = True
+                    return
+            else:
+                out = self._dec.decompress(data, max_length=OUTPUT_CHUNK)
+            data = b''
+            if self._dec.eof:
+                self.streams += 1
+            if out:
+                self.sink(out)
+            if not self._dec.eof and self._dec.needs_input:
+                return
+
+    def finish(self):
+        if not self._ignore and not self._dec.eof:
+            raise lzma.LZMAError('Compressed data ended before the end-of-stream marker was reached')
+
+
+class _Base64Stream:
+    """Base64 decode in pieces; characters outside the alphabet are dropped"""
+
+    def __init__(self, sink, urlsafe):
+        self.sink = sink
+        self.urlsafe = urlsafe
+        alphabet = URLSAFE_ALPHABET if urlsafe else STANDARD_ALPHABET
+        self._drop = bytes(b for b in range(256) if b not in alphabet)
+        self._rest = b''
+
+    def feed(self, data):
+        data = self._rest + bytes(data).translate(None, self._drop)
+        usable = len(data) - len(data) % 4
+        self._rest = data[usable:]
+        if usable:
+            self.sink(self._decode(data[0:usable]))
+
+    def _decode(self, data):
+        if self.urlsafe:
+            return base64.urlsafe_b64decode(data)
+        return base64.b64decode(data)
+
+    def finish(self):
+        if self._rest:
+            if len(self._rest) == 1:
+                raise binascii.Error('Truncated base64 data')
+            self.sink(self._decode(self._rest + b'=' * (-len(self._rest) % 4)))
+            self._rest = b''
+
+
+class _FernetStream:
+    """
+    Fernet.decrypt() in pieces.  The HMAC covers the whole token, so the
+    plaintext handed to ``sink`` is only trustworthy once finish() has
+    returned; callers discard their output when it raises InvalidToken.
+    """
+
+    def __init__(self, sink, key):
+        key = base64.urlsafe_b64decode(key)
+        if len(key) != 32:
+            raise ValueError('Fernet key must be 32 url-safe base64-encoded bytes.')
+        self.sink = sink
+        self._hmac = hmac.HMAC(key[0:16], hashes.SHA256())
+        self._key = key[16:]
+        self._head = b''
+        self._tail = b''
+        self._decryptor = None
+        self._unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+
+    def feed(self, data):
+        data = bytes(data)
+        if self._decryptor is None:
+            self._head += data
+            if len(self._head) < FERNET_HEADER + FERNET_HMAC:
+                return
+            if self._head[0] != FERNET_VERSION:
+                raise InvalidToken
+            iv = self._head[9:FERNET_HEADER]
+            self._decryptor = Cipher(algorithms.AES(self._key), modes.CBC(iv)).decryptor()
+            self._hmac.update(self._head[0:FERNET_HEADER])
+            data = self._head[FERNET_HEADER:]
+            self._head = None
+        # The last 32 bytes seen so far may be the HMAC
+        data = self._tail + data
+        self._tail = data[-FERNET_HMAC:]
+        body = data[0:-FERNET_HMAC]
+        if body:
+            self._hmac.update(body)
+            self.sink(self._unpadder.update(self._decryptor.update(body)))
+
+    def finish(self):
+        if self._decryptor is None:
+            raise InvalidToken
         try:
-            # Try Python format first (single LZMA decompress)
-            decoded_blob = lzma.decompress(decrypted_blob)
-        except Exception as e1:
-            # Might be JavaScript format (base64-encoded LZMA data)
-            try:
-                # JavaScript Fernet returns base64 of the original data
-                # If JavaScript passed base64(compressed_patch), we get that back
-                # So we need to decode and then decompress
-                lzma_data = base64.b64decode(decrypted_blob)
-                decoded_blob = lzma.decompress(lzma_data)
-            except Exception as e2:
-                raise ValueError(f"Cannot decode blob. Python format failed: {e1}, JavaScript format failed: {e2}")
-    else:
-        # Standard Python format
-        decoded_blob = lzma.decompress(decrypted_blob)
-    
-    # Verify patch hash if provided
-    if pat_sha224:
-        actual_pat_hash = hashlib.sha224(decoded_blob).hexdigest()
-        if actual_pat_hash != pat_sha224:
-            raise ValueError(f"Patch hash mismatch: expected {pat_sha224}, got {actual_pat_hash}")
-    
-    return decoded_blob
+            self._hmac.verify(self._tail)
+        except InvalidSignature:
+            raise InvalidToken
+        try:
+            rest = self._unpadder.update(self._decryptor.finalize())
+            rest += self._unpadder.finalize()
+        except ValueError:
+            raise InvalidToken
+        self.sink(rest)
+
+
+class BlobDecoder:
+    """
+    Incremental decrypt_blob(): feed the blob with update(), then finish()
+    returns the patch.  ``blob_sha224`` / ``pat_sha224`` hold the digests of
+    the input and output once finish() has run.  A key of None (or '' or
+    'none') means the blob is LZMA only, as some resource blobs are.
+
+    Only the patch is kept whole (in a BytesIO, returned without a copy);
+    every other stage holds at most a chunk.  The exception is a Fernet
+    token of up to STAGE_LIMIT bytes: it is decompressed whole and only
+    decrypted in finish(), once the outer LZMA decompressor is gone, so a
+    small blob never has two LZMA dictionaries (8 MB each at the default
+    preset) allocated at once.  A longer token is streamed as above.
+    """
+
+    def __init__(self, patchblob1_key, detect_format=True, max_size=None):
+        self.detect_format = detect_format
+        self.max_size = max_size
+        self.blob_size = 0
+        self.patch_size = 0
+        self.blob_sha224 = None
+        self.pat_sha224 = None
+        self.format = None
+        self._blob_hash = hashlib.sha224()
+        self._pat_hash = hashlib.sha224()
+        self._out = io.BytesIO()
+        self._pending = b''
+        self._inner = None
+        self._inner_b64 = None
+        self._inner_error = None
+        if patchblob1_key in (None, '', 'none'):
+            self._fernet = None
+            self._token = None
+            self._outer = _LzmaStream(self._output)
+            self.format = 'lzma'
+        else:
+            key = base64.urlsafe_b64decode(patchblob1_key.encode('ascii'))
+            self._fernet = _FernetStream(self._plaintext, key)
+            self._token = _Base64Stream(self._fernet.feed, urlsafe=True)
+            self._outer = _LzmaStream(self._stage)
+        self._staged = []
+        self._staged_size = 0
+
+    def _stage(self, data):
+        if self._staged is None:
+            self._token.feed(data)
+            return
+        self._staged.append(data)
+        self._staged_size += len(data)
+        if self._staged_size > STAGE_LIMIT:
+            self._flush_staged()
+
+    def _flush_staged(self):
+        # Feed the held token on, releasing each piece as it goes
+        staged, self._staged = self._staged, None
+        staged.reverse()
+        while staged:
+            self._token.feed(staged.pop())
+
+    def _output(self, data):
+        self.patch_size += len(data)
+        if self.max_size is not None and self.patch_size > self.max_size:
+            raise ValueError(f"Decoded data is larger than {self.max_size} bytes")
+        self._pat_hash.update(data)
+        self._out.write(data)
+
+    def _plaintext(self, data):
+        # Until the HMAC is checked in finish(), a wrong key looks like bad
+        # LZMA data: keep the first error and report it only if the token
+        # turns out to be authentic
+        if self._inner_error is not None:
+            return
+        try:
+            self._decode_plaintext(data)
+        except (ValueError, lzma.LZMAError, binascii.Error) as e:
+            self._inner_error = e
+
+    def _decode_plaintext(self, data):
+        if self._inner is None:
+            # Python blobs hold LZMA data (binary header), JavaScript blobs
+            # base64 text of it; decide once 16 bytes have arrived
+            self._pending += data
+            if len(self._pending) < 16:
+                return
+            data, self._pending = self._pending, b''
+            self._inner = _LzmaStream(self._output)
+            if self.detect_format and not data[0:16].translate(None, STANDARD_ALPHABET + b'=\r\n'):
+                self.format = 'javascript'
+                self._inner_b64 = _Base64Stream(self._inner.feed, urlsafe=False)
+            else:
+                self.format = 'python'
+        if self._inner_b64 is not None:
+            self._inner_b64.feed(data)
+        else:
+            self._inner.feed(data)
+
+    def update(self, chunk):
+        self.blob_size += len(chunk)
+        self._blob_hash.update(chunk)
+        self._outer.feed(chunk)
+
+    def hash_only(self, chunk):
+        """Hash input without decoding it (the rest of a blob after an error)"""
+        self.blob_size += len(chunk)
+        self._blob_hash.update(chunk)
+
+    def finish_hash(self):
+        self.blob_sha224 = self._blob_hash.hexdigest()
+        return self.blob_sha224
+
+    def finish(self):
+        self.finish_hash()
+        self._outer.finish()
+        if self._fernet is not None:
+            self._outer = None
+            if self._staged is not None:
+                self._flush_staged()
+            self._token.finish()
+            self._fernet.finish()
+            if self._inner_error is not None:
+                raise self._inner_error
+            if self._inner is None:
+                # Plaintext shorter than the format check
+                data, self._pending = self._pending, b''
+                self._inner = _LzmaStream(self._output)
+                self.format = 'python'
+                self._inner.feed(data)
+            if self._inner_b64 is not None:
+                self._inner_b64.finish()
+            self._inner.finish()
+        self.pat_sha224 = self._pat_hash.hexdigest()
+        out, self._out = self._out, None
+        return out.getvalue()
+
+
+def decode_blob(blob_data, patchblob1_key, patchblob1_sha224=None, pat_sha224=None, detect_format=True,
+                info=None, chunk_size=CHUNK_SIZE, max_size=None):
+    """
+    Streaming decrypt_blob(): one pass over ``blob_data`` (any bytes-like
+    object, e.g. an mmap) that decompresses, decrypts and hashes as it goes.
+
+    Args:
+        blob_data: Encrypted blob data (bytes, bytearray, memoryview, mmap)
+        patchblob1_key (str): Double-encoded base64 key (None for LZMA-only blobs)
+        patchblob1_sha224 (str, optional): Expected SHA-224 of the blob
+        pat_sha224 (str, optional): Expected SHA-224 of the decoded patch
+        detect_format (bool): Auto-detect JavaScript vs Python blob format
+        info (dict, optional): Filled with blob_sha224, blob_size, pat_sha224,
+            patch_size and format (as far as decoding got)
+
+    Returns:
+        bytes: Decrypted patch data
+
+    Raises:
+        BlobHashError: If the blob hash doesn't match (checked first, even
+            when the blob could not be decoded)
+        ValueError: If the blob can't be decoded or the patch hash doesn't match
+        cryptography.fernet.InvalidToken: Wrong key or damaged token
+    """
+    decoder = BlobDecoder(patchblob1_key, detect_format=detect_format, max_size=max_size)
+    # Chunks are views of blob_data, released before returning so an mmap
+    # can be closed
+    with memoryview(blob_data) as view:
+        pos = 0
+        try:
+            while pos < len(view):
+                with view[pos:pos + chunk_size] as chunk:
+                    pos += len(chunk)
+                    decoder.update(chunk)
+            decoded = decoder.finish()
+        except (ValueError, InvalidToken, lzma.LZMAError, binascii.Error) as e:
+            # A damaged blob is reported as a hash mismatch, as when it was
+            # hashed before decoding
+            while pos < len(view):
+                with view[pos:pos + chunk_size] as chunk:
+                    pos += len(chunk)
+                    decoder.hash_only(chunk)
+            _check_blob_hash(decoder.finish_hash(), patchblob1_sha224)
+            if isinstance(e, (lzma.LZMAError, binascii.Error)):
+                raise ValueError(f"Cannot decode blob: {e}")
+            raise
+        finally:
+            if info is not None:
+                info.update(blob_sha224=decoder.blob_sha224, blob_size=decoder.blob_size,
+                            pat_sha224=decoder.pat_sha224, patch_size=decoder.patch_size,
+                            format=decoder.format)
+    _check_blob_hash(decoder.blob_sha224, patchblob1_sha224)
+    if pat_sha224 and decoder.pat_sha224 != pat_sha224:
+        raise ValueError(f"Patch hash mismatch: expected {pat_sha224}, got {decoder.pat_sha224}")
+    return decoded
+
+
+def _check_blob_hash(actual, expected):
+    if expected and actual != expected:
+        raise BlobHashError(f"Blob hash mismatch: expected {expected}, got {actual}")
+
+
+def decode_blob_file(path, patchblob1_key, patchblob1_sha224=None, pat_sha224=None, detect_format=True,
+                     info=None, chunk_size=CHUNK_SIZE, max_size=None):
+    """decode_blob() of a file, read through mmap instead of into memory"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return decode_blob(b'', patchblob1_key, patchblob1_sha224, pat_sha224, detect_format,
+                               info, chunk_size, max_size)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode_blob(mm, patchblob1_key, patchblob1_sha224, pat_sha224, detect_format,
+                               info, chunk_size, max_size)
 
 
 def encrypt_for_javascript(patch_data, pat_sha224):
@@ -188,6 +529,114 @@ def encrypt_for_javascript(patch_data, pat_sha224):
     return comp_frndata, metadata
 
 
+def _request_input(request):
+    if request.get('input'):
+        with open(request['input'], 'rb') as f:
+            return f.read()
+    if 'data' in request:
+        return base64.b64decode(request['data'])
+    raise ValueError('Request needs "input" (file path) or "data" (base64)')
+
+
+def _request_output(request, data, response):
+    if request.get('output'):
+        with open(request['output'], 'wb') as f:
+            f.write(data)
+        response['output'] = request['output']
+    else:
+        response['data'] = base64.b64encode(data).decode('ascii')
+    return response
+
+
+def _request_decode(request):
+    decoded = {}
+    args = (request['key'], request['blob_sha224'], request.get('pat_sha224'), request.get('detect_format', True))
+    if request.get('input'):
+        patch_data = decode_blob_file(request['input'], *args, info=decoded)
+    elif 'data' in request:
+        patch_data = decode_blob(base64.b64decode(request['data']), *args, info=decoded)
+    else:
+        raise ValueError('Request needs "input" (file path) or "data" (base64)')
+    return patch_data, decoded
+
+
+def handle_request(request):
+    """Run one serve-mode request (a dict); returns the response dict"""
+    op = request.get('op')
+    if op == 'ping':
+        return {'success': True}
+    if op == 'encrypt':
+        blob_data, metadata = encrypt_blob(_request_input(request), request['pat_sha224'])
+        return _request_output(request, blob_data, {'success': True, 'metadata': metadata})
+    if op == 'decrypt':
+        patch_data, decoded = _request_decode(request)
+        response = {
+            'success': True,
+            'patch_size': len(patch_data),
+            'patch_sha224': decoded['pat_sha224']
+        }
+        return _request_output(request, patch_data, response)
+    if op == 'info':
+        patch_data, decoded = _request_decode(request)
+        return {
+            'success': True,
+            'blob_size': decoded['blob_size'],
+            'blob_sha224': decoded['blob_sha224'],
+            'patch_size': len(patch_data),
+            'patch_sha224': decoded['pat_sha224'],
+            'format': decoded['format']
+        }
+    raise ValueError(f"Unknown op: {op}")
+
+
+def serve(infile, outfile, workers=1):
+    """
+    JSON-lines worker loop: one request per input line, one response per
+    output line.  With ``workers`` > 1 requests run on a thread pool (LZMA,
+    hashing and the OpenSSL ciphers release the GIL) with at most
+    2 * workers read ahead.
+    """
+    write_lock = threading.Lock()
+
+    def respond(request_id, response):
+        response = dict({'id': request_id}, **response)
+        line = json.dumps(response) + '\n'
+        with write_lock:
+            outfile.write(line)
+            outfile.flush()
+
+    def run(line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+        except ValueError as e:
+            respond(None, {'success': False, 'error': f"Invalid request: {e}", 'error_type': 'ValueError'})
+            return
+        try:
+            response = handle_request(request)
+        except KeyError as e:
+            response = {'success': False, 'error': f"Missing field {e}", 'error_type': 'KeyError'}
+        except Exception as e:
+            response = {'success': False, 'error': str(e) or type(e).__name__, 'error_type': type(e).__name__}
+        respond(request.get('id'), response)
+
+    if workers <= 1:
+        for line in infile:
+            if line.strip():
+                run(line)
+        return
+
+    slots = threading.BoundedSemaphore(2 * workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for line in infile:
+            if not line.strip():
+                continue
+            slots.acquire()
+            future = pool.submit(run, line)
+            future.add_done_callback(lambda f: slots.release())
+
+
 def main_cli():
     """Command-line interface"""
     if len(sys.argv) < 2:
@@ -195,11 +644,21 @@ def main_cli():
         print("  Encrypt: python3 blob_crypto.py encrypt <input_patch> <output_blob> <pat_sha224>")
         print("  Decrypt: python3 blob_crypto.py decrypt <input_blob> <output_patch> <key> <blob_sha224> [pat_sha224]")
         print("  Info:    python3 blob_crypto.py info <blob_file> <key> <blob_sha224>")
+        print("  Serve:   python3 blob_crypto.py serve [--workers N]   (JSON-lines requests on stdin)")
         sys.exit(1)
     
     command = sys.argv[1]
     
-    if command == 'encrypt':
+    if command == 'serve':
+        workers = 1
+        if len(sys.argv) > 3 and sys.argv[2] == '--workers':
+            workers = int(sys.argv[3])
+        elif len(sys.argv) > 2:
+            print("Error: serve takes only [--workers N]")
+            sys.exit(1)
+        serve(sys.stdin, sys.stdout, workers)
+    
+    elif command == 'encrypt':
         if len(sys.argv) < 5:
             print("Error: encrypt requires <input_patch> <output_blob> <pat_sha224>")
             sys.exit(1)
@@ -230,10 +689,8 @@ def main_cli():
         patchblob1_sha224 = sys.argv[5]
         pat_sha224 = sys.argv[6] if len(sys.argv) > 6 else None
         
-        with open(input_file, 'rb') as f:
-            blob_data = f.read()
-        
-        patch_data = decrypt_blob(blob_data, patchblob1_key, patchblob1_sha224, pat_sha224)
+        info = {}
+        patch_data = decode_blob_file(input_file, patchblob1_key, patchblob1_sha224, pat_sha224, info=info)
         
         with open(output_file, 'wb') as f:
             f.write(patch_data)
@@ -241,7 +698,7 @@ def main_cli():
         result = {
             'success': True,
             'patch_size': len(patch_data),
-            'patch_sha224': hashlib.sha224(patch_data).hexdigest()
+            'patch_sha224': info['pat_sha224']
         }
         print(json.dumps(result, indent=2))
     
@@ -254,18 +711,17 @@ def main_cli():
         patchblob1_key = sys.argv[3]
         patchblob1_sha224 = sys.argv[4]
         
-        with open(blob_file, 'rb') as f:
-            blob_data = f.read()
-        
         try:
-            patch_data = decrypt_blob(blob_data, patchblob1_key, patchblob1_sha224, detect_format=True)
+            decoded = {}
+            patch_data = decode_blob_file(blob_file, patchblob1_key, patchblob1_sha224, detect_format=True,
+                                          info=decoded)
             
             info = {
                 'success': True,
-                'blob_size': len(blob_data),
-                'blob_sha224': hashlib.sha224(blob_data).hexdigest(),
+                'blob_size': decoded['blob_size'],
+                'blob_sha224': decoded['blob_sha224'],
                 'patch_size': len(patch_data),
-                'patch_sha224': hashlib.sha224(patch_data).hexdigest(),
+                'patch_sha224': decoded['pat_sha224'],
                 'format': 'auto-detected'
             }
             print(json.dumps(info, indent=2))
@@ -33,6 +33,7 @@ import numpy as np
 botmoduledir = path.Path(__file__).abspath()
 sys.path.append(botmoduledir.parent.parent)
 import loadsmwrh
+import rhselect
 import cmd_xmario
 import pb_repatch
 import cmd_reset
@@ -3039,89 +3040,43 @@ class Bot(commands.Bot):
             await ctx.send(f'@{ctx.author.name} - Sorry, this is a restricted command. {await self.cmd_privilege_level(ctx.message.author)}/21')
             return
         text = str(ctx.message.content)
-        text = re.sub(r'[^- .?!_a-zA-z0-9:%+,"&()#!\\\']','_', str(text))
+        text = re.sub(r'[^- .?!_a-zA-z0-9:%+,"&()#!|<>=*\\\']','_', str(text))
         paramResult = re.match(r'^!rhrandom( +(.*)|)', text)
-        m_racelevels = False
-        m_demos = False
-        m_demosonly = False
-        m_racelevelsonly = False
-        m_contests = False
-        m_contestsonly = False
-        m_xfilters = True
 
         if paramResult != None:
             try:
                 if paramResult.group(2) == None :
-                    await ctx.send(f'Usage: !rhrandom [+]<type>')
+                    await ctx.send(f'Usage: !rhrandom [+]<type or query>')
                     return
                 else:
                     text = paramResult.group(2).lower()
                     loadtoo = False
-                    if '%' in text:
-                        parts = text.split('%')
-                        for part in parts:
-                            if part=='races' or part=='racelevels' or part=='racelevel':
-                                m_racelevels = True
-                                m_racelevelsonly = True
-                            if part=='demos' or part=='demolevels':
-                                m_demos = True
-                                m_demosonly = True
-                            if part=='contests' or part=='contestlevels':
-                                m_contests = True
-                                m_contestsonly = True
-                            if part=='racestoo':
-                                m_racelevels = True
-                            if part=='nofilters':
-                                m_xfilters=False
-                            if part=='all' or part=='anything':
-                                m_racelevels = True
-                                m_demos = True
-                                m_contests = True
-                        text = parts[-1]
-                    if text[0]=='+' or text[0]=='-':
+                    # A leading + (load the hack) or - (don't) before the type, after
+                    # any %modifiers%, is taken off as before; it never negates.  Use
+                    # "not <term>" to negate the first term
+                    prefix, sep, text = text.rpartition('%')
+                    if text[0:1]=='+' or text[0:1]=='-':
                         if text[0] == '+':
                             loadtoo = True
                         text = text[1:]
-
-                    hld0 = list( filter(lambda g: 'type' in g and re.search( text, g["type"], re.I) and (m_demos or not(str(g["demo"])=='yes')) ,
-                                loadsmwrh.get_hacklist_data()
-                                )
-                            )
-                    yesvalues = ['yes', 'true', '1']
-                    novalues = ['', 'false', 'no', '0']
-                    if m_demosonly:
-                        hld0 = list( filter(lambda g: yesvalues in str(g['demo']).lower() or  
-                                     'demo' in tags, hld0))
-                    if not(m_racelevels):
-                        hld0 = list( filter(lambda g: not('racelevel' in g) or
-                                     str(g['racelevel']).lower() in novalues, hld0))
-                        hld0 = list( filter(lambda g: not('tags' in g) or 
-                                     not('racelevel' in g["tags"]), hld0))
-                    if m_racelevelsonly:
-                        hld0 = list( filter(lambda g: ('tags' in g) and
-                                     ('racelevel' in g["tags"]) or 'racelevel' in g , hld0))
-                    if not(m_contests):
-                        hld0 = list( filter(lambda g: not('contest' in g) or
-                                     str(g['contest']).lower() in novalues, hld0 ))
-                        hld0 = list( filter(lambda g: not('tags' in g) or
-                                     not('contestlevel' in g["tags"]), hld0))
-                    if m_contestsonly:
-                         hld0 = list( filter(lambda g: ('tags' in g) and
-                             ('contestlevel' in g["tags"]) or 'contest' in g, hld0) )
-                    if m_xfilters:
-                        # exclude_tags: 'suggestive dialogue',  'crude language' 'mature content' 'crude content' ]
-                        excludetags  = ['adult content',"sexual content","epilepsy warning"]
-                        hld0 = list( filter(lambda g: not('tags' in g) or
-                                         not(any(x in g["tags"] for x in excludetags) )  , hld0) )
-
-
-
-
-                    random.shuffle(hld0)
-                    rhid = str(hld0[0]["id"])
-                    rhname = str(hld0[0]["name"])
-                    rhauthors = str(hld0[0]["authors"])
-                    hld0 = None
+                    text = prefix + sep + text
+                    # rhselect query syntax, e.g. "kaizo rating:>=4 -tag:water"; the old
+                    # %races%demos%contests%nofilters%<type> form is translated.  Plans
+                    # are compiled once and cached, each term is a facet bitset operation
+                    try:
+                        plan = rhselect.compile_query(rhselect.legacy_query(text), rhselect.RANDOM_DEFAULTS)
+                    except rhselect.SelectError as serr:
+                        await ctx.send(f'@{ctx.author.name} - {serr}')
+                        return
+                    facets = loadsmwrh.get_facet_index()
+                    hrec = facets.sample_record(plan.bits(facets, loadsmwrh.level_store))
+                    if hrec == None:
+                        await ctx.send(f'@{ctx.author.name} - No games match that type')
+                        return
+                    rhid = str(hrec["id"])
+                    rhname = str(hrec["name"])
+                    rhauthors = str(hrec["authors"])
+                    hrec = None
 
                     if loadtoo:
                         await ctx.send(f'@{ctx.author.name} - I found game #{rhid} by {rhauthors} ({rhname}).  Attempting to load...')
@@ -3324,7 +3279,6 @@ class Bot(commands.Bot):
     @commands.command(name='rhsearch')
     @commands.cooldown(2,1)
     async def cmd_rhsearch(self,ctx):
-        hacklist = loadsmwrh.get_hacklist_data() #filename='../rhmd.dat')
         self.logger.debug('rhsearch  message:' + str(dir(ctx.message)))
         text = str(ctx.message.content)
         #text = re.sub('[^ !_a-zA-z0-9]','_', str(text))
@@ -3351,50 +3305,49 @@ class Bot(commands.Bot):
         self.logger.debug('rhsearch:text=' + text)
         searchdone = False
 
+        index = loadsmwrh.get_search_index()
         if re.match(r'^date:',text) or re.match(r'^\d\d\d\d-\d\d', text):
             searchdone = True
             if re.match(r'^date:',text):
                 text = text[5:]
-                for h in hacklist:
-                    if re.search(r'\b' + text + r'\b', h['added']):
-                        hresults = hresults + [h]
-                        if not(hnames == ''):
-                            hnames = hnames +'; '
-                        hnames = hnames + f'{h["id"]} '
-                        foundEntry = h
-                        if len(hnames) > 250:
-                            hnames = hnames + '..'
-                            break
-
-        if searchdone == False:
-            for h in hacklist: 
-                if 'authors' in h and re.search(r'\b' + text + r'\b', h['authors'].lower()):
+                for h in index.search_records('"' + text + '"', fields=('added',)):
                     hresults = hresults + [h]
                     if not(hnames == ''):
-                        hnames = hnames + '; '
-                    else:
-                        hnames = hnames + ('By %s: ' % h['authors'])
-                    hnames = hnames + ('%s - %s' % (h['id'], h['name']))
-                    if len(hresults) >= 10 or len(hnames) > 230:
+                        hnames = hnames +'; '
+                    hnames = hnames + f'{h["id"]} '
+                    foundEntry = h
+                    if len(hnames) > 250:
+                        hnames = hnames + '..'
                         break
 
-        if hnames == '':
-            for h in hacklist:
-                namevalue = (':' + h['name'] + ':').lower()
-                if len(text) < 2:
-                    break
-                if namevalue.find(':' + text + ':') >= 0:
-                    foundEntry = h
-                    break
-                if text.lower() == h['id'].lower():
-                    foundEntry = h
-                    break
-                if re.search(r'\b' + text + r'\b', h['name'].lower()):
-                    foundEntry = h
-                    break
-                if re.search(r'\b' + text + r'\b', h['authors'].lower()):
-                    foundEntry = h
+        if searchdone == False:
+            for h in index.search_records('"' + text + '"', fields=('authors',)):
+                hresults = hresults + [h]
+                if not(hnames == ''):
+                    hnames = hnames + '; '
+                else:
+                    hnames = hnames + ('By %s: ' % h['authors'])
+                hnames = hnames + ('%s - %s' % (h['id'], h['name']))
+                if len(hresults) >= 10 or len(hnames) > 230:
                     break
+
+        if hnames == '':
+            if len(text) >= 2:
+                # Hacks whose id is the text or whose name/authors contain it as
+                # whole words, best ranked first; otherwise the closest spelling
+                fuzzy = loadsmwrh.get_fuzzy_index()
+                found = [index.record(p) for p in index.search('"' + text + '"', fields=('name', 'id', 'authors'))]
+                exact = [h for h in found if str(h['id']).lower() == text]
+                if exact:
+                    foundEntry = exact[0]
+                elif found:
+                    foundEntry = loadsmwrh.get_hack_info(fuzzy.rank(text, [h['id'] for h in found[0:200]])[0])
+                else:
+                    matches = fuzzy.top(text, k=3, min_score=0.45)
+                    if matches:
+                        foundEntry = loadsmwrh.get_hack_info(matches[0].hackid)
+                        if len(matches) > 1:
+                            extras = '(also: ' + '; '.join('%s %s' % (m.hackid, m.text) for m in matches[1:]) + ')'
                 #
             #
             if foundEntry:
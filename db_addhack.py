@@ -70,6 +70,11 @@ def addhack_function(args):
     hacklist = hacklist + addhackinfo
     savepath = loadsmwrh.rhmd_path()
     loadsmwrh.save_hacklist_data(hacklist, filename=savepath, docompress=True)
+    # With the sidecar enabled the fuzzy index is kept in cache/, so sync it
+    # now (only the new entry gets indexed); otherwise nothing would be kept
+    # and the next lookup builds the index anyway
+    if loadsmwrh.sidecar_enabled():
+        loadsmwrh.get_fuzzy_index(savepath)
 
 if __name__ == '__main__':
     addhack_function(sys.argv)
@@ -0,0 +1,13 @@
+#!/usr/bin/python
+# Fold the append-only journals (rhmd.dat.jnl, resmd.dat.jnl, rhad.dat.jnl)
+# back into their .dat files.  Saves do this on their own once a journal
+# gets large; run this before copying .dat files to another machine.
+
+import loadsmwrh
+
+if __name__ == '__main__':
+    compacted = loadsmwrh.compact_journals()
+    if not(compacted):
+        print('No journals to compact')
+    for filename in compacted:
+        print('Compacted ' + filename)
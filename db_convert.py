@@ -0,0 +1,46 @@
+#!/usr/bin/python
+# Convert catalog files between the legacy '*' + Fernet(LZMA(json)) format
+# and the block-encrypted random-access container (rhcontainer.py).
+#
+# Usage: db_convert.py [--legacy] [file ...]
+#   Without file arguments converts rhmd.dat and resmd.dat.
+#   --legacy converts containers back to the old single-token format.
+# Pending journal entries are folded into the converted file.
+
+import os
+import sys
+import json
+import loadsmwrh
+import rhcatalog
+import rhcontainer
+import rhjournal
+from cryptography.fernet import Fernet
+from compress import Compressor
+
+def convert_file(filename, legacy=False):
+    frn = Fernet(loadsmwrh.rhmd_key(filename))
+    if rhcontainer.is_container(filename) != legacy:
+        print('%s: already in the requested format' % filename)
+        return
+    hacklist = loadsmwrh.get_hacklist_data(filename=filename)
+    if legacy:
+        comp = Compressor()
+        comp.use_lzma()
+        listfile = open(filename + '.new', 'w')
+        listfile.write( '*' + ( bytearray(frn.encrypt(comp.compress(json.dumps(hacklist)))) ).decode() )
+        listfile.close()
+        os.replace(filename + '.new', filename)
+    else:
+        rhcontainer.write_container(filename, hacklist, frn)
+    rhjournal.Journal(filename, frn).remove()
+    rhcatalog.CATALOG_CACHE.invalidate(filename)
+    print('%s: converted %d records (%d bytes)' % (filename, len(hacklist), os.path.getsize(filename)))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    legacy = '--legacy' in args
+    files = [a for a in args if a != '--legacy']
+    if not(files):
+        files = [loadsmwrh.rhmd_path(), loadsmwrh.resmd_path()]
+    for filename in files:
+        convert_file(filename, legacy)
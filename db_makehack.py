@@ -65,6 +65,8 @@ def makehack_function(args):
     hinfo =  {}
     hinfo["id"] = str(hackid)
     hinfo["name"] = input('Hack name:')
+    for m in loadsmwrh.get_fuzzy_index().top(hinfo["name"], k=5, fields=['name'], min_score=0.6):
+        print('  Similar existing hack: %s - %s (%.2f)' % (m.hackid, m.text, m.score))
     hinfo["added"] = time.strftime("%y-%m-%d")
     hinfo["authors"] = input("Enter author names:")  
     hinfo["author"] = hinfo["authors"]
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# Decoded-patch cache (cache/patches, see rhpatchcache.py):
+#   db_patchcache.py [stats]      entries, size, budget and hit/miss counts
+#   db_patchcache.py trim [MB]    evict least recently used entries down to MB
+#   db_patchcache.py verify       re-hash every entry, removing damaged ones
+#   db_patchcache.py purge        remove every entry and reset the counters
+# With --roms the same commands act on the patched-ROM cache (cache/roms).
+
+import sys
+import loadsmwrh
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--roms' in args:
+        args.remove('--roms')
+        pcache = loadsmwrh.get_rom_cache()
+    else:
+        pcache = loadsmwrh.get_patch_cache()
+    args = args or ['stats']
+    if args[0] == 'stats':
+        st = pcache.stats()
+        print('Path:      ' + pcache.path)
+        print('Entries:   %d' % st['entries'])
+        print('Size:      %.1f MB of %.1f MB' % (st['bytes'] / 1048576.0, st['budget'] / 1048576.0))
+        print('Hits:      %d  Misses: %d  Hit rate: %.1f%%' % (st['hits'], st['misses'], 100 * st['hit_rate']))
+        print('Stores:    %d  Evictions: %d  Corrupt: %d' % (st['stores'], st['evictions'], st['corrupt']))
+    elif args[0] == 'trim':
+        budget = int(float(args[1]) * 1048576) if len(args) > 1 else pcache.budget
+        print('Evicted %d entries' % pcache.trim(budget))
+    elif args[0] == 'verify':
+        checked, removed = pcache.verify()
+        print('Checked %d entries, removed %d damaged' % (checked, removed))
+    elif args[0] == 'purge':
+        print('Removed %d entries' % pcache.purge())
+        pcache.reset_stats()
+    else:
+        print('Usage: db_patchcache.py [--roms] [stats|trim [MB]|verify|purge]')
+        sys.exit(1)
@@ -0,0 +1,27 @@
+#!/usr/bin/python
+# Prefetch hack metadata (xdata, patchblob fields) into rhmd_cache.dat so
+# that launching a hack does not have to wait for the metadata server.
+# Meant to be run periodically, e.g. from a nightly cron job.
+#
+# Usage: db_prefetch_md.py [--jobs N] [hackid ...]
+#   Without ids, every hack missing metadata is fetched.
+
+import sys
+import time
+import loadsmwrh
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    jobs = 8
+    if '--jobs' in args:
+        pos = args.index('--jobs')
+        jobs = int(args[pos + 1])
+        del args[pos:pos + 2]
+    started = time.time()
+    result = loadsmwrh.prefetch_hack_metadata(args or None, jobs=jobs)
+    elapsed = time.time() - started
+    print('Fetched %d of %d missing entries in %.1fs (%.1f/s)' % (
+          result['fetched'], result['todo'], elapsed, result['fetched'] / max(elapsed, 0.001)))
+    if result['failed']:
+        print('Failed: ' + ' '.join(result['failed']))
+        sys.exit(1)
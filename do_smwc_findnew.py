@@ -4,8 +4,7 @@ import sys
 import json
 import time
 import loadsmwrh
-import requests
-import io
+import rhdownload
 from os.path import exists
 import zipfile
 #4959:31956
@@ -47,26 +46,19 @@ for x in hacklist :
             url = 'http:' + url
 
         sys.stderr.write('Downloading ' + url + "\n")
-        req = requests.get(url)
-
-        if req.status_code == 200:
-            try:
-                zipfile.ZipFile(io.BytesIO(req.content))
-            except zipfile.BadZipFile: 
-                sys.stderr.write('ERR: HTTP Response for URL ' + url + ' is not a Zip file' + "\n")
-                failed = True
-                xg = open(os.path.join("tried", idstr), "w")
-                xg.close()
-
-        if req.status_code == 200 and failed == False:
-            sys.stderr.write(f'Got response 200: saving {idstr}.zip.new' + "\n")
-            f = open(os.path.join("zips", idstr + ".zip.new"), "wb")
-            f.write(req.content)
-            f.close()
-            os.replace(os.path.join("zips", idstr + ".zip.new"), os.path.join("zips", idstr + ".zip"))
+        # Streamed to zips/<id>.zip.part (resumed after a dropped
+        # connection), renamed to zips/<id>.zip once it checks out as a zip
+        try:
+            loadsmwrh.get_downloader().fetch(url, os.path.join("zips", idstr + ".zip"),
+                                             validate=zipfile.is_zipfile)
             sys.stderr.write(f"Saved to file " + os.path.join("zips", idstr + ".zip") + "\n")
-        else:
+        except rhdownload.ContentError:
+            sys.stderr.write('ERR: HTTP Response for URL ' + url + ' is not a Zip file' + "\n")
+            xg = open(os.path.join("tried", idstr), "w")
+            xg.close()
             sys.stderr.write('ERR: Error download id ' + idstr + "\n")
+        except rhdownload.DownloadError as xerr:
+            sys.stderr.write('ERR: Error download id ' + idstr + ': ' + str(xerr) + "\n")
         sys.stderr.write("Pausing for 12 seconds\n")
         time.sleep(12)
         #
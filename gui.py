@@ -23,8 +23,10 @@ from tkinter.ttk import Treeview, Scrollbar, Style
 OUTPUT_PATH = Path(__file__).parent
 ASSETS_PATH = OUTPUT_PATH / Path(r"assets/frame0")
 
-hackdict = loadsmwrh.get_hackdict(skipdups=True)
+hackdict = loadsmwrh.get_hack_store()
 notedict = loadsmwrh.get_note_dict()
+# log.txt / pnums.dat are indexed up front; Treeview selection only reads memory
+loadsmwrh.level_store()
 #tree_items = []
 detached_items = []
 
@@ -35,7 +37,7 @@ def relative_to_assets(path: str) -> Path:
 def tva_selection_changed(root, tva, button_7, x):
     current = tva.focus()
     item = tva.item(current)
-    if not('values' in item) or len(item['values']) < 1  or pb_lvlrand.randlevel_count(item['values'][0]) < 1:
+    if not('values' in item) or len(item['values']) < 1  or pb_lvlrand.randlevel_count(item['values'][0], refresh=False) < 1:
         button_7.configure(state=tk.DISABLED)
     else:
         button_7.configure(state=tk.NORMAL)
@@ -71,7 +73,7 @@ def button_mark_done(root,tva,label_status):
     else:
        label_status.configure(text=f'Unmarked {hidval}')
        del notedict[hidval]["done"]
-    pass
+    loadsmwrh.save_note_entry(hidval, notedict[hidval])
   
 def button_play_hack(root,tva,label_status):
    current = tva.focus()
@@ -287,28 +289,8 @@ tva.bind('<<TreeviewSelect>>', lambda x: tva_selection_changed(window, tva, butt
 filterframe.grid(row=0,column=0,sticky="news")
 entry_1.grid(row=0,column=1,padx=4)
 
-def doesMatch(hinfo,varText,ipos):
-       match = False
-       lenvt = len(varText)
-       if len(varText) < 4 and ipos <= 2000:
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["name"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["type"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["authors"].lower(), re.I):
-           match = True
-       if lenvt >= 3 and re.search(varText.lower(), hinfo["id"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["description"].lower(), re.I):
-           match = True
-       if lenvt >= 5 and re.search(varText.lower(), hinfo["added"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and hinfo["tags"]:
-           for tagt in hinfo["tags"]:
-               if re.search(varText.lower(), tagt.lower(), re.I):
-                   match = True
-       return match
+def doesMatch(hinfo,varText,ipos,matchids=None):
+       return loadsmwrh.hinfoMatch(hinfo, varText, ipos, matchids=matchids)
 
 
 def filterChanged(var,tva):
@@ -320,6 +302,7 @@ def filterChanged(var,tva):
    global detached_items
    detached_items2=[]
    ip = 0
+   matchids = loadsmwrh.filter_match_ids(varText)
 
    detached_items.extend(tva.get_children())
    tva.detach(*tva.get_children())
@@ -334,7 +317,7 @@ def filterChanged(var,tva):
        if str(hackid) in hackdict:
            hinfo = hackdict[str(hackid)]
        #
-       if hinfo and doesMatch(hinfo,varText,len(tva.get_children()) + ip):
+       if hinfo and doesMatch(hinfo,varText,len(tva.get_children()) + ip,matchids):
             tva.reattach(ti,'',0)
        else:
             detached_items2.append(ti)
@@ -355,7 +338,7 @@ def filterChanged(var,tva):
        if str(hackid) in hackdict:
            hinfo = hackdict[str(hackid)]
 
-       match = hinfo and doesMatch(hinfo,varText,ipos)
+       match = hinfo and doesMatch(hinfo,varText,ipos,matchids)
        if match == True:
            #tva.item(ti, values=tivalues)
            pass
@@ -5,6 +5,7 @@ import base64
 import os
 import re
 import requests
+import concurrent.futures
 import hashlib
 import base64
 import time
@@ -16,30 +17,52 @@ from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
-from zipfile import ZipFile
-
-def hinfoMatch(hinfo,varText,ipos, iposmaximum=2000):
-       match = False
+from zipfile import ZipFile, BadZipFile, is_zipfile
+import io
+import rhcatalog
+import rhsidecar
+import rhrecords
+import rhjournal
+import rhcontainer
+import rhmdcache
+import rhlevellog
+import rhsearch
+import rhfuzzy
+import rhfacets
+import rhpatchcache
+import rhhash
+# rhpsets, rhdownload, rhipfs and blob_crypto are imported where they are
+# used: most tools never fetch or decode a blob, and these pull in requests
+# and the cryptography primitives
+
+def filter_fields(varText):
+       # Fields the GUI filter looks at for a given text length
        lenvt = len(varText)
+       fields = []
+       if lenvt >= 3:
+           fields = fields + ['id']
+       if lenvt >= 4:
+           fields = fields + ['name', 'type', 'authors', 'description', 'tags']
+       if lenvt >= 5:
+           fields = fields + ['added']
+       return fields
+
+def filter_match_ids(varText, filename=None):
+       # Ids of all hacks the GUI filter text matches, from the shared
+       # search index, plus a substring scan so text inside a word still
+       # matches (as the old per-record re.search() did)
+       fields = filter_fields(varText)
+       if not(fields):
+           return set()
+       return get_search_index(filename).search_ids(varText, fields=fields, fallback=True)
+
+def hinfoMatch(hinfo,varText,ipos, iposmaximum=2000, matchids=None):
+       # matchids: result of filter_match_ids(varText), computed once per filter change
        if len(varText) < 4 and ipos <= iposmaximum:
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["name"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["type"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["authors"].lower(), re.I):
-           match = True
-       if lenvt >= 3 and re.search(varText.lower(), hinfo["id"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and re.search(varText.lower(), hinfo["description"].lower(), re.I):
-           match = True 
-       if lenvt >= 5 and re.search(varText.lower(), hinfo["added"].lower(), re.I):
-           match = True
-       if lenvt >= 4 and hinfo["tags"]:
-           for tagt in hinfo["tags"]:
-               if re.search(varText.lower(), tagt.lower(), re.I):
-                   match = True
-       return match
+           return True
+       if matchids == None:
+           matchids = filter_match_ids(varText)
+       return str(hinfo["id"]) in matchids
 
 
 def rhmd_key(fpath):
@@ -117,8 +140,6 @@ def rhad_path(docreate=False):
 
 
 
-cachepnums = {}
-
 
 def fix_hentry(data):
     data = dict(data)
@@ -152,26 +173,15 @@ def fix_hentry(data):
     return data
 
 
-def get_pnum(hackid):
+def level_store(refresh=True):
+    # log.txt / pnums.dat parsed once per process (rhlevellog); refresh()
+    # only reads lines appended since the last call
     path_prefix = get_path_prefix()
-    result = None
-    found = False
-    if hackid in cachepnums:
-        return cachepnums[hackid]
-    if len(cachepnums) > 1:
-        return None
+    return rhlevellog.get_store(os.path.join(path_prefix,'log.txt'),
+                                os.path.join(path_prefix,'pnums.dat'), refresh)
 
-    try:
-       f = open(os.path.join(path_prefix,'pnums.dat'), 'r')
-       for line in f.readlines():
-           entry = line.strip().split(' ')
-           cachepnums[entry[0]] = entry[1]
-           if entry[0] == hackid:
-               found = True
-               result = entry[1]
-    except:
-         return result
-    return result
+def get_pnum(hackid):
+    return level_store().get_pnum(hackid)
 
 def has_pnum(hackid):
     return not(get_pnum(hackid) == None)
@@ -204,6 +214,12 @@ def save_local_options(opthash):
     os.replace(optfiletmp, optfile)
     
 
+def base_rom_sha224():
+    # sha224(smw.sfc), re-read only when the file's inode/size/mtime change
+    # (stamp kept in cache/filestamps.json)
+    return rhhash.file_sha224(os.path.join(get_path_prefix(), 'smw.sfc'),
+                              os.path.join(get_path_prefix(), 'cache', 'filestamps.json'))
+
 def path_rerequisites():
     path_prefix = get_path_prefix()
     romerror = False
@@ -211,24 +227,20 @@ def path_rerequisites():
         print('Could not find smw.sfc')
         romerror = True
 
-    romf = open(os.path.join(path_prefix,'smw.sfc'), 'rb')
-    romdata = romf.read()
-    romf.close()
     expected = 'fdc4c00e09a8e08d395003e9c8a747f45a9e5e94cbfedc508458eb08'
-    actual = hashlib.sha224(romdata).hexdigest()
-    if hashlib.sha224(romdata).hexdigest() == expected : 
+    actual = base_rom_sha224()
+    if actual == expected : 
        pass
     else:
         print('Sha224 checksum of your supplied smw.sfc is other than expected..  This might not work.')
         print('Expected sha224(smw.sfc) =' + expected )
         print('Actual   sha224(smw.sfc) =' + actual   )
-    romdata = None
 
 
     if romerror:
-        print('Note: Need to copy smw.sfc and flips.exe To startup directory ' + os.getcwd() + ' in order to patch ROMs')
+        print('Note: Need to copy smw.sfc To startup directory ' + os.getcwd() + ' in order to patch ROMs')
         print('SMW.sfc should be your legally obtained SMW ROM with file hash code sha224(smw.sfc) = fdc4c00e09a8e08d395003e9c8a747f45a9e5e94cbfedc508458eb08')
-        print('Please find flips at: https://github.com/Alcaro/Flips ')
+        print('Patches are applied in-process; flips (https://github.com/Alcaro/Flips) is optional, used as a fallback')
 
     if (not os.path.exists(os.path.join(path_prefix,"temp")) or not os.path.exists(os.path.join(path_prefix,"patch")) or not os.path.exists(os.path.join(path_prefix,"blobs")) or not os.path.exists(os.path.join(path_prefix,"rom")) or
        not os.path.exists(os.path.join(path_prefix,"patch")) or not os.path.exists(os.path.join(path_prefix,"data"))):
@@ -249,6 +261,8 @@ def get_core_meta():
      uad = get_userauth_data()
 
 def get_gen_list_data(filename,frn):
+     if rhcontainer.is_container(filename):
+         return rhcontainer.open_container(filename, frn).records()
      listfile = open(filename, 'r')
      data = listfile.read()
      hacklist = None
@@ -266,31 +280,100 @@ def get_gen_list_data(filename,frn):
      return hacklist
 
 
-def get_hacklist_data(filename=None):
+def get_cache_dir():
+     return os.path.join(get_path_prefix(), 'cache')
+
+def sidecar_enabled():
+     if 'RHTOOLS_SIDECAR' in os.environ:
+         return not(os.environ['RHTOOLS_SIDECAR'] in ['', '0', 'no'])
+     return bool(get_local_options().get('catalog_sidecar'))
+
+def get_sidecar_list_data(filename, frn):
+     # Uses the decoded sidecar in cache/ when it matches sha224(filename)
+     decoder = lambda fn: get_gen_list_data(fn, frn)
+     if sidecar_enabled():
+         return rhsidecar.load_or_build(filename, decoder, get_cache_dir())
+     return decoder(filename)
+
+def journal_enabled(catalog=False):
+     # rhad.dat notes are always journaled.  Catalogs opt in, since other
+     # tools (loadsm.js) read rhmd.dat / resmd.dat without replaying journals.
+     if 'RHTOOLS_JOURNAL' in os.environ:
+         return not(os.environ['RHTOOLS_JOURNAL'] in ['', '0', 'no'])
+     if not(catalog):
+         return True
+     return bool(get_local_options().get('catalog_journal'))
+
+def get_journaled_list_data(filename, frn):
+     # Base file (or its sidecar) with the pending journal entries replayed
+     data = get_sidecar_list_data(filename, frn)
+     ops = rhjournal.Journal(filename, frn).read_ops()
+     if ops:
+         data = rhjournal.replay_list(data, ops)
+     return data
+
+def save_journal(filename, frn, newdata, differ, catalog=False):
+     # Append only what changed since the cached decode to <filename>.jnl
+     # instead of rewriting the whole file.  Returns False when a full
+     # write is needed (journaling off, journal due for compaction, no
+     # current decode to compare against, or a change the journal cannot
+     # express such as reordered records).
+     if not(journal_enabled(catalog)) or not(os.path.exists(filename)):
+         return False
+     jnl = rhjournal.Journal(filename, frn)
+     if jnl.needs_compaction():
+         return False
+     old = rhcatalog.CATALOG_CACHE.current(filename, (jnl.path,))
+     if old == None:
+         return False
+     ops = differ(old, newdata)
+     if ops == None:
+         return False
+     jnl.append(ops)
+     rhcatalog.CATALOG_CACHE.store(filename, newdata, (jnl.path,))
+     return True
+
+def get_cached_list_data(filename, frn, readonly=False):
+     # Decoded once per process by rhcatalog.CATALOG_CACHE, re-validated
+     # against (path, size, mtime_ns) of the file and its journal.
+     # readonly=True returns the shared read-only view, otherwise the
+     # caller gets a private mutable copy.
+     view = rhcatalog.CATALOG_CACHE.load(filename, lambda fn: get_journaled_list_data(fn, frn),
+                                         (rhjournal.journal_path(filename),))
+     if readonly:
+         return view
+     return rhcatalog.thaw(view)
+
+def get_catalog_record(filename, frn, idval):
+     # One record by id.  Uses the cached decode when there is one; a block
+     # container without a pending journal only decrypts the block holding
+     # the record.  The result may be a shared read-only record.
+     deps = (rhjournal.journal_path(filename),)
+     view = rhcatalog.CATALOG_CACHE.current(filename, deps)
+     if view == None and not(os.path.exists(deps[0])) and rhcontainer.is_container(filename):
+         return rhcontainer.open_container(filename, frn).get_id(idval)
+     if view == None:
+         view = get_cached_list_data(filename, frn, readonly=True)
+     return view.get_id(idval)
+
+def get_hacklist_data(filename=None, readonly=False):
      if not(filename):
          filename = rhmd_path()
-     dekey = base64.urlsafe_b64decode( bytes(rhmd_key(filename), 'ascii') )
      frn = Fernet( rhmd_key(filename)  )
-     return get_gen_list_data(filename,frn)
+     return get_cached_list_data(filename, frn, readonly)
 
-def get_reslist_data(filename=None):
+def get_reslist_data(filename=None, readonly=False):
      if not(filename):
          filename = resmd_path()
-     dekey = base64.urlsafe_b64decode( bytes(resmd_key(filename), 'ascii') )
      frn = Fernet( resmd_key(filename)  )
-     return get_gen_list_data(filename,frn)
+     return get_cached_list_data(filename, frn, readonly)
 
+def catalog_cache_stats():
+     return rhcatalog.CATALOG_CACHE.stats()
 
-def get_note_dict(filename=None):
-     if not(filename):
-         filename = rhad_path(docreate=False)
-     dekey = base64.urlsafe_b64decode( bytes(rhad_key(filename), 'ascii') )
-     frn = Fernet( rhad_key(filename)  )
 
-     if filename == None:
-         listfile = open(rhad_path(), 'r')
-     else:
-         listfile = open(filename, 'r')
+def get_note_data(filename, frn):
+     listfile = open(filename, 'r')
      data = listfile.read()
      if data[0]=='*':
         comp = Compressor()
@@ -305,9 +388,29 @@ def get_note_dict(filename=None):
      data = None
      return hacklist
 
+def get_note_dict(filename=None):
+     if not(filename):
+         filename = rhad_path(docreate=False)
+     frn = Fernet( rhad_key(filename)  )
+     jnl = rhjournal.Journal(filename, frn)
+     view = rhcatalog.CATALOG_CACHE.load(filename,
+                lambda fn: rhjournal.replay_dict(get_note_data(fn, frn), jnl.read_ops()),
+                (jnl.path,))
+     return rhcatalog.thaw(view)
+
+def save_note_entry(hackid, note, filename=None):
+     # Update (or with note=None remove) the notes of one hack; only the
+     # change is written, to the rhad.dat journal
+     notes = get_note_dict(filename)
+     if note == None:
+         notes.pop(str(hackid), None)
+     else:
+         notes[str(hackid)] = note
+     save_note_dict(notes, filename)
+
 
-def get_hackdict(skipdups=False):
-     hacklist = get_hacklist_data()
+def get_hackdict(skipdups=False, readonly=False):
+     hacklist = get_hacklist_data(readonly=readonly)
      hackdict = {}
      for u in range(len(hacklist)):
          if hacklist[u]['id'] in hackdict.keys() and not skipdups:
@@ -315,8 +418,77 @@ def get_hackdict(skipdups=False):
          hackdict[ hacklist[u]['id']] = hacklist[u]
      return hackdict
 
-def get_resdict(skipdups=False):
-     reslist = get_reslist_data()
+def get_hack_store(filename=None):
+     # Compact id -> record mapping (rhrecords.RecordStore), built once per
+     # decode of the catalog file and shared; duplicate ids keep the last record.
+     # Unless something else already decoded the catalog, the list of dicts
+     # it is built from is not kept in the catalog cache
+     if not(filename):
+         filename = rhmd_path()
+     frn = Fernet( rhmd_key(filename)  )
+     return rhcatalog.CATALOG_CACHE.load_standalone(filename,
+                lambda fn: get_journaled_list_data(fn, frn),
+                'record_store', rhrecords.RecordStore.from_list,
+                (rhjournal.journal_path(filename),))
+
+def get_search_index(filename=None):
+     # rhsearch.SearchIndex over the catalog, built once per decode and shared
+     # by search.py, the GUI filter and the chatbot
+     if not(filename):
+         filename = rhmd_path()
+     frn = Fernet( rhmd_key(filename)  )
+     return rhcatalog.CATALOG_CACHE.load_derived(filename,
+                lambda fn: get_journaled_list_data(fn, frn),
+                'search_index', rhsearch.SearchIndex,
+                (rhjournal.journal_path(filename),))
+
+def get_facet_index(filename=None):
+     # rhfacets.FacetIndex (type/tag/flag bitsets) for random selection,
+     # built once per decode of the catalog
+     if not(filename):
+         filename = rhmd_path()
+     frn = Fernet( rhmd_key(filename)  )
+     return rhcatalog.CATALOG_CACHE.load_derived(filename,
+                lambda fn: get_journaled_list_data(fn, frn),
+                'facet_index', rhfacets.FacetIndex,
+                (rhjournal.journal_path(filename),))
+
+_fuzzy_indexes = {}
+
+def fuzzy_index_path(filename):
+     return os.path.splitext(rhsidecar.sidecar_path(filename, get_cache_dir()))[0] + '.rhfz'
+
+def get_fuzzy_index(filename=None):
+     # rhfuzzy.FuzzyIndex over hack names and authors.  The index kept from the
+     # previous decode is synced with the catalog, so only added/renamed/removed
+     # hacks get re-indexed.  It holds decoded names and authors, so it is only
+     # kept in cache/ between runs when the sidecar is enabled
+     if not(filename):
+         filename = rhmd_path()
+     frn = Fernet( rhmd_key(filename)  )
+     absname = os.path.abspath(filename)
+     def build(view):
+         index = _fuzzy_indexes.get(absname)
+         persist = sidecar_enabled()
+         if index == None and persist:
+             index = rhfuzzy.FuzzyIndex.load(fuzzy_index_path(filename))
+         if index == None:
+             index = rhfuzzy.FuzzyIndex()
+         index.sync(view)
+         if index.changed and persist:
+             try:
+                 index.save(fuzzy_index_path(filename))
+             except OSError:
+                 pass
+         _fuzzy_indexes[absname] = index
+         return index
+     return rhcatalog.CATALOG_CACHE.load_derived(filename,
+                lambda fn: get_journaled_list_data(fn, frn),
+                'fuzzy_index', build,
+                (rhjournal.journal_path(filename),))
+
+def get_resdict(skipdups=False, readonly=False):
+     reslist = get_reslist_data(readonly=readonly)
      resdict = {}
      for u in range(len(reslist)):
          if reslist[u]['id'] in resdict.keys() and not skipdups:
@@ -325,23 +497,27 @@ def get_resdict(skipdups=False):
      return resdict
 
 def find_hacklist_index(hacklist, idval):
+    if isinstance(hacklist, rhcatalog.IdIndexed):
+        return hacklist.find_id(idval)
     for x in range(len(hacklist)):
         if hacklist[x]['id'] == str(idval):
              return x
     return None
 
 def find_reslist_index(xlist, idval):
+    if isinstance(xlist, rhcatalog.IdIndexed):
+        return xlist.find_id(idval)
     for x in range(len(xlist)):
         if xlist[x]['id'] == str(idval):
              return x
     return None
 
-def save_hacklist_data(newhacklist,filename=None,docompress=True):
+def save_hacklist_data(newhacklist,filename=None,docompress=True,journal=True):
      frn = Fernet(rhmd_key(rhmd_path()))
      comp = Compressor()
      comp.use_lzma()
 
-     if not(type(newhacklist) == type([])):
+     if not(isinstance(newhacklist, list)):
          raise TypeError('newhacklist wrong type')
      if filename == None:
          filename = rhmd_path()
@@ -350,42 +526,65 @@ def save_hacklist_data(newhacklist,filename=None,docompress=True):
              newhacklist[x]['authors'] = newhacklist[x]['author']
          if 'difficulty' in newhacklist[x] and not('type' in newhacklist[x]):
              newhacklist[x]['type'] = newhacklist[x]['difficulty']
+     if journal and save_journal(filename, frn, newhacklist, rhjournal.diff_list, catalog=True):
+         return
 
-     listfile = open(filename+".new", 'w')
-     if docompress:
-        listfile.write( '*' + ( bytearray(frn.encrypt( comp.compress(json.dumps(newhacklist)))) ).decode() )
-     else: 
-        listfile.write( base64.encodebytes( bytearray(json.dumps(newhacklist),'utf8') ).decode() )
-
-     listfile.close()
-     os.replace(filename + ".new", filename)
+     jsondata = json.dumps(newhacklist)
+     if docompress and rhcontainer.is_container(filename):
+        # Files converted with db_convert.py stay block containers
+        rhcontainer.write_container(filename, newhacklist, frn)
+     else:
+        listfile = open(filename+".new", 'w')
+        if docompress:
+           listfile.write( '*' + ( bytearray(frn.encrypt( comp.compress(jsondata))) ).decode() )
+        else: 
+           listfile.write( base64.encodebytes( bytearray(jsondata,'utf8') ).decode() )
+        listfile.close()
+        os.replace(filename + ".new", filename)
+     # The new base file already contains everything the journal held
+     rhjournal.Journal(filename, frn).remove()
+     # Keep the decoded cache (and its id index) in sync with what was written
+     saved = json.loads(jsondata)
+     rhcatalog.CATALOG_CACHE.store(filename, saved, (rhjournal.journal_path(filename),))
+     if sidecar_enabled():
+         rhsidecar.refresh(filename, saved, get_cache_dir())
      #listfile.write( base64.encodebytes( json.dumps(newhacklist) ) )
 
 
-def save_reslist_data(newhacklist,filename=None,docompress=True):
+def save_reslist_data(newhacklist,filename=None,docompress=True,journal=True):
      frn = Fernet(resmd_key(resmd_path()))
      comp = Compressor()
      comp.use_lzma()
 
-     if not(type(newhacklist) == type([])):
+     if not(isinstance(newhacklist, list)):
          raise TypeError('newhacklist wrong type')
      if filename == None:
          filename = resmd_path()
      for x in range(len(newhacklist)):
          if not('authors' in newhacklist[x]) and 'author' in newhacklist[x]:
              newhacklist[x]['authors'] = newhacklist[x]['author']
-     listfile = open(filename+".new", 'w')
-     if docompress:
-        listfile.write( '*' + ( bytearray(frn.encrypt(comp.compress(json.dumps(newhacklist)))) ).decode() )
+     if journal and save_journal(filename, frn, newhacklist, rhjournal.diff_list, catalog=True):
+         return
+     jsondata = json.dumps(newhacklist)
+     if docompress and rhcontainer.is_container(filename):
+        rhcontainer.write_container(filename, newhacklist, frn)
      else:
-        listfile.write( base64.encodebytes( bytearray(json.dumps(newhacklist),'utf8') ).decode() )
-
-     listfile.close()
-     os.replace(filename + ".new", filename)
+        listfile = open(filename+".new", 'w')
+        if docompress:
+           listfile.write( '*' + ( bytearray(frn.encrypt(comp.compress(jsondata))) ).decode() )
+        else:
+           listfile.write( base64.encodebytes( bytearray(jsondata,'utf8') ).decode() )
+        listfile.close()
+        os.replace(filename + ".new", filename)
+     rhjournal.Journal(filename, frn).remove()
+     saved = json.loads(jsondata)
+     rhcatalog.CATALOG_CACHE.store(filename, saved, (rhjournal.journal_path(filename),))
+     if sidecar_enabled():
+         rhsidecar.refresh(filename, saved, get_cache_dir())
      #listfile.write( base64.encodebytes( json.dumps(newhacklist) ) )
 
 
-def save_note_dict(newdict,filename=None,docompress=True):
+def save_note_dict(newdict,filename=None,docompress=True,journal=True):
      frn = Fernet(rhmd_key(rhad_path(docreate=True)))
      comp = Compressor()
      comp.use_lzma()
@@ -397,17 +596,38 @@ def save_note_dict(newdict,filename=None,docompress=True):
      #for x in range(len(newhacklist)):
      #    if not('authors' in newhacklist[x]) and 'author' in newhacklist[x]:
      #        newhacklist[x]['authors'] = newhacklist[x]['author']
+     if journal and save_journal(filename, frn, newdict, rhjournal.diff_dict):
+         return
+     jsondata = json.dumps(newdict)
      listfile = open(filename+".new", 'w')
      if docompress:
-        listfile.write( '*' + ( bytearray(frn.encrypt(comp.compress(json.dumps(newdict)))) ).decode() )
+        listfile.write( '*' + ( bytearray(frn.encrypt(comp.compress(jsondata))) ).decode() )
      else:
-        listfile.write( base64.encodebytes( bytearray(json.dumps(newdict),'utf8') ).decode() )
+        listfile.write( base64.encodebytes( bytearray(jsondata,'utf8') ).decode() )
 
      listfile.close()
      os.replace(filename + ".new", filename)
+     rhjournal.Journal(filename, frn).remove()
+     rhcatalog.CATALOG_CACHE.store(filename, json.loads(jsondata), (rhjournal.journal_path(filename),))
      #listfile.write( base64.encodebytes( json.dumps(newhacklist) ) )
 
 
+def compact_journals():
+     # Fold pending journal entries into rhmd.dat / resmd.dat / rhad.dat
+     compacted = []
+     for pathfn, loader, saver in [(rhmd_path, get_hacklist_data, save_hacklist_data),
+                                   (resmd_path, get_reslist_data, save_reslist_data),
+                                   (rhad_path, get_note_dict, save_note_dict)]:
+         try:
+             filename = pathfn()
+         except Exception:
+             continue
+         if os.path.exists(rhjournal.journal_path(filename)):
+             saver(loader(filename), filename=filename, journal=False)
+             compacted.append(filename)
+     return compacted
+
+
 def reduced_hacklist(hacklist, addxdata=False):
     for u in range(len(hacklist)):
         obj = hacklist[u]
@@ -431,87 +651,94 @@ def reduced_hacklist(hacklist, addxdata=False):
      
 
 
+md_caches = {}
+
+def get_md_cache(resources=False):
+     # One rhmdcache.MetadataCache per *_cache.dat file and process
+     if resources:
+         path = os.path.join(get_path_prefix(), 'resmd_cache.dat')
+         loader = lambda fn: get_reslist_data(filename=fn, readonly=True)
+         saver = lambda records, fn: save_reslist_data(records, filename=fn)
+     else:
+         path = os.path.join(get_path_prefix(), 'rhmd_cache.dat')
+         loader = lambda fn: get_hacklist_data(filename=fn, readonly=True)
+         saver = lambda records, fn: save_hacklist_data(records, filename=fn)
+     if not(path in md_caches):
+         md_caches[path] = rhmdcache.MetadataCache(path, loader, saver)
+     return md_caches[path]
+
+def merge_cached_metadata(x1, centry):
+     x1['xdata'] = centry['xdata']
+     for w in centry:
+         if re.match('patchblob.*', w):
+             x1[w] = centry[w]
+
 def get_hack_info(hackid,merged=False):
      idstr = str(hackid)
-     hacklist = get_hacklist_data()
-     for x in hacklist:
-         if str(x["id"]) == idstr:
-             if merged:
-                 x1 = dict(x)
-                 if 'xdata' in x1:
-                     for v in x1['xdata'].keys():
-                        x1[v] = x1['xdata'][v]
-                 if not('xdata' in x1):
-                     if os.path.exists(os.path.join(get_path_prefix(),'rhmd_cache.dat')):
-                         hl2 = get_hacklist_data(filename='rhmd_cache.dat')
-                         hli = find_hacklist_index(hl2, hackid)
-                         if not(hli == None):
-                             if hackid == 'meta':
-                                 if not('cachets' in hl2[hli]):
-                                     hl2[hli] = {}
-                                     hli = None
-                                 elif int(hl2[hli['cachets']])+600 <int(time.time()) :
-                                     hl2[hli] = {}
-                                     hli = None
-                             if ('cachets' in hl2[hli] and
-                                 int(hl2[hli]['cachets'])+86400*10 < int(time.time()) ):
-                                 hli = None
-                         if not(hli == None):
-                             x1['xdata'] = hl2[hli]['xdata']
-                             for w in hl2[hli]:
-                                 if re.match('patchblob.*', w):
-                                     x1[w] = hl2[hli][w]
-                 return x1
-             else:
-                 return x
-     return None
+     filename = rhmd_path()
+     x = get_catalog_record(filename, Fernet(rhmd_key(filename)), idstr)
+     if x == None:
+         return None
+     if merged:
+         x1 = rhcatalog.thaw(x)
+         if 'xdata' in x1:
+             for v in x1['xdata'].keys():
+                x1[v] = x1['xdata'][v]
+         if not('xdata' in x1):
+             # TTLs ('meta' 10 minutes, others 10 days) are applied by the cache
+             centry = get_md_cache().get(idstr)
+             if not(centry == None):
+                 merge_cached_metadata(x1, rhcatalog.thaw(centry))
+         return x1
+     else:
+         return rhcatalog.thaw(x)
 
 
 def get_resource_info(resid,merged=False):
      path_prefix = get_path_prefix()
      idstr = str(resid)
-     reslist = get_reslist_data()
-     for x in reslist:
-         if str(x["id"]) == idstr:
-             if merged:
-                 x1 = dict(x)
-                 if 'xdata' in x1:
-                     for v in x1['xdata'].keys():
-                        x1[v] = x1['xdata'][v]
-                 if not('xdata' in x1):
-                     if os.path.exists(os.path.join(path_prefix,'resmd_cache.dat')):
-                         hl2 = get_reslist_data(filename=os.path.join(path_prefix,'resmd_cache.dat'))
-                         hli = find_reslist_index(hl2, resid)
-                         if not(hli == None):
-                             if resid == 'meta':
-                                 if not('cachets' in hl2[hli]):
-                                     hl2[hli] = {}
-                                     hli = None
-                                 elif int(hl2[hli['cachets']])+600 <int(time.time()) :
-                                     hl2[hli] = {}
-                                     hli = None
-                             if ('cachets' in hl2[hli] and
-                                 int(hl2[hli]['cachets'])+86400*10 < int(time.time()) ):
-                                 hli = None
-                         if not(hli == None):
-                             x1['xdata'] = hl2[hli]['xdata']
-                             for w in hl2[hli]:
-                                 if re.match('patchblob.*', w):
-                                     x1[w] = hl2[hli][w]
-                 return x1
-             else:
-                 return x
-     return None
+     filename = resmd_path()
+     x = get_catalog_record(filename, Fernet(resmd_key(filename)), idstr)
+     if x == None:
+         return None
+     if merged:
+         x1 = rhcatalog.thaw(x)
+         if 'xdata' in x1:
+             for v in x1['xdata'].keys():
+                x1[v] = x1['xdata'][v]
+         if not('xdata' in x1):
+             centry = get_md_cache(resources=True).get(idstr)
+             if not(centry == None):
+                 merge_cached_metadata(x1, rhcatalog.thaw(centry))
+         return x1
+     else:
+         return rhcatalog.thaw(x)
 
 
 
+pset_manifests = {}
+
+def get_pset_manifest():
+     # Blob name -> local pset zip member (rhpsets.py), in cache/pset_manifest.json;
+     # refreshed whenever psets.dat changes
+     import rhpsets
+     path_prefix = get_path_prefix()
+     if not(path_prefix in pset_manifests):
+         pset_manifests[path_prefix] = rhpsets.PsetManifest(path_prefix,
+                                            os.path.join(get_cache_dir(), 'pset_manifest.json'))
+     manifest = pset_manifests[path_prefix]
+     psetsfile = os.path.join(path_prefix, "psets.dat")
+     stamp = rhpsets.file_stamp(psetsfile)
+     if not(stamp == None) and stamp != manifest.psets_stamp:
+         manifest.refresh(rhpsets.read_psets(psetsfile), stamp)
+     return manifest
+
 def get_psets(hinfo=None):
+    import rhpsets
     globalsets = []
     try:
-        f = open(os.path.join(get_path_prefix(),"psets.dat"), "r")
-        data = f.read()
-        f.close()
-        globalsets = json.loads(base64.b64decode(data))
+        # Decoded once per change of psets.dat; entries are copied below
+        globalsets = [dict(uu) for uu in rhpsets.read_psets(os.path.join(get_path_prefix(),"psets.dat"))]
     except Exception as xerr:
         if hinfo == None or not('psets' in hinfo):
             raise xerr
@@ -530,68 +757,172 @@ def get_psets(hinfo=None):
     return globalsets + extrasets
 
 def get_resource_blob(hackid, blobinfo=None):
+    import blob_crypto
     idstr = str(hackid)
     rawblob = get_patch_raw_blob(hackid, blobinfo, 'resblob')
     hackinfo = get_hack_info(hackid, True)
     #print(json.dumps(hackinfo, indent=4))
     print('Expected res_sha224 = ' + str(hackinfo["res_sha224"]))
-    print('sha224(rawblob) = ' + hashlib.sha224(rawblob).hexdigest())
-    if hashlib.sha224(rawblob).hexdigest() == hackinfo["res_sha224"]:
-        comp = Compressor()
-        comp.use_lzma()
-        decomp_blob = comp.decompress(rawblob)
-
-        key = base64.urlsafe_b64decode( bytes(hackinfo["resblob_key"], 'ascii') )
-        if not(key == "" or key == "none"):
-            frn = Fernet(key)
-            decrypted_blob  = frn.decrypt(decomp_blob)
-            comp = Compressor() 
-            comp.use_lzma()
-            decoded_blob = comp.decompress(decrypted_blob)
-        else:
-            decrypted_blob = decomp_blob
-            decoded_blob = decomp_blob
-
-        #frn_sha224 = hashlib.sha224(comp_frndata).hexdigest()
-        print('Expected pat_sha224 = ' + hackinfo["pat_sha224"]  )
-        print('sha224(decoded_blob) = ' + hashlib.sha224(decoded_blob).hexdigest())
-        if hashlib.sha224(decoded_blob).hexdigest() ==  hackinfo["res_sha224"]:
-            return decoded_blob
-        print('Error: Decoded patch does not match expected file checksum - possible data corruption.')
+    # Streaming decode as in get_patch_blob(); a resblob_key of "" or "none"
+    # means the blob is only LZMA-compressed
+    decoded = {}
+    try:
+        decoded_blob = blob_crypto.decode_blob(rawblob, hackinfo["resblob_key"],
+                                               hackinfo["res_sha224"], info=decoded)
+    except blob_crypto.BlobHashError:
+        print('sha224(rawblob) = ' + decoded['blob_sha224'])
+        print('[*] Error: Possible file corruption: Sha224 data checksum of received file does not match')
         return None
-
-    print('[*] Error: Possible file corruption: Sha224 data checksum of received file does not match')
+    print('sha224(rawblob) = ' + decoded['blob_sha224'])
+
+    #frn_sha224 = hashlib.sha224(comp_frndata).hexdigest()
+    print('Expected pat_sha224 = ' + hackinfo["pat_sha224"]  )
+    print('sha224(decoded_blob) = ' + decoded['pat_sha224'])
+    if decoded['pat_sha224'] ==  hackinfo["res_sha224"]:
+        return decoded_blob
+    print('Error: Decoded patch does not match expected file checksum - possible data corruption.')
     return None
 
 
-def get_patch_blob(hackid, blobinfo=None):
+patch_caches = {}
+
+def cache_budget(envname, optname, default):
+     # Size budget in bytes from the environment (MB), else the options file (MB)
+     if envname in os.environ:
+         budget_mb = os.environ[envname]
+     else:
+         budget_mb = get_local_options().get(optname, default >> 20)
+     try:
+         return int(float(budget_mb or 0) * (1 << 20))
+     except ValueError:
+         return default
+
+def get_patch_cache():
+     # Decoded patches by pat_sha224 in cache/patches (rhpatchcache.py); the
+     # budget is RHTOOLS_PATCH_CACHE_MB or the patch_cache_mb option, 0 disables
+     budget = cache_budget('RHTOOLS_PATCH_CACHE_MB', 'patch_cache_mb', rhpatchcache.DEFAULT_BUDGET)
+     path = os.path.join(get_cache_dir(), 'patches')
+     if not(path in patch_caches) or patch_caches[path].budget != budget:
+         patch_caches[path] = rhpatchcache.PatchCache(path, budget)
+     return patch_caches[path]
+
+def get_rom_cache():
+     # Which rom/ file holds each patched ROM, entries in cache/roms (see
+     # pb_repatch.py); RHTOOLS_ROM_CACHE_MB or the rom_cache_mb option, 0 disables
+     budget = cache_budget('RHTOOLS_ROM_CACHE_MB', 'rom_cache_mb', rhpatchcache.DEFAULT_ROM_BUDGET)
+     path = os.path.join(get_cache_dir(), 'roms')
+     if not(path in patch_caches) or patch_caches[path].budget != budget:
+         patch_caches[path] = rhpatchcache.RomCache(path, budget)
+     return patch_caches[path]
+
+downloaders = []
+
+def get_downloader():
+     # One rhdownload.DownloadManager per process: pooled connections,
+     # resumable .part files, RHTOOLS_DOWNLOADS_PER_HOST transfers per host
+     import rhdownload
+     if not(downloaders):
+         per_host = int(os.environ.get('RHTOOLS_DOWNLOADS_PER_HOST', '2') or 2)
+         downloaders.append(rhdownload.DownloadManager(per_host=per_host))
+     return downloaders[0]
+
+def download_pset(uu, dest):
+     # Pset zip to dest; checked against the sha224/size in its psets.dat
+     # entry when it has them, and as a zip either way
+     checksums = {}
+     for name in ('sha224', 'sha256'):
+         if uu.get(name):
+             checksums[name] = uu[name]
+     size = uu.get('size')
+     validate = None
+     if dest.endswith('.zip'):
+         validate = is_zipfile
+     return get_downloader().fetch(uu["publicUrl"], dest, checksums=checksums,
+                                   size=(int(size) if size else None), validate=validate)
+
+ipfs_fetchers = []
+
+def get_ipfs_gateways():
+     # %CID% URL templates: RHTOOLS_IPFS_GATEWAYS (comma separated), the
+     # ipfs_gateways option, the electron app's ipfsgateways table, or
+     # rhipfs.DEFAULT_GATEWAYS
+     import rhipfs
+     if os.environ.get('RHTOOLS_IPFS_GATEWAYS'):
+         return [gw.strip() for gw in os.environ['RHTOOLS_IPFS_GATEWAYS'].split(',') if gw.strip()]
+     gateways = get_local_options().get('ipfs_gateways')
+     if gateways:
+         return list(gateways)
+     gateways = rhipfs.gateways_from_db(os.path.join(get_path_prefix(), 'electron', 'patchbin.db'))
+     if gateways:
+         return gateways
+     return list(rhipfs.DEFAULT_GATEWAYS)
+
+def get_ipfs_fetcher():
+     # Hedged fetch across the gateways, ordered by the scoreboard in
+     # cache/ipfs_gateways.json (rhipfs.py)
+     import rhipfs
+     if not(ipfs_fetchers):
+         board = rhipfs.Scoreboard(os.path.join(get_cache_dir(), 'ipfs_gateways.json'))
+         ipfs_fetchers.append(rhipfs.HedgedFetcher(get_ipfs_gateways(), board))
+     return ipfs_fetchers[0]
+
+def ipfs_url(cid):
+     # Recorded *_ipfs_url: the CID on the best-scoring gateway
+     import rhipfs
+     return rhipfs.gateway_url(get_ipfs_fetcher().best_gateway(), cid)
+
+def fetch_pset_ipfs(uu, dest, pblob_name, expected_sha224=None):
+     # Race the pset's CID across the IPFS gateways; the first response that
+     # is a zip holding pblob_name (with the expected sha224) is saved to dest
+     def verify(data):
+         try:
+             with ZipFile(io.BytesIO(data)) as zf:
+                 blob = zf.read(pblob_name)
+         except (BadZipFile, KeyError):
+             return False
+         return expected_sha224 == None or hashlib.sha224(blob).hexdigest() == expected_sha224
+     data, gateway = get_ipfs_fetcher().fetch(uu['ipfs'], verify)
+     f = open(dest + ".new", "wb")
+     f.write(data)
+     f.close()
+     os.replace(dest + ".new", dest)
+     return gateway
+
+
+def get_patch_blob(hackid, blobinfo=None, use_cache=True):
+    import blob_crypto
     idstr = str(hackid)
-    rawblob = get_patch_raw_blob(hackid, blobinfo)
     hackinfo = get_hack_info(hackid, True)
+    # A cache hit skips the download, so blobinfo is left as it was
+    pcache = None
+    if use_cache and hackinfo and hackinfo.get("pat_sha224"):
+        pcache = get_patch_cache()
+        decoded_blob = pcache.get(hackinfo["pat_sha224"])
+        if not(decoded_blob == None):
+            print('Using cached patch pat_sha224 = ' + hackinfo["pat_sha224"])
+            return decoded_blob
+    rawblob = get_patch_raw_blob(hackid, blobinfo)
     #print(json.dumps(hackinfo, indent=4))
     print('Expected patchblob1_sha224 = ' + str(hackinfo["patchblob1_sha224"]))
-    print('sha224(rawblob) = ' + hashlib.sha224(rawblob).hexdigest())
-    if hashlib.sha224(rawblob).hexdigest() == hackinfo["patchblob1_sha224"]:
-        comp = Compressor()
-        comp.use_lzma()
-        decomp_blob = comp.decompress(rawblob)
-
-        key = base64.urlsafe_b64decode( bytes(hackinfo["patchblob1_key"], 'ascii') )
-        frn = Fernet(key)
-        decrypted_blob  = frn.decrypt(decomp_blob)
-
-        comp = Compressor()
-        comp.use_lzma()
-        decoded_blob = comp.decompress(decrypted_blob)
-        #frn_sha224 = hashlib.sha224(comp_frndata).hexdigest()
-        print('Expected pat_sha224 = ' + hackinfo["pat_sha224"]  )
-        print('sha224(decoded_blob) = ' + hashlib.sha224(decoded_blob).hexdigest())
-        if hashlib.sha224(decoded_blob).hexdigest() ==  hackinfo["pat_sha224"]:
-            return decoded_blob
-        print('Error: Decoded patch does not match expected file checksum - possible data corruption.')
+    # One streaming pass hashes, decompresses and decrypts the blob; only
+    # the patch is kept whole (blob_crypto.decode_blob)
+    decoded = {}
+    try:
+        decoded_blob = blob_crypto.decode_blob(rawblob, hackinfo["patchblob1_key"],
+                                               hackinfo["patchblob1_sha224"], info=decoded)
+    except blob_crypto.BlobHashError:
+        print('sha224(rawblob) = ' + decoded['blob_sha224'])
+        print('[*] Error: Possible file corruption: Sha224 data checksum of received file does not match')
         return None
-
-    print('[*] Error: Possible file corruption: Sha224 data checksum of received file does not match')
+    print('sha224(rawblob) = ' + decoded['blob_sha224'])
+    #frn_sha224 = hashlib.sha224(comp_frndata).hexdigest()
+    print('Expected pat_sha224 = ' + hackinfo["pat_sha224"]  )
+    print('sha224(decoded_blob) = ' + decoded['pat_sha224'])
+    if decoded['pat_sha224'] ==  hackinfo["pat_sha224"]:
+        if not(pcache == None):
+            pcache.put(hackinfo["pat_sha224"], decoded_blob)
+        return decoded_blob
+    print('Error: Decoded patch does not match expected file checksum - possible data corruption.')
     return None
 
 
@@ -604,7 +935,7 @@ def fill_blob_data(hacklist, hackid, redo=False):
         if "xdata" in hinfo and hinfo["xdata"] and hinfo["xdata"]["patchblob1_url"] and  'patchblob1_ipfs_url' in hinfo["xdata"]:
             return
     try:
-        blob = get_patch_blob(hackid, blobinfo)
+        blob = get_patch_blob(hackid, blobinfo, use_cache=False)
         if blob == None:
             return
         print('BLOBINFO: ' + str(blobinfo))
@@ -641,32 +972,43 @@ def get_pc_address(addr, offset=512):
     h = h + offset
     return h
 
+def get_md_url():
+     # RHTOOLS_MD_URL points the tools at a mirror or a local test server
+     return os.environ.get('RHTOOLS_MD_URL', 'https://smw.iparpa.com/md')
+
+def fetch_hack_metadata(hackinfo, adata, session=None, timeout=None, verbose=True):
+     # POST to the metadata server for one hack; the decoded reply or None
+     values = { 'encryptedvalue' : adata["encryptedvalue"] } 
+     urlmd1 = '%s/%s/%s' % (get_md_url(), hackinfo["objkey"], hackinfo["id"])
+     poster = requests if session == None else session
+     req = poster.post(urlmd1,
+             headers = {  
+                        'userkey' : str(adata["userkey"]),
+                        'twid' : adata["twid"],
+                        'twlogin' : adata["twlogin"],
+                        'Content-Type' : 'application/json'
+                       }, json = values, timeout = timeout)
+     if verbose:
+         print("Request.post " + urlmd1)
+     if req.status_code == 200:
+         return json.loads(req.content)
+     print('HTTP Error:'+str(req)+ ' ' + str(req.text))
+     return None
+
+def metadata_cache_entry(hackid, augment):
+     newentry = { "id" : hackid, "xdata" : augment['xdata']  }
+     for w in augment.keys():
+        if re.match('patchblob.*', w):
+            newentry[w] = augment[w]
+     return newentry
+
 def complete_hack_metadata(hackinfo):
-     path_prefix = get_path_prefix()
      if not('xdata' in hackinfo) and not('patchblob1_name' in hackinfo):
-          adata = get_userauth_data()
-          s_userkey = str(adata["userkey"])
-          objkey_s = hackinfo["objkey"]
-          rhid_s = hackinfo["id"]
-
-          values = { 'encryptedvalue' : adata["encryptedvalue"] } 
-          urlmd1 = 'https://smw.iparpa.com/md/%s/%s' % (objkey_s, rhid_s)
-          req = requests.post(urlmd1,
-                  headers = {  
-                             'userkey' : s_userkey,
-                             'twid' : adata["twid"],
-                             'twlogin' : adata["twlogin"],
-                             'Content-Type' : 'application/json'
-                            }, json = values)
-          print("Request.post " + urlmd1)
-          if req.status_code == 200:
+          augment = fetch_hack_metadata(hackinfo, get_userauth_data())
+          if not(augment == None):
               print('Got metadata from server')
-              print(str(req.content))
-              augment = json.loads(req.content)
+              print(json.dumps(augment))
               if 'xdata' in augment:
-                  newhld = []
-                  if os.path.exists(os.path.join(path_prefix,'rhmd_cache.dat')):
-                      newhld = get_hacklist_data(filename=os.path.join(path_prefix,'rhmd_cache.dat'))
                   hackinfo['xdata'] = augment['xdata']
                   for w in augment:
                      if re.match('patchblob.*', w):
@@ -676,29 +1018,67 @@ def complete_hack_metadata(hackinfo):
                       print(str(w))
                       hackinfo[w] = augment['xdata'][w]
 
-                  idx00 = find_hacklist_index(newhld,hackinfo['id'])
-                  newentry = { "id" : hackinfo['id'], "xdata" : augment['xdata']  }
-                  if idx00 == None:
-                      newhld = newhld + [newentry]
-                  else: 
-                      newhld[idx00] = newentry
-                  newentry = None
-
-                  idx00 = find_hacklist_index(newhld,hackinfo['id'])
-                  for w in augment.keys():
-                     if re.match('patchblob.*', w):
-                         #hackinfo[w] = augment[w]
-                         newhld[idx00][w] = augment[w]
-                  newhld[idx00]["xdata"] = augment['xdata']
-                  newhld[idx00]["cachets"] = int(time.time())
-                  save_hacklist_data(newhld, filename='rhmd_cache.dat')
-              
-          else:
-              print('HTTP Error:'+str(req)+ ' ' + str(req.text))
+                  # Written back to rhmd_cache.dat in batches (and at exit)
+                  get_md_cache().put(metadata_cache_entry(hackinfo['id'], augment))
      return hackinfo
-     pass
+
+def prefetch_hack_metadata(hackids=None, jobs=8, adata=None, timeout=30):
+     # Fetch the metadata complete_hack_metadata() would need for many hacks
+     # at once: missing entries are requested concurrently over one pooled
+     # session and stored in rhmd_cache.dat with a single save, so later
+     # launches find them in the cache.  hackids=None means every hack.
+     hacklist = get_hacklist_data(readonly=True)
+     if hackids == None:
+         hackids = [h['id'] for h in hacklist]
+     mdcache = get_md_cache()
+     todo = []
+     for hackid in hackids:
+         hinfo = hacklist.get_id(hackid)
+         if (hinfo == None or 'xdata' in hinfo or 'patchblob1_name' in hinfo or
+             not('objkey' in hinfo) or not(mdcache.get(hackid) == None)):
+             continue
+         todo.append(hinfo)
+     result = { 'requested' : len(hackids), 'todo' : len(todo), 'fetched' : 0, 'failed' : [] }
+     if not(todo):
+         return result
+     if adata == None:
+         adata = get_userauth_data()
+
+     session = requests.Session()
+     adapter = requests.adapters.HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs)
+     session.mount('http://', adapter)
+     session.mount('https://', adapter)
+
+     def fetch_one(hinfo):
+         try:
+             return hinfo, fetch_hack_metadata(hinfo, adata, session, timeout, verbose=False)
+         except requests.RequestException as xerr:
+             print('Metadata request for %s failed: %s' % (hinfo['id'], str(xerr)))
+             return hinfo, None
+         except ValueError as xerr:
+             # A 200 reply that is not JSON (an HTML error or login page)
+             print('Metadata reply for %s is not JSON: %s' % (hinfo['id'], str(xerr)))
+             return hinfo, None
+
+     entries = []
+     try:
+         with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+             for hinfo, augment in pool.map(fetch_one, todo):
+                 if augment == None or not('xdata' in augment):
+                     result['failed'].append(hinfo['id'])
+                 else:
+                     entries.append(metadata_cache_entry(hinfo['id'], augment))
+     finally:
+         session.close()
+         # Whatever arrived before an error or Ctrl-C is still saved, once
+         if entries:
+             mdcache.put_many(entries)
+     result['fetched'] = len(entries)
+     return result
 
 def get_patch_raw_blob(hackid, rdv, blobprefix='patchblob1'):
+     import rhdownload
+     import rhipfs
      path_prefix = get_path_prefix()
      idstr = str(hackid)
      idstra = idstr[0:2]
@@ -717,6 +1097,20 @@ def get_patch_raw_blob(hackid, rdv, blobprefix='patchblob1'):
      #print(str(hackinfo))
      pblob_name = hackinfo[f"{blobprefix}_name"]
      if not os.path.exists( os.path.join(os.path.join(path_prefix,"blobs"), pblob_name)  ):
+         # Zips already on disk are in the manifest: one seek and read
+         manifest = get_pset_manifest()
+         kn = manifest.lookup(pblob_name)
+         if not(kn == None):
+             for uu in get_psets(hackinfo):
+                 if uu["key"] == kn:
+                     data = manifest.read(pblob_name, kn)
+                     if not(data == None):
+                         rdv[f'{blobprefix}_kn'] = kn
+                         rdv[f'{blobprefix}_url'] = uu['publicUrl']
+                         rdv[f"{blobprefix}_ipfs_hash"] = uu['ipfs']
+                         rdv[f"{blobprefix}_ipfs_url"] = ipfs_url(uu['ipfs'])
+                         return data
+                     break
          print('Blob not cached.. searching')
          found = False
          for uu in get_psets(hackinfo):
@@ -752,37 +1146,40 @@ def get_patch_raw_blob(hackid, rdv, blobprefix='patchblob1'):
                      print('Zip not stored, need to download.')
                      print('Downloading ...' + str(uu))
                      #publicUrl
-                     url = uu["publicUrl"]
-                     req = requests.get(url)
-                     if req.status_code == 200:
+                     # Streamed to <kn>.part, resumed if interrupted
+                     try:
+                         download_pset(uu, os.path.join(path_prefix,kn))
                          print('Download from server was successful')
                          print('')
-                         f = open(kn + ".new", "wb")
-                         f.write(req.content)
-                         f.close()
-                         os.replace(kn + ".new", kn)
-                     else:
-                         print('HTTP Error:'+str(req))
+                     except rhdownload.DownloadError as xerr:
+                         print('HTTP Error:'+str(xerr))
+                         if uu.get('ipfs'):
+                             # Same content by CID from the fastest IPFS gateways
+                             print('Trying IPFS gateways for ' + uu['ipfs'])
+                             try:
+                                 gateway = fetch_pset_ipfs(uu, os.path.join(path_prefix,kn), pblob_name,
+                                                           hackinfo.get(f"{blobprefix}_sha224"))
+                                 print('Download from ' + gateway + ' was successful')
+                             except rhipfs.IpfsError as xerr:
+                                 print('IPFS Error:'+str(xerr))
                  if os.path.exists(os.path.join(path_prefix,kn)):
                      if re.match('.*.zip', kn):
-                        with ZipFile(os.path.join(path_prefix,kn), 'r') as zip:
-                            for info in zip.infolist():
-                                if info.filename == pblob_name:
-                                    data = zip.read(info)
-                                    rdv[f'{blobprefix}_kn'] = kn
-                                    rdv[f'{blobprefix}_url'] = uu['publicUrl']
-                                    rdv[f"{blobprefix}_ipfs_hash"] = uu['ipfs']
-                                    rdv[f"{blobprefix}_ipfs_url"] = 'https://ipfs.fleek.co/ipfs/' + uu['ipfs']
-                                    found = True
-                                    return data
-                            pass
+                        manifest.index(kn)
+                        data = manifest.read(pblob_name, kn)
+                        if not(data == None):
+                            rdv[f'{blobprefix}_kn'] = kn
+                            rdv[f'{blobprefix}_url'] = uu['publicUrl']
+                            rdv[f"{blobprefix}_ipfs_hash"] = uu['ipfs']
+                            rdv[f"{blobprefix}_ipfs_url"] = ipfs_url(uu['ipfs'])
+                            found = True
+                            return data
                         pass
                      else:
                          pass
                          rdv[f'{blobprefix}_kn'] = uu['key']
                          rdv[f'{blobprefix}_url'] = uu['publicUrl']
                          rdv[f"{blobprefix}_ipfs_hash"] = uu['ipfs']
-                         rdv[f"{blobprefix}_ipfs_url"] = 'https://ipfs.fleek.co/ipfs/' + uu['ipfs']
+                         rdv[f"{blobprefix}_ipfs_url"] = ipfs_url(uu['ipfs'])
                      pass
                      #os.replace(kn + ".new", kn)
 
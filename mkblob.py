@@ -7,6 +7,8 @@ import os
 import json
 import sys
 import loadsmwrh
+import rhpatch
+import rhhash
 from compress import Compressor
 
 from cryptography.fernet import Fernet
@@ -35,30 +37,23 @@ def mkblob_function(args):
             if re.match('.*\.bps', info.filename) or info.filename=='CrowdControlVanilla.ips' :
                 print(info.filename)
                 patdata = zip.read(info)
-                shake1 = (base64.b64encode(hashlib.shake_128(patdata).digest(24), b"_-")).decode('latin1')
-                sha1 = (hashlib.sha1(patdata).hexdigest())
-                xsha224 = hashlib.sha224(patdata).hexdigest()
+                shake1, sha1, xsha224 = rhhash.triple(patdata)
     
                 f1 = open(os.path.join("temp",  xsha224) + ".new" , "wb")
                 f1.write(patdata)
                 f1.close()
                 os.replace(os.path.join("temp", xsha224) + ".new", os.path.join("patch", shake1))
                 hackinfo["patch"] = os.path.join("patch", shake1)
-                wslflips = "/mnt/c/snesgaming/lbin/flips"
-                if os.path.exists(wslflips):
-                    os.system(wslflips+" --apply " + os.path.join('patch', shake1) +"  smw.sfc " + os.path.join('temp', 'result'))
-                else:
-                    os.system("flips --apply " + os.path.join('patch', shake1) +"  smw.sfc " + os.path.join('temp', 'result'))
-                #data = bytearray()
-                #with open(os.path.join("temp", "result"), "rb") as patched:
-                #    data += patched.read(1)
-                resultf = open(os.path.join("temp", "result"), "rb")
-                romdata = resultf.read()
-                resultf.close()
-    
-                shake1_patched = (base64.b64encode(hashlib.shake_128(romdata).digest(24), b"_-")).decode('latin1')
-                sha1_patched = (hashlib.sha1(romdata).hexdigest())
-                xsha224_patched = hashlib.sha224(romdata).hexdigest()
+                smwf = open('smw.sfc', 'rb')
+                smwdata = smwf.read()
+                smwf.close()
+                try:
+                    romdata = rhpatch.apply_patch(patdata, smwdata, rhpatch.find_flips())
+                except rhpatch.PatchError as err:
+                    print('Error: Unable to apply ' + info.filename + ': ' + str(err))
+                    continue
+
+                shake1_patched, sha1_patched, xsha224_patched = rhhash.triple(romdata)
     
                 romfilename = hackinfo["id"] + "_" + shake1_patched  + ".sfc"
                 f0 = open(os.path.join("rom", romfilename) + ".new", "wb")
@@ -43,30 +43,10 @@ def readfileat(pa,addr,le):
    bufferx = (f.read())
    return bufferx[addr:addr+le]
 
-def randlevel_count(hid):
-    includecodes = ['+', '_', 'B', 'G', 'M']
-    found = False
-    scount = 0
-    try:
-        f0 = open('pnums.dat','r')
-        for line in f0.readlines():
-           e0 = line.split(' ')
-           if str(hid) == e0[0]:
-              found = True
-              break
-        f0.close()
-        if not(found):
-           return 0
-        f1 = open('log.txt', 'r')
-        for line in f1.readlines():
-             e0 = line.split(' ')
-             if e0[1] == str(hid):
-                 if e0[6] in includecodes:
-                    scount = scount+1
-        f1.close()
-        return scount
-    except:
-         return 0
+def randlevel_count(hid, refresh=True):
+    # Served from the in-memory rhlevellog index; refresh=False (used by
+    # the GUI on every selection) does no file I/O at all
+    return loadsmwrh.level_store(refresh).count_levels(hid)
 
 def randlevel_function(args):
     includecodes = ['+', '_', 'B', 'G', 'M']
@@ -79,22 +59,9 @@ def randlevel_function(args):
         sys.exit(1)
     chosen = str(args[1])
     patchnum = 0
-    pnumdict = {}
-    try:
-        f0 = open('pnums.dat', 'r')
-        for line in f0.readlines():
-           entry = [x for x in line.strip().split(' ') if len(x) > 0]
-           print("XXX " + str(entry))
-           if len(entry) >= 2 and entry[1][0:].isdigit() :
-               pnumdict[ entry[0] ] = int(entry[1])
-           elif len(entry) >= 2:
-               print('Bad line in pnums: ' + line)
-        f0.close()
-    except Exception as hhh:
-        print(str(hhh))
-        pass
+    levelstore = loadsmwrh.level_store()
 
-    hacklist = loadsmwrh.get_hacklist_data()
+    hacklist = loadsmwrh.get_hacklist_data(readonly=True)
     argvstr =  ' '.join(args[1:])
     asar_cmd = ''
     if os.path.exists("bin/asar"):
@@ -121,21 +88,17 @@ def randlevel_function(args):
     #
     patchspecified = False
     if patchnum == 0:
-        if chosen in pnumdict :
-            patchnum = pnumdict[ chosen ]
+        if not(levelstore.get_pnum_int(chosen) == None):
+            patchnum = levelstore.get_pnum_int(chosen)
+        elif not(levelstore.get_pnum(chosen) == None):
+            print('Bad line in pnums for ' + chosen + ': ' + levelstore.get_pnum(chosen))
         if len(args) > 3 and args[3][0]=='P':
             patchnum = int(args[3][1:])
             patchspecified = True
 
     #
 
-    hackdata = {}
-    for x in hacklist:
-        #print(str(x["id"]) + ' / ' + str(args[1]))
-        #if re.search(argvstr.lower(), x["type"].lower(), re.I):
-        #    selection = selection + [x["id"]]
-        hackdata[ str(x["id"]) ] = x
-    chosenrecord = hackdata[str(chosen)]
+    chosenrecord = hacklist.get_id(chosen)
     print(str(chosen)  +  '  -  '  + chosenrecord["name"]  )
     print(json.dumps(chosenrecord, indent=4, sort_keys=True))
     print('Executing patch operation...')
@@ -181,13 +144,8 @@ def randlevel_function(args):
     lidlistr2 = [*set(lidlistr2)] # Also reduce our augmented list down
     codedict =  {  }
 
-    aaaa = open('log.txt', 'r')
-    for line in aaaa.readlines():
-        entry = [x for x in line.strip().split(' ') if len(x) > 0]
-        if entry[0] == '#':
-            continue
-        if not(entry[1] == str(chosen)):
-            continue
+    for logentry in levelstore.entries_for(chosen):
+        entry = logentry.tokens
         if (entry[0] == '>'
             and entry[1] == str(chosen) and not( entry[4] in lidlistr2)
             and not(entry[4] in generalexclude)
@@ -217,7 +175,6 @@ def randlevel_function(args):
                 if epnum==0 and ('X' in elcode or 'Z' in elcode):
                     generalexclude = generalexclude + [entry[2]]
                     lidlistr2.remove(int(entry[2], base=16))
-    aaaa.close()
     print('codedict = ' + str(codedict))
 
     fallbackpatch = {}
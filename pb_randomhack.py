@@ -5,6 +5,7 @@ import random
 import sys
 import re
 import loadsmwrh
+import rhquery
 import pb_sendtosnes
 
 if os.path.exists('cur_makepage.py'):
@@ -15,38 +16,27 @@ typenames = {}
 
 #listfile = open(loadsmwrh.hacklist_path(), 'r')
 #hacklist = json.load(listfile)
-hacklist = loadsmwrh.get_hacklist_data()
+# Selection comes from a running rhcatalogd.py when there is one (rhquery)
 argvstr =  ' '.join(sys.argv[1:])
 
 if len(sys.argv) < 2:
     print('Please Specify a Type: ')
-    for x in hacklist:
-        if True and x["id"]:
-            if not( x["type"] in typenames):
-                typenames[ x["type"] ] = 1
-            else:
-                typenames[ x["type"] ] = typenames[ x["type"] ] + 1
+    for typename, count in rhquery.call('type_counts', query='*'):
+        typenames[ typename ] = count
     for x in typenames.keys():
         print(' - %20s   (%d matches)' % ( x, typenames[x]  ))
     sys.exit(1)
 
    
  
-selection = []
-hackdata = {}
+# One random hack matching the selection query (a type name, or
+# rhselect.py syntax such as "kaizo rating:>=4 -tag:water"); no demos
+# unless the query asks for them
+chosen = rhquery.call('random_hack', query=argvstr, defaults='-demo')
 
-for x in hacklist:
-     if x["demo"]=="Yes":
-         continue
-     if re.search(argvstr.lower(), x["type"].lower(), re.I):
-         selection = selection + [x["id"]]
-         hackdata[ str(x["id"]) ] = x
 
-
-if len(selection) >= 1 : 
-    random.shuffle(selection)
-    chosen = selection[0]
-    chosenrecord = hackdata[str(chosen)]
+if chosen : 
+    chosenrecord = rhquery.call('info', ids=[chosen])[0]
     print(str(chosen)  +  '  -  '  + chosenrecord["name"]  )
     print(json.dumps(chosenrecord, indent=4, sort_keys=True))
     print('Executing patch operation...')
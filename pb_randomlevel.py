@@ -7,6 +7,7 @@ import random
 import sys
 import re
 import loadsmwrh
+import rhquery
 import pb_sendtosnes
 import pb_lvlrand
 import pb_repatch
@@ -14,79 +15,42 @@ typenames = {}
 
 #listfile = open(loadsmwrh.hacklist_path(), 'r')
 #hacklist = json.load(listfile)
-hacklist = loadsmwrh.get_hacklist_data()
+# Selection comes from a running rhcatalogd.py when there is one (rhquery)
 argvstr =  ' '.join(sys.argv[1:])
 includeCodes = ['+', '_', 'B', 'G', 'M']
 excludeCodes = ['E', 'C', 'X', 'XX', 'Z', 'ZZ', 'V', 'VB', 'U', 'S', 'L', '?', 'O', 'T', 'P']
 
 excludetags  = ['adult content',"sexual contet","epilepsy warning"]
-hacklist = list( filter(lambda g: not('tags' in g) or
-                                         not(any(x in g["tags"] for x in excludetags) )  , hacklist))
+leveldefaults = '-tag:' + ','.join('"%s"' % x for x in excludetags)
 if len(sys.argv) < 2:
     print('Please Specify a Type: ')
     print('Or any for ANY type.')
     typenames['any'] = 1
-    for x in hacklist:
-        if loadsmwrh.get_pnum(x["id"]):
-            typenames['any'] = typenames['any'] + 1
-            if not( x["type"] in typenames):
-                typenames[ x["type"] ] = 1
-            else:
-                typenames[ x["type"] ] = typenames[ x["type"] ] + 1
+    for typename, count in rhquery.call('type_counts', query='pnum', defaults=leveldefaults):
+        typenames['any'] = typenames['any'] + count
+        typenames[ typename ] = count
     for x in typenames.keys():
         print(' - %20s   (%d matches)' % ( x, typenames[x]  ))
     sys.exit(1)
     
-selection = []
-hackdata = {}
-
-for x in hacklist:
-     if re.search(argvstr.lower(), x["type"].lower(), re.I) or argvstr=='*' or argvstr.lower()=='any':
-         if loadsmwrh.has_pnum( x["id"]  ) :
-             pnum_s = loadsmwrh.get_pnum( x["id"] )
-             if  (pnum_s and not(pnum_s == '0') 
-                  and pnum_s[0].isdigit() and int(pnum_s)):
-                 selection = selection + [x["id"]]
-                 hackdata[ str(x["id"]) ] = x
-
-selection = [*set(selection)]
-logf = open("log.txt","r")
-logentries = []
-le_byhack = {}
-for line in logf.readlines():
-    lent = line.strip().split(' ')
-    if len(lent) < 7:
-        continue
-    if lent[6] in excludeCodes:
-        continue
-    if not(lent[6] in includeCodes):
-        continue
-    if lent[0] in selection:
-        logentries = logentries + [lent]
-        if not ( lent[0] in le_byhack ):
-            le_byhack[ lent[0] ] = []
-        le_byhack[ lent[0] ] = le_byhack[ lent[0] ] + [lent]
-logf.close()
-
-
+# Hacks listed in exclude.dat with level '*' or '0' are never picked
+excluded = []
 exf = open('exclude.dat', 'r')
 for line in exf.readlines():
     if len(line)<2:
        continue
-    entry = exf.strip().split(' ')
-    if entry[1]=='*' or entry[1]=='0' :
-        if  entry[0] in selection:
-            selection.remove(entry[0])
+    entry = line.strip().split(' ')
+    if len(entry) > 1 and (entry[1]=='*' or entry[1]=='0') :
+        excluded = excluded + [entry[0]]
 exf.close()
 
-for u in selection:
-     if  not(u in le_byhack):
-         selection.remove(u)
-      
-if len(selection) >= 1 : 
-    random.shuffle(selection)
-    chosen = selection[0]
-    chosenrecord = hackdata[str(chosen)]
+# A random hack matching the query (type name or rhselect.py syntax) with
+# a patch number and playable levels in log.txt
+chosen = rhquery.call('random_hack', query=argvstr + ' pnum playable', defaults=leveldefaults,
+                      exclude=excluded)
+
+if chosen : 
+    chosenrecord = rhquery.call('info', ids=[chosen])[0]
     print(str(chosen)  +  '  -  '  + chosenrecord["name"]  )
     pb_lvlrand.randlevel_function(['randomlevel', chosen ])
     #print(json.dumps(chosenrecord, indent=4, sort_keys=True))
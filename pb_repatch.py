@@ -7,6 +7,8 @@ import os
 import json
 import sys
 import loadsmwrh
+import rhpatch
+import rhhash
 import requests
 import platform
 import pb_sendtosnes
@@ -18,17 +20,8 @@ def repatch_function(args,ccrom=False,noexit=False):
     if not loadsmwrh.path_rerequisites():
         return None
 
-    if os.path.exists("flips"):
-       flips_cmd = os.path.join('.','flips')
-    elif os.path.exists("flips.exe"):
-       flips_cmd = 'flips.exe'
-    elif os.path.exists("/mnt/c/snesgaming/bin/flips"):
-       flips_cmd = '/mnt/c/snesgaming/bin/flips'
-    elif os.path.exists("/usr/local/bin/flips"):
-       flips_cmd = 'flips'
-    else:
-       print('Please put flips or flips.exe and smw.sfc in start directory ' + os.getcwd())
-       return None
+    # Patches are applied in-process (rhpatch.py); flips is only a fallback
+    flips_cmd = rhpatch.find_flips()
         
 
     filename = os.path.join(path_prefix,os.path.join("temp","in.zip"))
@@ -50,45 +43,60 @@ def repatch_function(args,ccrom=False,noexit=False):
  
     print('Patching Hack#' + str(hackid) + ' name:' + hackinfo["name"] +  '  authors:' + hackinfo["authors"]  )   
     data = loadsmwrh.get_patch_blob( str(hackid), blobinfo  )
-    shake1 = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
-    sha1 = (hashlib.sha1(data).hexdigest())
-    xsha224 = hashlib.sha224(data).hexdigest()
+    shake1, sha1, xsha224 = rhhash.triple(data)
     
-    f1 = open(os.path.join(path_prefix, "temp",  xsha224) + ".new" , "wb")
-    f1.write(data)
-    f1.close()
-    os.replace(os.path.join(path_prefix, "temp", xsha224) + ".new", os.path.join(path_prefix, "patch", shake1))
+    # patch/<shake> is named by the content, so an existing file of the same
+    # size is this patch from an earlier run
+    patchfile = os.path.join(path_prefix, "patch", shake1)
+    if not(os.path.exists(patchfile)) or os.path.getsize(patchfile) != len(data):
+        f1 = open(os.path.join(path_prefix, "temp",  xsha224) + ".new" , "wb")
+        f1.write(data)
+        f1.close()
+        os.replace(os.path.join(path_prefix, "temp", xsha224) + ".new", patchfile)
     hackinfo["patch"] = os.path.join(path_prefix, "patch", shake1)
     if not os.path.exists(os.path.join(path_prefix,'smw.sfc')):
         print('Could not find ' + os.path.join(path_prefix, 'smw.sfc') + ': SMW Romfile required - Unable to patch')
         return None
-    print('')
-    print('Running command: '+flips_cmd+' --apply ' + os.path.join(path_prefix,'patch', shake1) +"  "+os.path.join(path_prefix,'smw.sfc') +" " + os.path.join(path_prefix,'temp', 'result'))
-    os.system(flips_cmd+" --apply " + os.path.join(path_prefix,'patch', shake1) +"  "+os.path.join(path_prefix,'smw.sfc') +" " + os.path.join(path_prefix,'temp', 'result'))
-    ##data = bytearray()
-    ##with open(os.path.join("temp", "result"), "rb") as patched:
-    ##    data += patched.read(1)
-    resultf = open(os.path.join(path_prefix, "temp", "result"), "rb")
-    data = resultf.read()
-    resultf.close()
-    
-    shake1_patched = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
-    sha1_patched = (hashlib.sha1(data).hexdigest())
-    xsha224_patched = hashlib.sha224(data).hexdigest()
-
-    #SuperMarioWorld.ips
-
+    # Patched ROMs are cached by (patch, base ROM, ccrom), see rhpatchcache.RomCache
+    base_sha224 = loadsmwrh.base_rom_sha224()
+    romcache = loadsmwrh.get_rom_cache()
+    romkey = romcache.rom_key(xsha224, base_sha224, ccrom)
+    cached = romcache.get(romkey)
     namesuffix=''
-    resultfile=os.path.join('temp','result')
     if ccrom:
         namesuffix='.cc'
-        #
-        os.system(flips_cmd+" --apply " + os.path.join(path_prefix,'zips', 'ccSuperMarioWorld.ips') +"  "+os.path.join(path_prefix,'temp', 'result')+" "+os.path.join(path_prefix,'temp', 'result2'))
-        resultfile=os.path.join('temp','result2')
-        resultf = open(os.path.join(path_prefix, "temp", "result2"), "rb")
-        data = resultf.read()
-        resultf.close()
-        #shake1_patched = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
+    if cached:
+        data, rommeta = cached
+        print('Using cached patched ROM ' + romkey)
+        shake1_patched = rommeta["result_shake1"]
+        sha1_patched = rommeta["result_sha1"]
+        xsha224_patched = rommeta["result_sha224"]
+    else:
+        print('')
+        print('Applying ' + os.path.join(path_prefix,'patch', shake1) + ' to ' + os.path.join(path_prefix,'smw.sfc'))
+        smwf = open(os.path.join(path_prefix, 'smw.sfc'), 'rb')
+        smwdata = smwf.read()
+        smwf.close()
+        try:
+            data = rhpatch.apply_patch(data, smwdata, flips_cmd)
+        except rhpatch.PatchError as err:
+            print('Error: Unable to apply patch: ' + str(err))
+            return None
+    
+        shake1_patched, sha1_patched, xsha224_patched = rhhash.triple(data)
+
+        #SuperMarioWorld.ips
+
+        if ccrom:
+            ccf = open(os.path.join(path_prefix,'zips', 'ccSuperMarioWorld.ips'), 'rb')
+            ccpatch = ccf.read()
+            ccf.close()
+            try:
+                data = rhpatch.apply_patch(ccpatch, data, flips_cmd)
+            except rhpatch.PatchError as err:
+                print('Error: Unable to apply ccSuperMarioWorld.ips: ' + str(err))
+                return None
+            #shake1_patched = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
 
     jsonfilename = ''
     
@@ -111,6 +119,11 @@ def repatch_function(args,ccrom=False,noexit=False):
     if xsha224_patched == hackinfo["result_sha224"]:
         os.replace(os.path.join(path_prefix,"rom", romfilename) + ".new", os.path.join(path_prefix,"rom", romfilename))
         os.replace(os.path.join(path_prefix,"rom", jsonfilename) + ".new", os.path.join(path_prefix,"rom", jsonfilename))
+        if not(cached):
+            # The entry points at the rom/ file just written, no second copy
+            romcache.put(romkey, os.path.join(path_prefix,"rom", romfilename), data,
+                         {"result_sha224": xsha224_patched, "result_sha1": sha1_patched,
+                          "result_shake1": shake1_patched})
     else:
         print('Error: Checksum of patched ROM does not match expected value.   Possible file corruption or incorrect SMW ROM')
     
@@ -150,7 +163,7 @@ def repatch_function(args,ccrom=False,noexit=False):
             print('Sending HEAD request: ' + url)
             req = requests.head(url, headers = { 'User-Agent' : f'rhtools-pb_repatch/1.0 ({platform.platform()}; Python/{platform.python_version()})' })
             hacknotes[ hackinfo["id"] ]["downloaded"] = int(time.time())
-            loadsmwrh.save_note_dict(hacknotes)
+            loadsmwrh.save_note_entry(hackinfo["id"], hacknotes[ hackinfo["id"] ])
             print(f'Result: {req.status_code} {req.reason} - {req.headers}')
     except Exception as xerr:
         print(str(xerr))
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+rhcatalog.py - Process-wide cache of decoded catalog files
+
+Decoding rhmd.dat (or resmd.dat, rhmd_cache.dat, rhindex.dat) means reading
+the file, Fernet-decrypting it, LZMA-decompressing it and JSON-parsing the
+whole list.  This module keeps one decoded copy of each catalog file per
+process and re-validates it against the file's (path, size, mtime_ns) stamp
+on every lookup, so the decode cost is paid once instead of on every
+get_hack_info() / get_patch_blob() call.
+
+Cached data is handed out as read-only views: lists become tuples and
+records become ReadOnlyDict objects that raise TypeError on mutation.
+Callers that need to edit the data ask for a private copy with thaw().
+
+Top-level lists also carry a lazily built id index (record id -> position)
+so lookups by id are O(1) instead of a scan of the whole list.
+
+Usage:
+    import rhcatalog
+    view = rhcatalog.CATALOG_CACHE.load(filename, decoder)   # read-only
+    hacklist = rhcatalog.thaw(view)                           # mutable copy
+    pos = hacklist.find_id('12345')                           # O(1) lookup
+    store = rhcatalog.CATALOG_CACHE.load_derived(filename, decoder, 'store', builder)
+    print(rhcatalog.CATALOG_CACHE.stats())
+"""
+
+import os
+import gc
+import contextlib
+import threading
+
+
+class ReadOnlyDict(dict):
+    """dict that refuses in-place modification.
+
+    It is still a real dict, so json.dumps(), ``in``, .get() and iteration
+    behave exactly as they do for the records returned by json.loads().
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('cached catalog records are read-only; use rhcatalog.thaw() for a mutable copy')
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return (ReadOnlyDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def build_id_index(records):
+    """Map str(record['id']) to the position of its first occurrence"""
+    index = {}
+    for pos, rec in enumerate(records):
+        if isinstance(rec, dict) and 'id' in rec:
+            index.setdefault(str(rec['id']), pos)
+    return index
+
+
+class IdIndexed:
+    """
+    Mixin for catalog lists: lazily builds an id -> position index.
+
+    find_id() double-checks the indexed record before trusting it, so a
+    record whose id was edited in place causes a rebuild instead of a wrong
+    answer.  Editing a record's id in place does not make the *new* id
+    findable until reindex() is called; replacing the record does.
+    """
+
+    def reindex(self):
+        self._index = None
+
+    def id_index(self):
+        if self._index is None:
+            self._index = build_id_index(self)
+        return self._index
+
+    def find_id(self, idval):
+        idstr = str(idval)
+        pos = self.id_index().get(idstr)
+        if pos is None:
+            return None
+        if pos < len(self) and str(self[pos].get('id')) == idstr:
+            return pos
+        self._index = None
+        return self.id_index().get(idstr)
+
+    def get_id(self, idval, default=None):
+        pos = self.find_id(idval)
+        if pos is None:
+            return default
+        return self[pos]
+
+
+class CatalogView(IdIndexed, tuple):
+    """Read-only top-level catalog list shared by every caller"""
+
+    def __init__(self, records=()):
+        self._index = None
+
+
+class CatalogList(IdIndexed, list):
+    """
+    Mutable catalog list returned to callers.
+
+    Structural changes (append, del, slice assignment, ...) drop the id
+    index; it is rebuilt on the next find_id().
+    """
+
+    __slots__ = ('_index',)
+
+    def __init__(self, records=(), index=None):
+        list.__init__(self, records)
+        self._index = index
+
+    def _changed(method):
+        def wrapper(self, *args, **kwargs):
+            self._index = None
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    __setitem__ = _changed(list.__setitem__)
+    __delitem__ = _changed(list.__delitem__)
+    __iadd__ = _changed(list.__iadd__)
+    __imul__ = _changed(list.__imul__)
+    append = _changed(list.append)
+    extend = _changed(list.extend)
+    insert = _changed(list.insert)
+    pop = _changed(list.pop)
+    remove = _changed(list.remove)
+    clear = _changed(list.clear)
+    sort = _changed(list.sort)
+    reverse = _changed(list.reverse)
+    del _changed
+
+    def __add__(self, other):
+        return CatalogList(list.__add__(self, other))
+
+
+_NESTED = (dict, list, tuple)
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Building tens of thousands of records triggers many useless GC passes"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def freeze(value, top=True):
+    """Return a read-only version of decoded JSON data (lists become tuples)"""
+    if isinstance(value, dict):
+        frozen = ReadOnlyDict(value)
+        for k, v in value.items():
+            if isinstance(v, _NESTED):
+                dict.__setitem__(frozen, k, freeze(v, False))
+        return frozen
+    if isinstance(value, (list, tuple)):
+        items = [freeze(v, False) if isinstance(v, _NESTED) else v for v in value]
+        if top:
+            return CatalogView(items)
+        return tuple(items)
+    return value
+
+
+def thaw(value, top=True):
+    """Return a private, mutable copy of data produced by freeze()"""
+    if isinstance(value, dict):
+        thawed = dict(value)
+        for k, v in value.items():
+            if isinstance(v, _NESTED):
+                thawed[k] = thaw(v, False)
+        return thawed
+    if isinstance(value, (list, tuple)):
+        if top:
+            with gc_paused():
+                # Same order as the view, so its id index (if built) still applies
+                return CatalogList([thaw(v, False) if isinstance(v, _NESTED) else v for v in value],
+                                   getattr(value, '_index', None))
+        return [thaw(v, False) if isinstance(v, _NESTED) else v for v in value]
+    return value
+
+
+def file_stamp(filename, extra=()):
+    """
+    (path, size, mtime_ns) used to decide whether a cached decode is still
+    valid, followed by (size, mtime_ns) or None for each file in ``extra``
+    that the decode also depends on (such as a journal).
+    """
+    path = os.path.abspath(filename)
+    st = os.stat(path)
+    stamp = (path, st.st_size, st.st_mtime_ns)
+    for extrafile in extra:
+        try:
+            xst = os.stat(extrafile)
+            stamp += ((xst.st_size, xst.st_mtime_ns),)
+        except OSError:
+            stamp += (None,)
+    return stamp
+
+
+class CatalogEntry:
+    __slots__ = ('stamp', 'view', 'derived')
+
+    def __init__(self, stamp, view):
+        self.stamp = stamp
+        # None when only derived structures are kept (load_derived() with
+        # keep_view=False); the next load() decodes the file again
+        self.view = view
+        # Structures built from view (record store, search indexes, ...);
+        # a new entry replaces them together with the view they came from
+        self.derived = {}
+
+
+class CatalogCache:
+    """
+    Decoded catalog files keyed by absolute path.
+
+    load() returns the cached read-only view when the file stamp is
+    unchanged and otherwise calls ``decoder(filename)`` to decode it again.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def load(self, filename, decoder, extra=()):
+        stamp = file_stamp(filename, extra)
+        with self._lock:
+            entry = self._entries.get(stamp[0])
+            if entry is not None and entry.stamp == stamp and entry.view is not None:
+                self.hits += 1
+                return entry.view
+            self.misses += 1
+            with gc_paused():
+                view = freeze(decoder(filename))
+            if entry is not None and entry.stamp == stamp:
+                # Same file: keep what was built from the earlier decode
+                entry.view = view
+            else:
+                self._entries[stamp[0]] = CatalogEntry(stamp, view)
+            return view
+
+    def current(self, filename, extra=()):
+        """The cached view of ``filename`` if it is still valid, else None (never decodes)"""
+        stamp = file_stamp(filename, extra)
+        with self._lock:
+            entry = self._entries.get(stamp[0])
+            if entry is not None and entry.stamp == stamp:
+                return entry.view
+            return None
+
+    def load_derived(self, filename, decoder, name, builder, extra=()):
+        """
+        Return ``builder(view)`` for the current decode of ``filename``,
+        building it once per decode and caching it under ``name``.
+        """
+        with self._lock:
+            stamp = file_stamp(filename, extra)
+            entry = self._entries.get(stamp[0])
+            if entry is not None and entry.stamp == stamp and name in entry.derived:
+                self.hits += 1
+                return entry.derived[name]
+            view = self.load(filename, decoder, extra)
+            entry = self._entries[os.path.abspath(filename)]
+            if entry.view is view and name in entry.derived:
+                return entry.derived[name]
+            with gc_paused():
+                value = builder(view)
+            if entry.view is view:
+                entry.derived[name] = value
+            return value
+
+    def load_standalone(self, filename, decoder, name, builder, extra=()):
+        """
+        Like load_derived(), but when the file is not already decoded the
+        decode is only used to build the structure and is not kept, so a
+        caller that replaces the records (a RecordStore) does not keep the
+        list of dicts alive as well.
+        """
+        with self._lock:
+            stamp = file_stamp(filename, extra)
+            entry = self._entries.get(stamp[0])
+            if entry is not None and entry.stamp == stamp:
+                if name in entry.derived:
+                    self.hits += 1
+                    return entry.derived[name]
+                if entry.view is not None:
+                    return self.load_derived(filename, decoder, name, builder, extra)
+            self.misses += 1
+            with gc_paused():
+                value = builder(decoder(filename))
+            if entry is None or entry.stamp != stamp:
+                entry = self._entries[stamp[0]] = CatalogEntry(stamp, None)
+            entry.derived[name] = value
+            return value
+
+    def store(self, filename, data, extra=()):
+        """Replace the cached decode of a file that was just written with ``data``"""
+        stamp = file_stamp(filename, extra)
+        with self._lock, gc_paused():
+            self._entries[stamp[0]] = CatalogEntry(stamp, freeze(data))
+
+    def invalidate(self, filename=None):
+        """Drop one cached file, or everything when filename is None"""
+        with self._lock:
+            if filename is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            if self._entries.pop(os.path.abspath(filename), None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'files': sorted(self._entries.keys())
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+
+CATALOG_CACHE = CatalogCache()
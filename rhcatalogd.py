@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+rhcatalogd.py - Warm catalog query server for the CLI tools
+
+search.py, rhinfo.py, pb_randomhack.py and pb_randomlevel.py each started a
+fresh interpreter, imported cryptography/requests/compress and decoded the
+catalog before doing any real work.  rhcatalogd keeps the decoded catalog,
+the search, fuzzy and facet indexes and the log.txt/pnums.dat store in
+memory and answers their queries over a Unix domain socket (JSON lines,
+see rhquery.py).  Every request re-checks the files (a stat() each), so
+edits made by other tools are picked up without restarting the server.
+
+The same operations run in-process through handle() when no server is
+listening, which is what rhquery.call() falls back to.
+
+Usage:
+    python3 rhcatalogd.py [--socket PATH]        (runs until Ctrl-C / SIGTERM)
+    RHTOOLS_CATALOGD=0 python3 search.py ...     (bypass a running server)
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socketserver
+
+import rhquery
+import rhcatalog
+import rhselect
+import loadsmwrh
+
+def _project(record, fields):
+    if record is None:
+        return None
+    if fields:
+        return dict((f, rhcatalog.thaw(record[f])) for f in fields if f in record)
+    return rhcatalog.thaw(record)
+
+
+def op_ping(args):
+    return {'pid': os.getpid(), 'records': len(loadsmwrh.get_hacklist_data(readonly=True))}
+
+
+def op_info(args):
+    """Records for ``ids`` (None for unknown ids); merged=True adds cached metadata"""
+    merged = bool(args.get('merged'))
+    return [_project(loadsmwrh.get_hack_info(str(i), merged), None) for i in args.get('ids', [])]
+
+
+def op_search(args):
+    """
+    Full-text search (rhsearch query syntax).  When nothing matches and
+    fuzzy=k is given, the k closest names/authors are returned instead with
+    "fuzzy": true.  An empty query returns the whole catalog.
+    """
+    query = args.get('query', '')
+    project = args.get('project')
+    fuzzy = False
+    if query.strip():
+        records = loadsmwrh.get_search_index().search_records(query, fields=args.get('fields'),
+                                                              fallback=args.get('fallback', True))
+        if not(records) and args.get('fuzzy'):
+            fuzzy = True
+            records = [loadsmwrh.get_hack_info(m.hackid)
+                       for m in loadsmwrh.get_fuzzy_index().top(query, k=int(args['fuzzy']))]
+    else:
+        records = loadsmwrh.get_hacklist_data(readonly=True)
+    return {'records': [_project(r, project) for r in records], 'fuzzy': fuzzy}
+
+
+def _selection(args):
+    """(facets, bits) for an rhselect ``query`` with ``defaults``, minus ``exclude`` ids"""
+    facets = loadsmwrh.get_facet_index()
+    plan = rhselect.compile_query(args.get('query', ''), args.get('defaults', ''))
+    bits = plan.bits(facets, loadsmwrh.level_store)
+    if args.get('exclude'):
+        bits &= ~facets.id_bits(args['exclude'])
+    return facets, bits
+
+
+def op_type_counts(args):
+    """[[type, count], ...] of the hacks a selection query matches, in catalog order"""
+    facets, bits = _selection(args)
+    return [[k, v] for k, v in facets.type_counts(bits)]
+
+
+def op_random_hack(args):
+    """Id of a random hack matching a selection query (rhselect.py), or None"""
+    facets, bits = _selection(args)
+    record = facets.sample_record(bits)
+    return None if record is None else record['id']
+
+
+OPS = {
+    'ping': op_ping,
+    'info': op_info,
+    'search': op_search,
+    'type_counts': op_type_counts,
+    'random_hack': op_random_hack,
+}
+
+
+def handle(op, args):
+    if not(op in OPS):
+        raise rhquery.QueryError('unknown op: ' + str(op))
+    return OPS[op](args or {})
+
+
+def warm():
+    """Decode the catalog and build the indexes before the first request"""
+    started = time.time()
+    hacklist = loadsmwrh.get_hacklist_data(readonly=True)
+    loadsmwrh.get_search_index()
+    loadsmwrh.get_fuzzy_index()
+    loadsmwrh.get_facet_index().level_bits(loadsmwrh.level_store())
+    return len(hacklist), time.time() - started
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line.decode('utf8'))
+                if req.get('rhmd_file') != rhquery.catalog_file():
+                    reply = {'ok': False, 'unavailable': True,
+                             'error': 'server uses a different catalog file'}
+                else:
+                    reply = {'ok': True, 'result': handle(req.get('op'), req.get('args'))}
+            except Exception as err:
+                reply = {'ok': False, 'error': '%s: %s' % (type(err).__name__, err)}
+            self.wfile.write((json.dumps(reply) + '\n').encode('utf8'))
+            self.wfile.flush()
+
+
+class CatalogServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path):
+    if os.path.exists(path):
+        try:
+            rhquery.request('ping', {}, path, timeout=2)
+            print('rhcatalogd already running on ' + path)
+            return 1
+        except (rhquery.Unavailable, rhquery.QueryError, ValueError):
+            os.unlink(path)  # left behind by a server that died
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    count, elapsed = warm()
+    old_umask = os.umask(0o077)
+    try:
+        server = CatalogServer(path, RequestHandler)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print('rhcatalogd: %d hacks loaded in %.2fs, listening on %s' % (count, elapsed, path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    path = rhquery.socket_path()
+    if '--socket' in args:
+        path = args[args.index('--socket') + 1]
+    sys.exit(serve(path))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+rhcontainer.py - Block-encrypted random-access container for catalog files
+
+The original catalog format is '*' + Fernet(LZMA(json)) over the whole
+list, so reading one record means decrypting and decompressing all of
+them.  The container splits the record list into blocks of BLOCK_RECORDS
+records; each block is LZMA-compressed and Fernet-encrypted on its own,
+and an encrypted index maps every record id to (block, position).
+Looking up one id decrypts the index and a single block.
+
+File layout:
+    header   16 bytes   magic 'RHBLOCK2', records per block (u32),
+                        length of the index token (u32)
+    index    ...        Fernet(LZMA(json {"version", "count", "blocks", "ids"}))
+    blocks   ...        Fernet(LZMA(json [record, ...])) back to back
+
+"blocks" lists [offset, length, records] per block, offsets relative to
+the end of the index; "ids" maps str(id) -> [block, position].
+
+Usage:
+    import rhcontainer
+    rhcontainer.write_container('rhmd.dat', hacklist, frn)
+    box = rhcontainer.open_container('rhmd.dat', frn)
+    record = box.get_id('12345')       # decrypts one block
+    hacklist = box.records()           # whole list, in order
+"""
+
+import os
+import json
+import lzma
+import struct
+import threading
+
+MAGIC = b'RHBLOCK2'
+HEADER = struct.Struct('<8sII')
+BLOCK_RECORDS = 64
+
+# Decoded blocks kept per open container
+BLOCK_CACHE_SIZE = 16
+
+
+def is_container(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _seal(frn, value):
+    return frn.encrypt(lzma.compress(bytes(json.dumps(value), 'utf8'), preset=6))
+
+
+def _open(frn, token):
+    return json.loads(lzma.decompress(frn.decrypt(bytes(token))))
+
+
+def encode_container(records, frn, block_records=BLOCK_RECORDS):
+    """Serialize a record list into container bytes"""
+    blocks = []
+    table = []
+    ids = {}
+    offset = 0
+    for bno, start in enumerate(range(0, len(records), block_records)):
+        chunk = list(records[start:start + block_records])
+        for pos, rec in enumerate(chunk):
+            if isinstance(rec, dict) and 'id' in rec:
+                ids.setdefault(str(rec['id']), [bno, pos])
+        token = _seal(frn, chunk)
+        blocks.append(token)
+        table.append([offset, len(token), len(chunk)])
+        offset += len(token)
+    index = _seal(frn, {'version': 2, 'count': len(records), 'blocks': table, 'ids': ids})
+    return HEADER.pack(MAGIC, block_records, len(index)) + index + b''.join(blocks)
+
+
+def write_container(filename, records, frn, block_records=BLOCK_RECORDS):
+    data = encode_container(records, frn, block_records)
+    with open(filename + '.new', 'wb') as f:
+        f.write(data)
+    os.replace(filename + '.new', filename)
+
+
+class Container:
+    """Random access to one container file"""
+
+    def __init__(self, filename, frn):
+        self.filename = filename
+        self.frn = frn
+        self._lock = threading.Lock()
+        self._blocks = {}
+        with open(filename, 'rb') as f:
+            magic, self.block_records, ilen = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('Not a block container: ' + filename)
+            index = _open(frn, f.read(ilen))
+        if index.get('version') != 2:
+            raise ValueError('Unsupported container version in ' + filename)
+        self.count = index['count']
+        self.table = index['blocks']
+        self.ids = index['ids']
+        self.data_offset = HEADER.size + ilen
+
+    def __len__(self):
+        return self.count
+
+    def block(self, bno):
+        """Decrypted records of block ``bno`` (a fresh list on every call)"""
+        with self._lock:
+            plain = self._blocks.get(bno)
+        if plain is None:
+            offset, length, _ = self.table[bno]
+            with open(self.filename, 'rb') as f:
+                f.seek(self.data_offset + offset)
+                token = f.read(length)
+            plain = lzma.decompress(self.frn.decrypt(token))
+            with self._lock:
+                if len(self._blocks) >= BLOCK_CACHE_SIZE:
+                    self._blocks.pop(next(iter(self._blocks)))
+                self._blocks[bno] = plain
+        return json.loads(plain)
+
+    def find_id(self, idval):
+        """(block, position) of a record id, or None"""
+        loc = self.ids.get(str(idval))
+        return tuple(loc) if loc else None
+
+    def get_id(self, idval, default=None):
+        loc = self.find_id(idval)
+        if loc is None:
+            return default
+        return self.block(loc[0])[loc[1]]
+
+    def records(self):
+        with open(self.filename, 'rb') as f:
+            f.seek(self.data_offset)
+            data = f.read()
+        hacklist = []
+        for offset, length, _ in self.table:
+            hacklist.extend(_open(self.frn, data[offset:offset + length]))
+        return hacklist
+
+
+_containers = {}
+_containers_lock = threading.Lock()
+
+
+def open_container(filename, frn):
+    """Container for ``filename``, reused while the file is unchanged"""
+    st = os.stat(filename)
+    key = os.path.abspath(filename)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _containers_lock:
+        cached = _containers.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    box = Container(filename, frn)
+    with _containers_lock:
+        _containers[key] = (stamp, box)
+    return box
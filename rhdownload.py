@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+rhdownload.py - Resumable, pooled download manager
+
+Pset zips (get_patch_raw_blob), SMWC zips (do_smwc_findnew.py) and patch
+URLs (smw_repatch_url.py) were fetched with a bare requests.get(): the whole
+response buffered in memory, then written out, and a dropped connection
+meant starting again from zero.
+
+DownloadManager streams each response into <dest>.part through one pooled
+requests.Session, feeding the checksums as the bytes arrive.  An existing
+.part file (from a dropped connection, or an earlier run) is resumed with
+an HTTP Range request; its bytes are hashed from disk first, so the final
+digest still covers the whole file.  A server that ignores Range (200
+instead of 206) restarts the file.  The .part file replaces <dest> only
+after size and checksums match; on a mismatch it is deleted.
+
+<dest>.part.json records the URL (and the ETag / Last-Modified validator)
+a .part file was started from.  A .part file from another URL, or one with
+no record, is discarded instead of resumed, and the validator is sent as
+If-Range so a file that changed on the server is sent again in full.
+
+Transfers to the same host are limited to ``per_host`` at a time (the
+session's connection pool is sized to match); fetch_many() runs up to
+``max_workers`` transfers overall.
+
+Usage:
+    dl = rhdownload.DownloadManager(per_host=2)
+    dl.fetch(url, 'blobs/s_pblob_1.zip', checksums={'sha224': '...'})
+    results = dl.fetch_many([{'url': u, 'dest': d}, ...])     # paths or exceptions
+    dl.close()
+"""
+
+import os
+import json
+import time
+import hashlib
+import platform
+import threading
+import collections
+import concurrent.futures
+from urllib.parse import urlsplit
+
+import requests
+
+CHUNK_SIZE = 1 << 16
+USER_AGENT = f'rhtools-download/1.0 ({platform.platform()}; Python/{platform.python_version()})'
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ContentError(DownloadError):
+    """Size, checksum or validation mismatch; the .part file is removed"""
+    pass
+
+
+def _host(url):
+    parts = urlsplit(url)
+    return '%s://%s' % (parts.scheme, parts.netloc)
+
+
+def _content_range_start(value):
+    # "bytes 1000-1999/5000" -> 1000
+    try:
+        return int(value.split()[1].split('-')[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _read_part_info(part):
+    try:
+        with open(part + '.json', 'r') as f:
+            info = json.load(f)
+        return info if isinstance(info, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_part_info(part, url, resp):
+    info = {'url': url, 'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified')}
+    with open(part + '.json.new', 'w') as f:
+        json.dump(info, f)
+    os.replace(part + '.json.new', part + '.json')
+
+
+def _remove_part(part):
+    for path in (part, part + '.json'):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class DownloadManager:
+
+    def __init__(self, per_host=2, max_workers=4, timeout=60, retries=4, backoff=1.0,
+                 chunk_size=CHUNK_SIZE, session=None):
+        self.per_host = per_host
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self._own_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=max(per_host, max_workers),
+                                                    pool_maxsize=per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+        self.session = session
+        self._lock = threading.Lock()
+        self._hosts = collections.defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self.stats = {'requests': 0, 'resumed': 0, 'restarted': 0, 'bytes': 0, 'retries': 0}
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _host_slot(self, url):
+        with self._lock:
+            return self._hosts[_host(url)]
+
+    def fetch(self, url, dest, checksums=None, size=None, validate=None, progress=None):
+        """
+        Download ``url`` to ``dest`` and return ``dest``.  ``checksums`` maps
+        hashlib names to expected hex digests, ``size`` is the expected
+        length, ``validate(part_path)`` may reject the content by returning
+        False.  ``progress(done, total)`` is called as data arrives (total may
+        be None).  Raises DownloadError (ContentError for bad content).
+        """
+        checksums = dict((k, v.lower()) for k, v in (checksums or {}).items())
+        part = dest + '.part'
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        if os.path.exists(part):
+            info = _read_part_info(part)
+            if info is None or info.get('url') != url:
+                # Started from another URL (or unknown): never splice it
+                self._count('restarted')
+                _remove_part(part)
+        attempt = 0
+        while True:
+            try:
+                digests = self._transfer(url, part, checksums, progress)
+                break
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as err:
+                attempt += 1
+                if attempt > self.retries:
+                    raise DownloadError('%s: %s (after %d attempts)' % (url, err, attempt))
+                self._count('retries')
+                time.sleep(self.backoff * attempt)
+        self._verify(part, checksums, digests, size, validate, url)
+        os.replace(part, dest)
+        _remove_part(part)
+        return dest
+
+    def _hashers(self, part, checksums):
+        hashers = dict((name, hashlib.new(name)) for name in checksums)
+        offset = 0
+        if os.path.exists(part):
+            with open(part, 'rb') as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    for h in hashers.values():
+                        h.update(chunk)
+        return hashers, offset
+
+    def _transfer(self, url, part, checksums, progress):
+        hashers, offset = self._hashers(part, checksums)
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes=%d-' % offset
+            info = _read_part_info(part) or {}
+            if info.get('etag') or info.get('last_modified'):
+                headers['If-Range'] = info.get('etag') or info.get('last_modified')
+        with self._host_slot(url):
+            self._count('requests')
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                if resp.status_code == 416 and offset:
+                    # Nothing left to send: complete if the server's length
+                    # ("bytes */N") is what we have, otherwise start over
+                    length = (resp.headers.get('Content-Range') or '').rpartition('/')[2]
+                    if length.isdigit() and int(length) != offset:
+                        _remove_part(part)
+                        raise requests.ConnectionError('%s: .part file longer than the file, restarting' % url)
+                    return None
+                if resp.status_code == 206 and offset and _content_range_start(resp.headers.get('Content-Range')) == offset:
+                    self._count('resumed')
+                    mode = 'ab'
+                elif resp.status_code == 200:
+                    if offset:
+                        self._count('restarted')
+                        hashers = dict((name, hashlib.new(name)) for name in checksums)
+                        offset = 0
+                    mode = 'wb'
+                    _write_part_info(part, url, resp)
+                else:
+                    raise DownloadError('%s: HTTP %d %s' % (url, resp.status_code, resp.reason))
+                total = resp.headers.get('Content-Length')
+                total = offset + int(total) if total and total.isdigit() else None
+                done = offset
+                with open(part, mode) as f:
+                    for chunk in resp.iter_content(self.chunk_size):
+                        f.write(chunk)
+                        for h in hashers.values():
+                            h.update(chunk)
+                        done += len(chunk)
+                        self._count('bytes', len(chunk))
+                        if progress:
+                            progress(done, total)
+                if total is not None and done < total:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        'connection closed at %d of %d bytes' % (done, total))
+        return dict((name, h.hexdigest()) for name, h in hashers.items())
+
+    def _verify(self, part, checksums, digests, size, validate, url):
+        actual_size = os.path.getsize(part) if os.path.exists(part) else None
+        problem = None
+        if actual_size is None:
+            problem = 'no data'
+        elif size is not None and actual_size != size:
+            problem = 'size %d, expected %d' % (actual_size, size)
+        elif checksums:
+            if digests is None:
+                # 416 path: nothing was streamed, hash the file
+                hashers, offset = self._hashers(part, checksums)
+                digests = dict((name, h.hexdigest()) for name, h in hashers.items())
+            for name, expected in checksums.items():
+                if digests[name] != expected:
+                    problem = '%s %s, expected %s' % (name, digests[name], expected)
+                    break
+        if problem is None and validate is not None and not validate(part):
+            problem = 'rejected by validator'
+        if problem:
+            _remove_part(part)
+            raise ContentError('%s: %s' % (url, problem))
+
+    def fetch_many(self, jobs, max_workers=None):
+        """
+        Run fetch(**job) for each dict in ``jobs`` concurrently; returns a
+        list in the same order holding dest paths or the raised exceptions.
+        """
+        def run(job):
+            try:
+                return self.fetch(**job)
+            except Exception as err:
+                return err
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            return list(pool.map(run, jobs))
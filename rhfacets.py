@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+rhfacets.py - Facet bitmap index for random hack selection
+
+pb_randomhack.py, pb_randomlevel.py and the chatbot's !rhrandom filtered the
+whole catalog with chains of list(filter(lambda ...)) (type regex, demo,
+racelevel, contest, excluded tags) and then shuffled the survivors to take
+element 0.  FacetIndex keeps one bitset per facet value, as a Python int
+with bit N standing for catalog position N:
+
+    type      one per distinct type ("Kaizo: Expert", ...)
+    tag       one per distinct tag
+    flags     demo, racelevel, contest
+    levels    has a usable patch number in pnums.dat, has playable levels
+              in log.txt (from an rhlevellog store, rebuilt when it changes)
+
+and, built on first use, the distinct authors strings and sorted columns
+of length (exits), rating and added date for range queries (rhselect.py).
+
+Filter combinations are bitwise AND/OR/NOT (~bits is fine: results are
+masked with ``all``), counts are popcounts, and sample() picks a uniformly
+random set bit without building a list.
+
+Usage:
+    facets = rhfacets.FacetIndex(hacklist)
+    bits = facets.type_bits('kaizo') & ~facets.flags['demo'] & ~facets.tag_bits(['adult content'])
+    pos = facets.sample(bits)
+    record = facets.record(pos) if pos is not None else None
+    facets.type_counts(bits)        # [('Kaizo: Expert', 1234), ...]
+"""
+
+import re
+import bisect
+import random
+import threading
+
+import rhlevellog
+
+YES_VALUES = ('yes', 'true', '1')
+NO_VALUES = ('', 'false', 'no', '0')
+FLAGS = ('demo', 'racelevel', 'contest')
+# pb_randomlevel.py: a playable log.txt level line has at least this many fields
+LEVEL_MIN_TOKENS = 7
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+if hasattr(int, 'bit_count'):     # Python 3.10+
+    popcount = int.bit_count
+
+
+def bits_from_positions(positions, size):
+    buf = bytearray((size + 7) // 8)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def iter_positions(bits):
+    """Set bit positions, lowest first"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for i, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield (i << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+def _leading_int(value):
+    m = re.match(r'\s*(\d+)', str(value))
+    return int(m.group(1)) if m else None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date(value):
+    # "2021-05-16 10:00:00 AM" -> "2021-05-16", which sorts as a string
+    value = str(value or '')[0:10]
+    return value if re.match(r'\d{4}', value) else None
+
+
+# Sortable key of a record field for range_bits(); None leaves a hack out
+COLUMNS = {
+    'length': _leading_int,
+    'rating': _float,
+    'added': _date,
+}
+
+
+def _flag_value(value):
+    return not(str(value).lower() in NO_VALUES)
+
+
+def record_flags(record):
+    """Names of the FLAGS facets a record belongs to"""
+    tags = record.get('tags') or ()
+    flags = []
+    if str(record.get('demo', '')).lower() in YES_VALUES or 'demo' in tags:
+        flags.append('demo')
+    if 'racelevel' in tags or _flag_value(record.get('racelevel', '')):
+        flags.append('racelevel')
+    if 'contestlevel' in tags or _flag_value(record.get('contest', '')):
+        flags.append('contest')
+    return flags
+
+
+class FacetIndex:
+
+    def __init__(self, records):
+        self._records = records
+        self.size = len(records)
+        self.all = (1 << self.size) - 1
+        self._lock = threading.Lock()
+        self._positions = {}
+        types = {}
+        tags = {}
+        flags = dict((f, []) for f in FLAGS)
+        for pos, rec in enumerate(records):
+            self._positions.setdefault(str(rec.get('id')), pos)
+            types.setdefault(rec.get('type', ''), []).append(pos)
+            for tag in set(rec.get('tags') or ()):
+                tags.setdefault(tag, []).append(pos)
+            for flag in record_flags(rec):
+                flags[flag].append(pos)
+        # Insertion order is catalog order of first appearance (type listings)
+        self.types = dict((k, bits_from_positions(v, self.size)) for k, v in types.items())
+        self.tags = dict((k, bits_from_positions(v, self.size)) for k, v in tags.items())
+        self.flags = dict((k, bits_from_positions(v, self.size)) for k, v in flags.items())
+        self._type_cache = {}
+        self._level_cache = {}
+        self._values = {}
+        self._columns = {}
+
+    def __len__(self):
+        return self.size
+
+    def record(self, pos):
+        return self._records[pos]
+
+    def records(self, bits):
+        return [self._records[pos] for pos in iter_positions(bits & self.all)]
+
+    def type_bits(self, pattern):
+        """Hacks whose type matches the case-insensitive regex ``pattern``"""
+        bits = self._type_cache.get(pattern)
+        if bits is None:
+            rx = re.compile(pattern, re.I)
+            bits = 0
+            for typename, tbits in self.types.items():
+                if rx.search(typename):
+                    bits |= tbits
+            if len(self._type_cache) > 256:
+                self._type_cache.clear()
+            self._type_cache[pattern] = bits
+        return bits
+
+    def value_bits(self, field, pattern):
+        """Hacks whose ``field`` value matches the case-insensitive regex ``pattern``"""
+        if field == 'type':
+            return self.type_bits(pattern)
+        with self._lock:
+            values = self._values.get(field)
+            if values is None:
+                values = {}
+                for pos, rec in enumerate(self._records):
+                    values.setdefault(str(rec.get(field, '')), []).append(pos)
+                self._values[field] = values
+        rx = re.compile(pattern, re.I)
+        positions = []
+        for value, plist in values.items():
+            if rx.search(value):
+                positions.extend(plist)
+        return bits_from_positions(positions, self.size)
+
+    def range_bits(self, field, lo=None, hi=None, lo_open=False, hi_open=False):
+        """Hacks whose COLUMNS[field] key is within lo..hi (None: unbounded)"""
+        with self._lock:
+            column = self._columns.get(field)
+            if column is None:
+                parse = COLUMNS[field]
+                pairs = []
+                for pos, rec in enumerate(self._records):
+                    key = parse(rec.get(field))
+                    if key is not None:
+                        pairs.append((key, pos))
+                pairs.sort()
+                column = self._columns[field] = ([k for k, p in pairs], [p for k, p in pairs])
+        keys, positions = column
+        start = 0
+        end = len(keys)
+        if lo is not None:
+            start = (bisect.bisect_right if lo_open else bisect.bisect_left)(keys, lo)
+        if hi is not None:
+            end = (bisect.bisect_left if hi_open else bisect.bisect_right)(keys, hi)
+        return bits_from_positions(positions[start:end], self.size)
+
+    def tag_bits(self, tags):
+        """Hacks having any of ``tags``"""
+        bits = 0
+        for tag in tags:
+            bits |= self.tags.get(tag, 0)
+        return bits
+
+    def id_bits(self, hackids):
+        return bits_from_positions([self._positions[str(h)] for h in hackids
+                                    if str(h) in self._positions], self.size)
+
+    def level_bits(self, levelstore, codes=rhlevellog.INCLUDE_CODES, min_tokens=LEVEL_MIN_TOKENS):
+        """
+        (pnum, playable): hacks with a usable (non-zero numeric) patch number
+        in pnums.dat, and hacks with log.txt levels of one of ``codes``.
+        Rebuilt only when the store has changed.
+        """
+        levelstore.ensure_loaded()
+        key = (id(levelstore), tuple(codes), min_tokens)
+        with self._lock:
+            cached = self._level_cache.get(key)
+            if cached is not None and cached[0] == levelstore.version:
+                return cached[1], cached[2]
+            pnum = []
+            for hackid, value in levelstore.pnums().items():
+                if hackid in self._positions and value.isdigit() and int(value):
+                    pnum.append(self._positions[hackid])
+            playable = []
+            for hackid in levelstore.hack_ids():
+                if hackid in self._positions and any(len(e.tokens) >= min_tokens
+                                                     for e in levelstore.entries_for(hackid, codes)):
+                    playable.append(self._positions[hackid])
+            result = (bits_from_positions(pnum, self.size), bits_from_positions(playable, self.size))
+            self._level_cache[key] = (levelstore.version,) + result
+            return result
+
+    def count(self, bits):
+        return popcount(bits & self.all)
+
+    def type_counts(self, bits):
+        """[(type, count)] of the hacks in ``bits``, types in catalog order"""
+        bits &= self.all
+        result = []
+        for typename, tbits in self.types.items():
+            n = popcount(bits & tbits)
+            if n:
+                result.append((typename, n))
+        return result
+
+    def sample(self, bits, rnd=random):
+        """Position of a uniformly chosen set bit, or None when ``bits`` is 0"""
+        bits &= self.all
+        total = popcount(bits)
+        if total == 0:
+            return None
+        target = rnd.randrange(total)
+        # Smallest width whose low bits hold more than ``target`` set bits
+        lo, hi = 0, bits.bit_length()
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if popcount(bits & ((1 << mid) - 1)) > target:
+                hi = mid
+            else:
+                lo = mid
+        return hi - 1
+
+    def sample_record(self, bits, rnd=random):
+        pos = self.sample(bits, rnd)
+        return None if pos is None else self._records[pos]
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+rhfuzzy.py - Trigram similarity index for misspelled hack name/author lookups
+
+!rhsearch and search.py only found exact words, and returned the first hit
+in catalog order.  FuzzyIndex breaks every distinct (normalized) hack name
+and author string into trigrams (" ma", "mar", ..., "io ": pg_trgm style,
+minus its very common one-letter "  m" grams) and keeps a posting list per
+trigram.  A lookup counts shared trigrams for the strings that have any,
+and ranks them by
+
+    score = (dice(query, text) + shared / trigrams(query)) / 2
+
+so a close misspelling of a whole name and a correctly spelled part of a
+longer name both rank high.  An exact (normalized) match scores 1.0.
+
+The index is kept in sync with the catalog by sync(), which only touches
+hacks that were added, removed or renamed, and then drops strings no hack
+uses any more.  When the decoded-catalog sidecar is enabled,
+loadsmwrh.get_fuzzy_index() also stores it in cache/ between runs, so
+db_addhack.py adding one hack only indexes that hack.
+
+Usage:
+    index = rhfuzzy.FuzzyIndex()
+    index.sync(hacklist)
+    for m in index.top('supr marioo wrld', k=5):
+        print(m.score, m.hackid, m.field, m.text)
+"""
+
+import os
+import re
+import array
+import marshal
+import threading
+from collections import Counter, namedtuple
+
+FIELDS = ('name', 'authors')
+FORMAT_VERSION = 1
+
+FuzzyMatch = namedtuple('FuzzyMatch', ['score', 'hackid', 'field', 'text'])
+
+_NONWORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    return ' '.join(_NONWORD.sub(' ', str(text).lower()).split())
+
+
+def trigrams(text):
+    """Set of trigrams of normalized ``text``, each word padded with spaces"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = ' ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def similarity(query, text):
+    """Score of ``text`` for ``query`` without an index (same formula as top())"""
+    q = trigrams(query)
+    t = trigrams(text)
+    if not q or not t:
+        return 0.0
+    if normalize(query) == normalize(text):
+        return 1.0
+    return _score(len(q & t), len(q), len(t))
+
+
+def _score(shared, qlen, tlen):
+    return (2.0 * shared / (qlen + tlen) + float(shared) / qlen) / 2.0
+
+
+class FuzzyIndex:
+
+    def __init__(self, fields=FIELDS):
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self._strings = []          # string id -> normalized text
+        self._sizes = array.array('H')
+        self._string_ids = {}       # normalized text -> string id
+        self._owners = []           # string id -> {(hackid, field)}
+        self._postings = {}         # trigram -> array of string ids
+        self._docs = {}             # hackid -> tuple of field values
+        self._order = {}            # hackid -> catalog position (tie breaks)
+        self.changed = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _string_id(self, text):
+        sid = self._string_ids.get(text)
+        if sid is None:
+            sid = len(self._strings)
+            grams = trigrams(text)
+            self._strings.append(text)
+            self._sizes.append(min(len(grams), 65535))
+            self._string_ids[text] = sid
+            self._owners.append(set())
+            for g in grams:
+                plist = self._postings.get(g)
+                if plist is None:
+                    self._postings[g] = array.array('i', (sid,))
+                else:
+                    plist.append(sid)
+        return sid
+
+    def _values(self, record):
+        return tuple(str(record.get(f) or '') for f in self.fields)
+
+    def add(self, record, position=None):
+        """Index (or re-index) one hack record"""
+        with self._lock:
+            hackid = str(record.get('id'))
+            values = self._values(record)
+            if self._docs.get(hackid) == values:
+                return
+            self.remove(hackid)
+            self._docs[hackid] = values
+            self._order[hackid] = len(self._order) if position is None else position
+            for field, value in zip(self.fields, values):
+                text = normalize(value)
+                if text:
+                    self._owners[self._string_id(text)].add((hackid, field))
+            self.changed = True
+
+    def remove(self, hackid):
+        with self._lock:
+            hackid = str(hackid)
+            values = self._docs.pop(hackid, None)
+            if values is None:
+                return
+            self._order.pop(hackid, None)
+            for field, value in zip(self.fields, values):
+                sid = self._string_ids.get(normalize(value))
+                if sid is not None:
+                    self._owners[sid].discard((hackid, field))
+            self.changed = True
+
+    def sync(self, records):
+        """Bring the index in line with a catalog; returns the number of hacks re-indexed"""
+        with self._lock:
+            updated = 0
+            seen = set()
+            for pos, rec in enumerate(records):
+                hackid = str(rec.get('id'))
+                seen.add(hackid)
+                self._order[hackid] = pos
+                if self._docs.get(hackid) != self._values(rec):
+                    self.add(rec, pos)
+                    updated += 1
+            for hackid in [h for h in self._docs if not(h in seen)]:
+                self.remove(hackid)
+                updated += 1
+            if updated:
+                self.prune()
+            return updated
+
+    def prune(self):
+        """Drop strings no hack uses any more (after renames and removals)"""
+        with self._lock:
+            remap = []
+            live = 0
+            for owners in self._owners:
+                if owners:
+                    remap.append(live)
+                    live += 1
+                else:
+                    remap.append(-1)
+            if live == len(self._strings):
+                return 0
+            dead = len(self._strings) - live
+            keep = [sid for sid, new in enumerate(remap) if new >= 0]
+            self._strings = [self._strings[sid] for sid in keep]
+            self._sizes = array.array('H', (self._sizes[sid] for sid in keep))
+            self._owners = [self._owners[sid] for sid in keep]
+            self._string_ids = {t: i for i, t in enumerate(self._strings)}
+            for g in list(self._postings):
+                plist = array.array('i', (remap[sid] for sid in self._postings[g] if remap[sid] >= 0))
+                if plist:
+                    self._postings[g] = plist
+                else:
+                    del self._postings[g]
+            self.changed = True
+            return dead
+
+    def top(self, query, k=5, fields=None, min_score=0.4):
+        """The ``k`` best matching hacks, best first, as FuzzyMatch tuples"""
+        if k <= 0:
+            return []
+        fields = self.fields if fields is None else tuple(fields)
+        qtext = normalize(query)
+        qgrams = trigrams(qtext)
+        if not qgrams:
+            return []
+        with self._lock:
+            counts = Counter()
+            for g in qgrams:
+                plist = self._postings.get(g)
+                if plist is not None:
+                    counts.update(plist)
+            qlen = len(qgrams)
+            # Fewest shared trigrams that can still reach min_score
+            need = 1
+            while need < qlen and _score(need, qlen, need) < min_score:
+                need += 1
+            sizes = self._sizes
+            half = 0.5 / qlen
+            scored = []
+            for sid, shared in counts.items():
+                if shared >= need:
+                    # _score() inlined, this loop is the hot part of a lookup
+                    score = shared / (qlen + sizes[sid]) + shared * half
+                    if score >= min_score:
+                        scored.append((score, sid))
+            exact = self._string_ids.get(qtext)
+            if exact is not None:
+                scored.append((1.0, exact))
+            # Best strings first; many hacks can share one name or author, so
+            # stop once k hacks are collected and the next string scores lower
+            scored.sort(reverse=True)
+            best = {}
+            for score, sid in scored:
+                if len(best) >= k and score < last:
+                    break
+                for hackid, field in self._owners[sid]:
+                    if field in fields and not(hackid in best):
+                        best[hackid] = (score, field)
+                        last = score
+            order = self._order
+            ranked = sorted(best.items(), key=lambda item: (-item[1][0], order.get(item[0], 0)))[0:k]
+            return [FuzzyMatch(round(s, 4), hackid, field, self._field_value(hackid, field))
+                    for hackid, (s, field) in ranked]
+
+    def _field_value(self, hackid, field):
+        return self._docs[hackid][self.fields.index(field)]
+
+    def rank(self, query, hackids, fields=None):
+        """Order ``hackids`` by similarity to ``query`` (best first, stable)"""
+        fields = self.fields if fields is None else tuple(fields)
+        with self._lock:
+            def key(item):
+                pos, hackid = item
+                values = self._docs.get(str(hackid), ())
+                score = max([similarity(query, v) for f, v in zip(self.fields, values)
+                             if f in fields] or [0.0])
+                return (-score, pos)
+            return [h for pos, h in sorted(enumerate(hackids), key=key)]
+
+    # Persistence: marshal of plain containers, written atomically
+
+    def save(self, path):
+        with self._lock:
+            data = {'version': FORMAT_VERSION, 'fields': self.fields,
+                    'strings': self._strings, 'sizes': self._sizes.tobytes(),
+                    'owners': [tuple(o) for o in self._owners],
+                    'postings': {g: p.tobytes() for g, p in self._postings.items()},
+                    'docs': self._docs, 'order': self._order}
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path + '.new', 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(path + '.new', path)
+            self.changed = False
+
+    @classmethod
+    def load(cls, path, fields=FIELDS):
+        """Index saved by save(), or None when missing/unreadable/other fields"""
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.load(f)
+            if data.get('version') != FORMAT_VERSION or tuple(data['fields']) != tuple(fields):
+                return None
+            index = cls(fields)
+            index._strings = data['strings']
+            index._sizes.frombytes(data['sizes'])
+            index._string_ids = {t: i for i, t in enumerate(index._strings)}
+            index._owners = [set(o) for o in data['owners']]
+            for g, raw in data['postings'].items():
+                plist = index._postings[g] = array.array('i')
+                plist.frombytes(raw)
+            index._docs = data['docs']
+            index._order = data['order']
+            return index
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+            return None
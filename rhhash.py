@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+rhhash.py - Single-pass multi-digest hashing and memoized file hashes
+
+pb_repatch.py, smw_repatch_url.py and mkblob.py computed shake_128, sha1
+and sha224 in three separate passes over each patch and ROM, and
+path_rerequisites() read and hashed the 512 KB smw.sfc twice per launch.
+digests() feeds every requested hash from one pass over a buffer (in
+chunks, so each chunk is hashed while it is still in cache, or one thread
+per digest for large buffers on multi-core machines); file_digests() does
+the same while reading a file.
+
+file_sha224() remembers a file's SHA-224 by (inode, size, mtime), for the
+process and, given a stamp file, across runs, so smw.sfc is only read
+again after it changes.
+
+Digest names are hashlib names; 'shake_128' is returned the way the rest
+of the tools name files (patch/<shake1>, rom/<id>_<shake1>.sfc): base64 of
+a 24-byte digest with '_-' as the extra characters.  Everything else is
+hex.
+
+Usage:
+    d = rhhash.digests(data)                # {'shake_128': ..., 'sha1': ..., 'sha224': ...}
+    shake1, sha1, sha224 = rhhash.triple(data)
+    rhhash.file_sha224('smw.sfc', stamp_path='cache/filestamps.json')
+"""
+
+import os
+import json
+import base64
+import hashlib
+import threading
+
+DEFAULT_NAMES = ('shake_128', 'sha1', 'sha224')
+CHUNK = 1 << 20
+PARALLEL_MIN = 1 << 20
+SHAKE_LENGTH = 24
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def shake1(data):
+    """The tools' shake_128 file name for ``data``"""
+    return _format('shake_128', hashlib.shake_128(data))
+
+
+def _format(name, h):
+    if name == 'shake_128':
+        return base64.b64encode(h.digest(SHAKE_LENGTH), b'_-').decode('latin1')
+    if name.startswith('shake_'):
+        return h.hexdigest(SHAKE_LENGTH)
+    return h.hexdigest()
+
+
+def _finish(hashers):
+    return dict((name, _format(name, h)) for name, h in hashers.items())
+
+
+def _update_all(h, view):
+    for start in range(0, len(view), CHUNK):
+        h.update(view[start:start + CHUNK])
+
+
+def digests(data, names=DEFAULT_NAMES):
+    """{name: digest} of ``data`` for every hashlib name in ``names``, one pass"""
+    hashers = dict((name, hashlib.new(name)) for name in names)
+    view = memoryview(data)
+    if len(view) >= PARALLEL_MIN and len(hashers) > 1 and (os.cpu_count() or 1) > 1:
+        # hashlib releases the GIL while hashing, so big buffers get one
+        # thread per digest
+        threads = [threading.Thread(target=_update_all, args=(h, view)) for h in hashers.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return _finish(hashers)
+    for start in range(0, len(view), CHUNK):
+        chunk = view[start:start + CHUNK]
+        for h in hashers.values():
+            h.update(chunk)
+    return _finish(hashers)
+
+
+def triple(data):
+    """(shake1, sha1, sha224) as stored in pat_* / result_* fields"""
+    d = digests(data)
+    return d['shake_128'], d['sha1'], d['sha224']
+
+
+def file_digests(path, names=DEFAULT_NAMES):
+    """digests() of a file, read once in CHUNK blocks"""
+    hashers = dict((name, hashlib.new(name)) for name in names)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            for h in hashers.values():
+                h.update(chunk)
+    return _finish(hashers)
+
+
+def _stamp_key(st):
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _load_stamps(stamp_path):
+    try:
+        with open(stamp_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def file_sha224(path, stamp_path=None):
+    """
+    SHA-224 of a file, hashed again only when its (inode, size, mtime)
+    changes.  With ``stamp_path`` the result is also kept in that JSON file.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = _stamp_key(st)
+    with _memo_lock:
+        cached = _memo.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    stamps = None
+    if stamp_path:
+        stamps = _load_stamps(stamp_path)
+        entry = stamps.get(path)
+        if entry and entry.get('stat') == key and entry.get('sha224'):
+            with _memo_lock:
+                _memo[path] = (key, entry['sha224'])
+            return entry['sha224']
+    sha224 = file_digests(path, ('sha224',))['sha224']
+    # A file modified while it was read gets a new stamp next time
+    if _stamp_key(os.stat(path)) == key:
+        with _memo_lock:
+            _memo[path] = (key, sha224)
+        if stamp_path:
+            stamps[path] = {'stat': key, 'sha224': sha224}
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(stamp_path)), exist_ok=True)
+                with open(stamp_path + '.new', 'w') as f:
+                    json.dump(stamps, f)
+                os.replace(stamp_path + '.new', stamp_path)
+            except OSError:
+                pass
+    return sha224
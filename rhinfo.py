@@ -1,14 +1,18 @@
 #!/usr/bin/python3
 
-from loadsmwrh import *
 import os
 import sys
 import json
+import rhquery
 
+# Answered by a running rhcatalogd.py when there is one; otherwise
+# get_hack_info() only decrypts the needed block of a converted catalog,
+# so the whole list is not loaded up front
 if 'FILENAME' in os.environ:
-   hacklist = get_hacklist_data(filename=os.environ['FILENAME'])
-else:
-   hacklist = get_hacklist_data()
+   os.environ['RHMD_FILE'] = os.environ['FILENAME']
+
+def get_hack_info(hackid):
+    return rhquery.call('info', ids=[hackid])[0]
 
 if len(sys.argv)<=1:
    print('Usage: ' + sys.argv[0] + ' hackid ')
@@ -24,4 +28,3 @@ if len(sys.argv)>2:
         print(",")
         print(json.dumps(he, indent=4, sort_keys=True))
     #print(json.dumps(hlist, indent=4, sort_keys=True))
-
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+rhipfs.py - Hedged multi-gateway IPFS fetch with a persisted scoreboard
+
+Pset entries carry an ``ipfs`` CID next to ``publicUrl``, but nothing in
+the Python tools fetched by CID, and the recorded ``*_ipfs_url`` always
+named one hard-coded gateway.
+
+HedgedFetcher.fetch(cid, verify) asks the best-scoring gateway first and,
+if it has not answered after ``hedge_delay`` seconds (or as soon as it
+fails), the next one as well, up to ``max_parallel`` requests in flight.
+The first response that ``verify(data)`` accepts wins and the others are
+abandoned.  Every gateway's outcome goes into a Scoreboard: an EWMA of
+successful response times and of the failure rate (errors, timeouts and
+responses that fail verification), saved as JSON so later runs start with
+the gateway that has been fastest and most reliable.
+
+Gateways are URL templates with a %CID% placeholder, as in the electron
+app's ipfsgateways table (see update_ipfs_gateways.js); gateways_from_db()
+reads that table, ordered by priority.  Gateways without a score keep
+their configured order.
+
+Usage:
+    board = rhipfs.Scoreboard('cache/ipfs_gateways.json')
+    fetcher = rhipfs.HedgedFetcher(rhipfs.DEFAULT_GATEWAYS, board)
+    data, gateway = fetcher.fetch(cid, verify=lambda data: sha224(data) == expected)
+    print(board.report())
+"""
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import platform
+import threading
+
+import requests
+
+DEFAULT_GATEWAYS = (
+    'https://ipfs.io/ipfs/%CID%',
+    'https://gateway.pinata.cloud/ipfs/%CID%',
+    'https://cloudflare-ipfs.com/ipfs/%CID%',
+    'https://dweb.link/ipfs/%CID%',
+    'https://ipfs.4everland.io/ipfs/%CID%',
+    'https://ipfs.filebase.io/ipfs/%CID%',
+)
+USER_AGENT = f'rhtools-ipfs/1.0 ({platform.platform()}; Python/{platform.python_version()})'
+
+ALPHA = 0.3                # weight of the newest sample in the EWMAs
+UNKNOWN_LATENCY = 5.0      # assumed response time of a gateway with no successes
+FAILURE_PENALTY = 30.0     # seconds added to the score per unit of failure rate
+
+
+class IpfsError(Exception):
+    pass
+
+
+def gateway_url(gateway, cid):
+    """URL of ``cid`` on a gateway template (%CID%, or a prefix ending in /ipfs/)"""
+    if '%CID%' in gateway:
+        return gateway.replace('%CID%', cid)
+    if not gateway.endswith('/'):
+        gateway += '/'
+    if not gateway.endswith('/ipfs/'):
+        gateway += 'ipfs/'
+    return gateway + cid
+
+
+def gateways_from_db(path):
+    """Gateway templates from an ipfsgateways table (patchbin.db), by priority"""
+    if not os.path.exists(path):
+        return []
+    try:
+        conn = sqlite3.connect('file:%s?mode=ro' % path, uri=True)
+        try:
+            rows = conn.execute('SELECT url FROM ipfsgateways ORDER BY priority ASC').fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [row[0] for row in rows if row[0]]
+
+
+class Scoreboard:
+    """Per-gateway latency and failure-rate EWMAs, kept in a JSON file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.gateways = {}
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    self.gateways = json.load(f).get('gateways', {})
+            except (OSError, ValueError, AttributeError):
+                self.gateways = {}
+
+    def _entry(self, gateway):
+        return self.gateways.setdefault(gateway, {'latency': None, 'failure': 0.0, 'ok': 0,
+                                                  'errors': 0, 'last_error': None})
+
+    def record_success(self, gateway, elapsed):
+        with self._lock:
+            entry = self._entry(gateway)
+            if entry['latency'] is None:
+                entry['latency'] = elapsed
+            else:
+                entry['latency'] += ALPHA * (elapsed - entry['latency'])
+            entry['failure'] -= ALPHA * entry['failure']
+            entry['ok'] += 1
+            entry['last_success'] = int(time.time())
+
+    def record_failure(self, gateway, error):
+        with self._lock:
+            entry = self._entry(gateway)
+            entry['failure'] += ALPHA * (1.0 - entry['failure'])
+            entry['errors'] += 1
+            entry['last_error'] = str(error)[0:200]
+            entry['last_failure'] = int(time.time())
+
+    def score(self, gateway):
+        """Expected cost of asking ``gateway`` (lower is better)"""
+        entry = self.gateways.get(gateway)
+        if entry is None:
+            return UNKNOWN_LATENCY
+        latency = entry['latency'] if entry['latency'] is not None else UNKNOWN_LATENCY
+        return latency + FAILURE_PENALTY * entry['failure']
+
+    def order(self, gateways):
+        """``gateways`` best first; ties keep the configured order"""
+        with self._lock:
+            return sorted(gateways, key=self.score)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps({'gateways': self.gateways}, indent=1)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + '.new', 'w') as f:
+                f.write(data)
+            os.replace(self.path + '.new', self.path)
+        except OSError:
+            pass
+
+    def report(self):
+        lines = []
+        with self._lock:
+            ranked = sorted(self.gateways, key=self.score)
+            for gateway in ranked:
+                entry = self.gateways[gateway]
+                latency = '-' if entry['latency'] is None else '%.2fs' % entry['latency']
+                lines.append('%-45s latency %7s  failure %4.0f%%  ok %d  errors %d'
+                             % (gateway, latency, entry['failure'] * 100, entry['ok'], entry['errors']))
+        return '\n'.join(lines)
+
+
+class HedgedFetcher:
+
+    def __init__(self, gateways, scoreboard=None, hedge_delay=1.5, max_parallel=3, timeout=30,
+                 max_size=256 << 20, session=None):
+        self.gateways = list(gateways)
+        self.scoreboard = scoreboard if scoreboard is not None else Scoreboard()
+        self.hedge_delay = hedge_delay
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self.max_size = max_size
+        self._own_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=len(self.gateways) or 1,
+                                                    pool_maxsize=max_parallel)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+        self.session = session
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def best_gateway(self):
+        ordered = self.scoreboard.order(self.gateways)
+        return ordered[0] if ordered else None
+
+    def _get(self, gateway, cid, cancel, results):
+        started = time.monotonic()
+        try:
+            chunks = []
+            size = 0
+            with self.session.get(gateway_url(gateway, cid), stream=True, timeout=self.timeout) as resp:
+                if resp.status_code != 200:
+                    raise IpfsError('HTTP %d %s' % (resp.status_code, resp.reason))
+                for chunk in resp.iter_content(1 << 16):
+                    if cancel.is_set():
+                        results.put((gateway, None, None, None))
+                        return
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise IpfsError('response larger than %d bytes' % self.max_size)
+            results.put((gateway, b''.join(chunks), None, time.monotonic() - started))
+        except Exception as err:
+            results.put((gateway, None, err, time.monotonic() - started))
+
+    def fetch(self, cid, verify=None):
+        """
+        (data, gateway) for ``cid`` from the first gateway whose response
+        ``verify(data)`` accepts; IpfsError when every gateway fails.
+        """
+        pending = self.scoreboard.order(self.gateways)
+        if not pending:
+            raise IpfsError('no IPFS gateways configured')
+        results = queue.Queue()
+        cancel = threading.Event()
+        in_flight = 0
+        errors = []
+        next_hedge = None
+        try:
+            while pending or in_flight:
+                now = time.monotonic()
+                if pending and in_flight < self.max_parallel and (in_flight == 0 or now >= next_hedge):
+                    gateway = pending.pop(0)
+                    threading.Thread(target=self._get, args=(gateway, cid, cancel, results),
+                                     daemon=True).start()
+                    in_flight += 1
+                    next_hedge = now + self.hedge_delay
+                    continue
+                wait = None
+                if pending and in_flight < self.max_parallel:
+                    wait = max(0.0, next_hedge - now)
+                try:
+                    gateway, data, err, elapsed = results.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                in_flight -= 1
+                if err is None and data is not None and verify is not None and not verify(data):
+                    err = IpfsError('content failed verification')
+                if err is not None:
+                    self.scoreboard.record_failure(gateway, err)
+                    errors.append('%s: %s' % (gateway, err))
+                    # Don't wait out the hedge delay after a failure
+                    next_hedge = time.monotonic()
+                    continue
+                self.scoreboard.record_success(gateway, elapsed)
+                return data, gateway
+        finally:
+            cancel.set()
+            self.scoreboard.save()
+        raise IpfsError('%s: no gateway returned valid content (%s)' % (cid, '; '.join(errors)))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+rhjournal.py - Append-only encrypted delta journal for .dat files
+
+Saving rhmd.dat / resmd.dat / rhad.dat rewrites, LZMA-compresses and
+Fernet-encrypts the whole file, even when a single record (or a single
+"downloaded" timestamp) changed.  A journal sits beside the file as
+<file>.jnl and records only the changes; the loaders replay it on top of
+the base file, and once it grows past a fraction of the base file it is
+compacted: the merged data is written as a new base file and the journal
+is removed.
+
+Journal layout: one Fernet token per line, each decrypting to JSON.
+    line 1    {"journal": 1, "base_sha224": ..., "base_size": ...}
+    line 2..  [op, op, ...]            one batch per save
+
+Ops are {"op": "put", "key": k, "value": v} or {"op": "del", "key": k}.
+For catalog lists the key is the record id; for dicts (rhad.dat) it is the
+dict key.  The header binds the journal to one exact base file, so a
+journal left behind by an interrupted compaction, or a base file replaced
+from elsewhere, is ignored instead of being replayed onto the wrong data.
+A torn line (crash during append) fails to decrypt and is skipped; the
+next append cuts it off first.
+
+Usage:
+    import rhjournal
+    jnl = rhjournal.Journal('rhad.dat', frn)
+    jnl.append([rhjournal.put_op('12345', {'done': 'Done'})])
+    notes = rhjournal.replay_dict(notes, jnl.read_ops())
+"""
+
+import os
+import json
+import hashlib
+
+JOURNAL_SUFFIX = '.jnl'
+
+# Compact once the journal is larger than this fraction of the base file
+# (but never before it reaches COMPACT_MIN_BYTES)
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 256 * 1024
+
+_base_digests = {}
+
+
+def journal_path(filename):
+    return filename + JOURNAL_SUFFIX
+
+
+def base_digest(filename):
+    """sha224 of the base file, memoized per (path, size, mtime_ns)"""
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+    digest = _base_digests.get(key)
+    if digest is None:
+        h = hashlib.sha224()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _base_digests[key] = digest
+    return digest, st.st_size
+
+
+def put_op(key, value):
+    return {'op': 'put', 'key': str(key), 'value': value}
+
+
+def del_op(key):
+    return {'op': 'del', 'key': str(key)}
+
+
+class Journal:
+    """Journal of ``filename``, encrypted with the same Fernet key as the file"""
+
+    def __init__(self, filename, frn):
+        self.filename = filename
+        self.path = journal_path(filename)
+        self.frn = frn
+
+    def _token(self, value):
+        return self.frn.encrypt(bytes(json.dumps(value), 'utf8')).decode('ascii') + '\n'
+
+    def _header(self):
+        digest, size = base_digest(self.filename)
+        return {'journal': 1, 'base_sha224': digest, 'base_size': size}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read_ops(self):
+        """Ops recorded against the current base file, oldest first"""
+        if not(self.exists()) or not(os.path.exists(self.filename)):
+            return []
+        with open(self.path, 'r') as f:
+            lines = f.read().split('\n')
+        ops = []
+        try:
+            header = json.loads(self.frn.decrypt(bytes(lines[0], 'ascii')))
+        except Exception:
+            print('Ignoring unreadable journal ' + self.path)
+            return []
+        if header != self._header():
+            print('Ignoring journal ' + self.path + ': it belongs to a different version of ' + self.filename)
+            return []
+        for line in lines[1:]:
+            if not(line):
+                continue
+            try:
+                ops.extend(json.loads(self.frn.decrypt(bytes(line, 'ascii'))))
+            except Exception:
+                print('Skipping unreadable entry in journal ' + self.path)
+        return ops
+
+    def append(self, ops):
+        """Append one batch of ops; starts a fresh journal if the current one is stale"""
+        if not(ops):
+            return
+        fresh = True
+        if self.exists():
+            with open(self.path, 'r') as f:
+                first = f.readline().strip()
+            try:
+                fresh = json.loads(self.frn.decrypt(bytes(first, 'ascii'))) != self._header()
+            except Exception:
+                fresh = True
+        if not(fresh):
+            self._drop_torn_tail()
+        with open(self.path, 'w' if fresh else 'a') as f:
+            if fresh:
+                f.write(self._token(self._header()))
+            f.write(self._token(ops))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_torn_tail(self):
+        # An interrupted append leaves a line without its newline; cut it off
+        # so the next batch starts on a line of its own
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not(data.endswith(b'\n')):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
+
+    def needs_compaction(self):
+        jsize = self.size()
+        try:
+            bsize = os.path.getsize(self.filename)
+        except OSError:
+            return True
+        return jsize > max(COMPACT_MIN_BYTES, bsize * COMPACT_RATIO)
+
+
+def replay_list(records, ops):
+    """Apply ops to a list of records keyed by record id (in place when possible)"""
+    if not(ops):
+        return records
+    records = list(records) if isinstance(records, tuple) else records
+    index = {}
+    for pos, rec in enumerate(records):
+        index.setdefault(str(rec.get('id')), pos)
+    deleted = False
+    for op in ops:
+        pos = index.get(op['key'])
+        if op['op'] == 'put':
+            if pos is None:
+                index[op['key']] = len(records)
+                records.append(op['value'])
+            else:
+                records[pos] = op['value']
+        elif op['op'] == 'del' and pos is not None:
+            records[pos] = None
+            del index[op['key']]
+            deleted = True
+    if deleted:
+        records[:] = [rec for rec in records if rec is not None]
+    return records
+
+
+def replay_dict(data, ops):
+    """Apply ops to a dict (in place)"""
+    for op in ops:
+        if op['op'] == 'put':
+            data[op['key']] = op['value']
+        elif op['op'] == 'del':
+            data.pop(op['key'], None)
+    return data
+
+
+def same(a, b):
+    """JSON equality, treating tuples (from read-only views) and lists alike"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if len(a) != len(b):
+            return False
+        for k, v in a.items():
+            if not(k in b) or not(same(v, b[k])):
+                return False
+        return True
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b and type(a) == type(b)
+
+
+def diff_list(old, new):
+    """
+    Ops turning record list ``old`` into ``new``, or None when the change
+    cannot be expressed as puts/deletes by id (duplicate ids, reordered
+    records, new records not at the end).
+    """
+    oldpos = {}
+    for pos, rec in enumerate(old):
+        key = str(rec.get('id'))
+        if key in oldpos:
+            return None
+        oldpos[key] = pos
+    ops = []
+    seen = set()
+    last = -1
+    appending = False
+    for rec in new:
+        key = str(rec.get('id'))
+        if key in seen:
+            return None
+        seen.add(key)
+        pos = oldpos.get(key)
+        if pos is None:
+            appending = True
+            ops.append(put_op(key, rec))
+            continue
+        if appending or pos < last:
+            return None
+        last = pos
+        if not(same(old[pos], rec)):
+            ops.append(put_op(key, rec))
+    for key in oldpos:
+        if not(key in seen):
+            ops.append(del_op(key))
+    return ops
+
+
+def diff_dict(old, new):
+    """Ops turning dict ``old`` into dict ``new``"""
+    ops = []
+    for key, value in new.items():
+        if not(key in old) or not(same(old[key], value)):
+            ops.append(put_op(key, value))
+    for key in old:
+        if not(key in new):
+            ops.append(del_op(key))
+    return ops
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+rhlevellog.py - Indexed, in-memory store for log.txt and pnums.dat
+
+log.txt lines describe levels of a hack that are usable for random level
+play:
+
+    > <hackid> <level hex> <patch num> <level dec> <timestamp|_> <code> [difficulty hex] [note]
+
+pnums.dat maps a hack id to its default patch number:
+
+    <hackid> <patch num>
+
+pb_lvlrand.py, pb_randomlevel.py, loadsmwrh.get_pnum() and the GUI used to
+open and scan these files on every call.  LevelLogStore parses them once,
+indexes log entries by hack id, and on refresh() only parses lines appended
+since the last read (a file that shrank or was replaced is re-read).
+
+Usage:
+    store = rhlevellog.get_store('log.txt', 'pnums.dat')
+    store.refresh()                         # cheap: stat + new lines only
+    store.get_pnum('12345')                 # '3' or None
+    for entry in store.entries_for('12345'):
+        entry.level, entry.pnum, entry.code, entry.tokens
+    store.count_levels('12345')             # no file I/O
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+# Codes of levels that can be played (same list pb_lvlrand.py uses)
+INCLUDE_CODES = ('+', '_', 'B', 'G', 'M')
+
+LogEntry = namedtuple('LogEntry', ['kind', 'hackid', 'level', 'pnum', 'level_dec', 'ts',
+                                   'code', 'diff', 'note', 'tokens'])
+
+
+def _int(value, base=10):
+    try:
+        return int(value, base)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_log_line(line):
+    """LogEntry for one log.txt line, or None for blank/comment/short lines"""
+    tokens = [x for x in line.strip().split(' ') if len(x) > 0]
+    if len(tokens) < 2 or tokens[0] == '#':
+        return None
+
+    def field(i):
+        return tokens[i] if len(tokens) > i else None
+
+    ts = field(5)
+    return LogEntry(kind=tokens[0], hackid=tokens[1],
+                    level=_int(field(2), 16), pnum=_int(field(3)), level_dec=_int(field(4)),
+                    ts=None if ts in (None, '_') else _int(ts),
+                    code=field(6), diff=_int(field(7), 16) if field(7) else 0,
+                    note=field(8) or '', tokens=tokens)
+
+
+class _TailReader:
+    """Reads a text file incrementally: the lines added since the last call"""
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.ident = None
+        self.offset = 0
+        self.open_line = False
+
+    def read_new_lines(self):
+        """(replaced, lines): replaced is True when earlier lines must be discarded"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            replaced = self.ident is not None
+            self.reset()
+            return replaced, []
+        ident = (st.st_dev, st.st_ino)
+        replaced = False
+        if ident != self.ident or st.st_size < self.offset or (self.open_line and st.st_size != self.offset):
+            # Replaced, truncated, or the unterminated last line grew: start over
+            replaced = self.ident is not None
+            self.reset()
+            self.ident = ident
+        if st.st_size == self.offset:
+            return replaced, []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        self.open_line = not(data.endswith(b'\n'))
+        return replaced, data.decode('utf8', 'replace').splitlines()
+
+
+class LevelLogStore:
+
+    def __init__(self, log_path='log.txt', pnums_path='pnums.dat'):
+        self._lock = threading.RLock()
+        self._log = _TailReader(log_path)
+        self._pnums_file = _TailReader(pnums_path)
+        self._clear_log()
+        self._pnums = {}
+        self.loaded = False
+        self.version = 0    # bumped whenever refresh() changes anything
+
+    def _clear_log(self):
+        self._entries = []
+        self._by_hack = {}
+
+    def refresh(self):
+        """Pick up changes to both files; returns the number of new log entries"""
+        with self._lock:
+            replaced, lines = self._log.read_new_lines()
+            changed = replaced
+            if replaced:
+                self._clear_log()
+            added = 0
+            for line in lines:
+                entry = parse_log_line(line)
+                if entry is None:
+                    continue
+                self._entries.append(entry)
+                self._by_hack.setdefault(entry.hackid, []).append(entry)
+                added += 1
+
+            replaced, pnum_lines = self._pnums_file.read_new_lines()
+            if replaced:
+                self._pnums = {}
+            for line in pnum_lines:
+                tokens = [x for x in line.strip().split(' ') if len(x) > 0]
+                if len(tokens) >= 2:
+                    self._pnums[tokens[0]] = tokens[1]
+            if changed or replaced or lines or pnum_lines:
+                self.version += 1
+            self.loaded = True
+            return added
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.refresh()
+
+    def entries(self):
+        self.ensure_loaded()
+        return self._entries
+
+    def entries_for(self, hackid, codes=None):
+        """Log entries of one hack, optionally only those with a code in ``codes``"""
+        self.ensure_loaded()
+        entries = self._by_hack.get(str(hackid), [])
+        if codes is None:
+            return list(entries)
+        return [e for e in entries if e.code in codes]
+
+    def hack_ids(self):
+        self.ensure_loaded()
+        return list(self._by_hack.keys())
+
+    def get_pnum(self, hackid):
+        """Patch number from pnums.dat as written there (a string), or None"""
+        self.ensure_loaded()
+        return self._pnums.get(str(hackid))
+
+    def get_pnum_int(self, hackid):
+        value = self.get_pnum(hackid)
+        if value is None or not value.isdigit():
+            return None
+        return int(value)
+
+    def pnums(self):
+        self.ensure_loaded()
+        return dict(self._pnums)
+
+    def count_levels(self, hackid, codes=INCLUDE_CODES):
+        """Playable log entries of a hack listed in pnums.dat (0 otherwise)"""
+        self.ensure_loaded()
+        if not(str(hackid) in self._pnums):
+            return 0
+        return len(self.entries_for(hackid, codes))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(log_path='log.txt', pnums_path='pnums.dat', refresh=True):
+    """Shared store for a pair of files; refresh=False skips even the stat calls"""
+    key = (os.path.abspath(log_path), os.path.abspath(pnums_path))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = LevelLogStore(log_path, pnums_path)
+    if refresh:
+        store.refresh()
+    else:
+        store.ensure_loaded()
+    return store
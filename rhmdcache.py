@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+rhmdcache.py - In-memory TTL layer over rhmd_cache.dat / resmd_cache.dat
+
+The *_cache.dat files hold metadata fetched from the metadata server
+(xdata, patchblob fields) with a "cachets" timestamp.  MetadataCache loads
+such a file once per process, answers lookups from memory with TTL checks,
+and collects new entries until flush(), which merges them with whatever is
+on disk, drops expired entries (compaction) and saves the file once.
+
+Pending entries are flushed when FLUSH_EVERY of them accumulate, and at
+interpreter exit.
+
+Usage:
+    cache = rhmdcache.MetadataCache(path, loader, saver)
+    entry = cache.get('12345')          # None if missing or expired
+    cache.put({'id': '12345', 'xdata': {...}})
+    cache.flush()
+"""
+
+import os
+import time
+import atexit
+import threading
+
+# Entries older than this are treated as missing (seconds)
+DEFAULT_TTL = 86400 * 10
+
+# Per-id overrides; 'meta' entries also need a cachets to be valid
+ID_TTLS = {'meta': 600}
+
+FLUSH_EVERY = 32
+
+
+class MetadataCache:
+    """
+    Keyed, TTL-aware view of one *_cache.dat file.
+
+    ``loader(path)`` returns the record list stored in the file and
+    ``saver(records, path)`` writes a new list.
+    """
+
+    def __init__(self, path, loader, saver, ttl=DEFAULT_TTL, id_ttls=None, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.loader = loader
+        self.saver = saver
+        self.ttl = ttl
+        self.id_ttls = ID_TTLS if id_ttls is None else id_ttls
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._entries = None
+        self._stamp = None
+        self._pending = {}
+        self.loads = 0
+        self.saves = 0
+        atexit.register(self.flush)
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _read(self):
+        entries = {}
+        if os.path.exists(self.path):
+            for rec in self.loader(self.path):
+                entries[str(rec['id'])] = rec
+        self.loads += 1
+        return entries
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._stamp = self._file_stamp()
+            self._entries = self._read()
+
+    def is_fresh(self, rec, now=None):
+        if now is None:
+            now = time.time()
+        idstr = str(rec.get('id'))
+        ttl = self.id_ttls.get(idstr, self.ttl)
+        if not('cachets' in rec):
+            return not(idstr in self.id_ttls)
+        return int(rec['cachets']) + ttl >= int(now)
+
+    def get(self, idval, now=None):
+        """The cached entry for ``idval``, or None when missing or expired"""
+        idstr = str(idval)
+        with self._lock:
+            rec = self._pending.get(idstr)
+            if rec is None:
+                self._ensure_loaded()
+                rec = self._entries.get(idstr)
+            if rec is None or not(self.is_fresh(rec, now)):
+                return None
+            return rec
+
+    def put(self, entry, now=None):
+        """Add or replace an entry; stamped with cachets and written on the next flush"""
+        entry = dict(entry)
+        entry['cachets'] = int(time.time() if now is None else now)
+        with self._lock:
+            self._pending[str(entry['id'])] = entry
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def put_many(self, entries, now=None):
+        """Add several entries and write them with a single save"""
+        stamp = int(time.time() if now is None else now)
+        with self._lock:
+            for entry in entries:
+                entry = dict(entry)
+                entry['cachets'] = stamp
+                self._pending[str(entry['id'])] = entry
+            return self.flush(now)
+
+    def flush(self, now=None, force=False):
+        """Merge pending entries into the file, dropping expired ones; one save"""
+        with self._lock:
+            if not(self._pending) and not(force):
+                return False
+            self._ensure_loaded()
+            if self._file_stamp() != self._stamp:
+                # Written by another process since we loaded it
+                self._entries = self._read()
+            merged = dict(self._entries)
+            merged.update(self._pending)
+            records = [dict(rec) for rec in merged.values() if self.is_fresh(rec, now)]
+            if not(self._pending) and len(records) == len(self._entries):
+                return False
+            self.saver(records, self.path)
+            self.saves += 1
+            self._entries = {str(rec['id']): rec for rec in records}
+            self._stamp = self._file_stamp()
+            self._pending = {}
+            return True
+
+    def compact(self, now=None):
+        """Rewrite the file without expired entries (only if there are any)"""
+        return self.flush(now, force=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': 0 if self._entries is None else len(self._entries),
+                'pending': len(self._pending),
+                'loads': self.loads,
+                'saves': self.saves
+            }
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+rhpatch.py - In-process BPS and IPS patching
+
+pb_repatch.py, smw_repatch_url.py, mkblob.py and verify-all-blobs.py ran
+``flips --apply`` for every ROM, writing the patch and the base ROM to temp
+files and reading the result back.  apply() patches bytes in memory:
+
+    BPS   "BPS1", varint source/target/metadata sizes, actions (SourceRead,
+          TargetRead, SourceCopy, TargetCopy), then source, target and patch
+          CRC32; all three are checked, as flips does
+    IPS   "PATCH", records of (3-byte offset, 2-byte size, data) or RLE
+          (size 0, 2-byte count, 1 byte), "EOF", optional 3-byte truncation
+
+flips is still used when a patch can't be applied in-process (or when
+RHTOOLS_PATCHER=flips), through apply_patch().  Standard library only, so
+verify-all-blobs.py can use it without loadsmwrh's dependencies.
+
+Usage:
+    rom = rhpatch.apply(patchdata, smwdata)                  # PatchError on bad input
+    rom = rhpatch.apply_patch(patchdata, smwdata, rhpatch.find_flips())
+"""
+
+import os
+import zlib
+import shutil
+import tempfile
+import subprocess
+
+BPS_MAGIC = b'BPS1'
+IPS_MAGIC = b'PATCH'
+IPS_EOF = b'EOF'
+
+# Where pb_repatch.py looked for flips, in order
+FLIPS_PATHS = (os.path.join('.', 'flips'), 'flips.exe', '/mnt/c/snesgaming/bin/flips',
+               '/mnt/c/snesgaming/lbin/flips', '/usr/local/bin/flips')
+
+
+class PatchError(ValueError):
+    pass
+
+
+def patch_format(patch):
+    """'bps', 'ips' or None"""
+    if bytes(patch[0:4]) == BPS_MAGIC:
+        return 'bps'
+    if bytes(patch[0:5]) == IPS_MAGIC:
+        return 'ips'
+    return None
+
+
+def _crc32(data):
+    return zlib.crc32(data) & 0xffffffff
+
+
+def _le32(data, pos):
+    return int.from_bytes(data[pos:pos + 4], 'little')
+
+
+def bps_header(patch):
+    """(source_size, target_size, metadata, actions_offset) of a BPS patch"""
+    patch = memoryview(patch)
+    if bytes(patch[0:4]) != BPS_MAGIC:
+        raise PatchError('not a BPS patch')
+    pos = 4
+    values = []
+    for i in range(3):
+        value, pos = _varint(patch, pos, len(patch) - 12)
+        values.append(value)
+    end = pos + values[2]
+    if end > len(patch) - 12:
+        raise PatchError('BPS metadata runs past the end of the patch')
+    return values[0], values[1], bytes(patch[pos:end]), end
+
+
+def _varint(data, pos, end):
+    value = 0
+    shift = 1
+    while True:
+        if pos >= end:
+            raise PatchError('truncated BPS patch')
+        x = data[pos]
+        pos += 1
+        value += (x & 0x7f) * shift
+        if x & 0x80:
+            return value, pos
+        shift <<= 7
+        value += shift
+
+
+def apply_bps(patch, source, verify=True):
+    """Patched ROM (bytes); PatchError on a malformed patch or CRC mismatch"""
+    patch = memoryview(patch)
+    source = memoryview(source)
+    if len(patch) < 4 + 3 + 12:
+        raise PatchError('truncated BPS patch')
+    source_size, target_size, metadata, pos = bps_header(patch)
+    end = len(patch) - 12
+    source_crc = _le32(patch, end)
+    target_crc = _le32(patch, end + 4)
+    if verify:
+        if _crc32(patch[0:end + 8]) != _le32(patch, end + 8):
+            raise PatchError('BPS patch CRC32 mismatch: the patch is damaged')
+        if len(source) != source_size or _crc32(source) != source_crc:
+            raise PatchError('BPS source CRC32 mismatch: wrong base ROM (expected %d bytes, crc32 %08x)'
+                             % (source_size, source_crc))
+
+    target = bytearray(target_size)
+    out = 0
+    source_rel = 0
+    target_rel = 0
+    while pos < end:
+        # varint inlined: this loop runs once per action
+        data = 0
+        shift = 1
+        while True:
+            x = patch[pos]
+            pos += 1
+            data += (x & 0x7f) * shift
+            if x & 0x80:
+                break
+            shift <<= 7
+            data += shift
+            if pos >= end:
+                raise PatchError('truncated BPS patch')
+        command = data & 3
+        length = (data >> 2) + 1
+        if out + length > target_size:
+            raise PatchError('BPS action writes past the end of the target')
+        if command == 0:      # SourceRead
+            if out + length > len(source):
+                raise PatchError('BPS SourceRead past the end of the source')
+            target[out:out + length] = source[out:out + length]
+        elif command == 1:    # TargetRead
+            if pos + length > end:
+                raise PatchError('truncated BPS patch')
+            target[out:out + length] = patch[pos:pos + length]
+            pos += length
+        else:
+            offset, pos = _varint(patch, pos, end)
+            offset = -(offset >> 1) if offset & 1 else offset >> 1
+            if command == 2:  # SourceCopy
+                source_rel += offset
+                if source_rel < 0 or source_rel + length > len(source):
+                    raise PatchError('BPS SourceCopy outside the source')
+                target[out:out + length] = source[source_rel:source_rel + length]
+                source_rel += length
+            else:             # TargetCopy, may overlap its own output
+                target_rel += offset
+                if target_rel < 0 or target_rel >= out:
+                    raise PatchError('BPS TargetCopy outside the target')
+                if target_rel + length <= out:
+                    target[out:out + length] = target[target_rel:target_rel + length]
+                else:
+                    # Byte-wise copy from behind ``out`` repeats the last
+                    # (out - target_rel) bytes
+                    period = bytes(target[target_rel:out])
+                    target[out:out + length] = (period * (length // len(period) + 1))[0:length]
+                target_rel += length
+        out += length
+    if out != target_size:
+        raise PatchError('BPS patch produced %d of %d target bytes' % (out, target_size))
+    if verify and _crc32(target) != target_crc:
+        raise PatchError('BPS target CRC32 mismatch')
+    return bytes(target)
+
+
+def apply_ips(patch, source):
+    """Patched ROM (bytes); IPS has no checksums, only structure is checked"""
+    patch = memoryview(patch)
+    if bytes(patch[0:5]) != IPS_MAGIC:
+        raise PatchError('not an IPS patch')
+    target = bytearray(source)
+    pos = 5
+    size = len(patch)
+    while True:
+        if pos + 3 > size:
+            raise PatchError('truncated IPS patch (no EOF marker)')
+        if patch[pos:pos + 3] == IPS_EOF:
+            pos += 3
+            break
+        if pos + 5 > size:
+            raise PatchError('truncated IPS record')
+        offset = int.from_bytes(patch[pos:pos + 3], 'big')
+        length = int.from_bytes(patch[pos + 3:pos + 5], 'big')
+        pos += 5
+        if length:
+            if pos + length > size:
+                raise PatchError('truncated IPS record')
+            data = patch[pos:pos + length]
+            pos += length
+        else:
+            if pos + 3 > size:
+                raise PatchError('truncated IPS RLE record')
+            length = int.from_bytes(patch[pos:pos + 2], 'big')
+            data = patch[pos + 2:pos + 3].tobytes() * length
+            pos += 3
+        if offset + length > len(target):
+            target.extend(bytes(offset + length - len(target)))
+        target[offset:offset + length] = data
+    if pos + 3 <= size:
+        # Lunar IPS truncation extension
+        truncate = int.from_bytes(patch[pos:pos + 3], 'big')
+        if truncate < len(target):
+            del target[truncate:]
+    return bytes(target)
+
+
+def apply(patch, source):
+    """Apply a BPS or IPS patch to ``source`` in memory"""
+    fmt = patch_format(patch)
+    if fmt == 'bps':
+        return apply_bps(patch, source)
+    if fmt == 'ips':
+        return apply_ips(patch, source)
+    raise PatchError('unknown patch format')
+
+
+def find_flips():
+    """Path of a flips binary, or None"""
+    for path in FLIPS_PATHS:
+        if os.path.exists(path):
+            return path
+    return shutil.which('flips')
+
+
+def apply_flips(patch, source, flips_cmd):
+    """Run ``flips --apply`` on temp copies of ``patch`` and ``source``"""
+    with tempfile.TemporaryDirectory(prefix='rhpatch') as tmp:
+        paths = [os.path.join(tmp, name) for name in ('patch', 'source', 'result')]
+        for path, data in zip(paths, (patch, source)):
+            with open(path, 'wb') as f:
+                f.write(data)
+        proc = subprocess.run([flips_cmd, '--apply'] + paths, capture_output=True)
+        if proc.returncode != 0 or not os.path.exists(paths[2]):
+            raise PatchError('flips failed (exit code %d): %s'
+                             % (proc.returncode, proc.stdout.decode('latin1', 'replace').strip()))
+        with open(paths[2], 'rb') as f:
+            return f.read()
+
+
+def apply_patch(patch, source, flips_cmd=None):
+    """
+    apply(), falling back to flips (when ``flips_cmd`` is given) for patches
+    it rejects.  RHTOOLS_PATCHER=flips always uses flips.
+    """
+    if flips_cmd and os.environ.get('RHTOOLS_PATCHER', '') == 'flips':
+        return apply_flips(patch, source, flips_cmd)
+    try:
+        return apply(patch, source)
+    except PatchError as err:
+        if not flips_cmd:
+            raise
+        print('In-process patching failed (%s), trying %s' % (err, flips_cmd))
+        return apply_flips(patch, source, flips_cmd)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+rhpatchcache.py - Content-addressed caches of decoded patches and patched ROMs
+
+loadsmwrh.get_patch_blob() checks the SHA-224 of the blob, LZMA-decompresses
+it, Fernet-decrypts it, decompresses again and checks the SHA-224 of the
+result on every launch, even for a hack played minutes ago.  PatchCache
+stores the decoded patch under its pat_sha224, so a second launch reads the
+file back and skips the crypto.
+
+Entry files are <cache dir>/<pat_sha224>.pat:
+
+    magic    8 bytes   b'RHPATC02'
+    size     8 bytes   little endian length of the patch
+    sha224   28 bytes  digest of the patch, checked when it was stored
+    patch    ...
+
+A hit checks the magic, that the stored size matches the file and that the
+stored digest is the one asked for; it does not hash the patch again (BPS
+patches carry their own CRC32s, which rhpatch checks).  verify() re-hashes
+every entry.  Entries that fail either check are deleted and count as
+misses.  The file mtime is the last use; put() evicts least recently used
+entries while the cache is over its byte budget.  Hit/miss/eviction
+counters are added to stats.json every STATS_FLUSH_EVERY operations and
+at exit.
+
+RomCache uses the same machinery to remember which rom/ file holds the
+patched ROM for a patch, base ROM and ccrom flag (pb_repatch.py).
+
+Usage:
+    cache = rhpatchcache.PatchCache('cache/patches', budget=256 << 20)
+    data = cache.get(pat_sha224)
+    if data is None:
+        data = decode_patch(...)
+        cache.put(pat_sha224, data)
+    cache.stats(); cache.verify(); cache.purge()
+
+    roms = rhpatchcache.RomCache('cache/roms')
+    key = roms.rom_key(pat_sha224, base_sha224, ccrom)
+    hit = roms.get(key)             # (rom, meta) or None
+    roms.put(key, 'rom/123_x.sfc', rom, {'result_sha224': ...})
+"""
+
+import os
+import json
+import atexit
+import struct
+import hashlib
+import threading
+
+MAGIC = b'RHPATC02'
+HEADER = struct.Struct('<8sQ28s')
+SUFFIX = '.pat'
+DEFAULT_BUDGET = 256 << 20
+STAT_KEYS = ('hits', 'misses', 'stores', 'evictions', 'corrupt')
+STATS_FLUSH_EVERY = 32
+
+
+class PatchCache:
+
+    def __init__(self, path, budget=DEFAULT_BUDGET):
+        self.path = path
+        self.budget = budget
+        self._lock = threading.Lock()
+        self.session = dict((k, 0) for k in STAT_KEYS)
+        self._pending = dict((k, 0) for k in STAT_KEYS)
+        self._pending_ops = 0
+        atexit.register(self.flush_stats)
+
+    def enabled(self):
+        return self.budget > 0
+
+    def entry_path(self, sha224):
+        return os.path.join(self.path, sha224.lower() + SUFFIX)
+
+    def get(self, sha224):
+        """Decoded patch for ``sha224``, or None on a miss"""
+        return self._lookup(sha224)
+
+    def put(self, sha224, data):
+        """Store a decoded patch; ignored (False) if it does not hash to ``sha224``"""
+        digest = hashlib.sha224(data).digest()
+        if digest.hex() != sha224.lower():
+            return False
+        return self._store(sha224, HEADER.pack(MAGIC, len(data), digest), data)
+
+    def _decode(self, raw, key, rehash=False):
+        # Entry contents, or None when the entry is damaged.  Without rehash
+        # only the header is checked against the file and the key
+        if len(raw) < HEADER.size:
+            return None
+        magic, size, digest = HEADER.unpack_from(raw)
+        if magic != MAGIC or size != len(raw) - HEADER.size or digest.hex() != key.lower():
+            return None
+        data = raw[HEADER.size:]
+        if rehash and hashlib.sha224(data).digest() != digest:
+            return None
+        return data
+
+    def verify(self):
+        """Re-hash every entry, removing damaged ones; returns (checked, removed)"""
+        checked = 0
+        removed = 0
+        for mtime, size, path in self.entries():
+            key = os.path.basename(path)[0:-len(SUFFIX)]
+            try:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+            except OSError:
+                continue
+            checked += 1
+            if self._decode(raw, key, rehash=True) is None and self._remove(path):
+                removed += 1
+        if removed:
+            self._count(*(['corrupt'] * removed))
+        return checked, removed
+
+    def _lookup(self, key):
+        if not self.enabled():
+            return None
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            self._count('misses')
+            return None
+        value = self._decode(raw, key)
+        if value is None:
+            self._remove(path)
+            self._count('misses', 'corrupt')
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return value
+
+    def _store(self, key, header, data):
+        if not self.enabled() or len(header) + len(data) > self.budget:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        path = self.entry_path(key)
+        with open(path + '.new', 'wb') as f:
+            f.write(header)
+            f.write(data)
+        os.replace(path + '.new', path)
+        self._count('stores')
+        self.trim()
+        return True
+
+    def entries(self):
+        """[(mtime, size, path)] of all entries, least recently used first"""
+        result = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return result
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+        result.sort()
+        return result
+
+    def trim(self, budget=None):
+        """Evict least recently used entries until the total fits ``budget``"""
+        budget = self.budget if budget is None else budget
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if total <= budget:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        if removed:
+            self._count(*(['evictions'] * removed))
+        return removed
+
+    def purge(self):
+        """Remove every entry; returns the number removed"""
+        removed = 0
+        for mtime, size, path in self.entries():
+            if self._remove(path):
+                removed += 1
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def stats_path(self):
+        return os.path.join(self.path, 'stats.json')
+
+    def _load_stats(self):
+        try:
+            with open(self.stats_path(), 'r') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        return dict((k, int(stats.get(k, 0))) for k in STAT_KEYS)
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self.session[key] += 1
+                self._pending[key] += 1
+            self._pending_ops += 1
+            if self._pending_ops < STATS_FLUSH_EVERY:
+                return
+        self.flush_stats()
+
+    def flush_stats(self):
+        """Add the counts not yet written to stats.json"""
+        with self._lock:
+            if not any(self._pending.values()):
+                self._pending_ops = 0
+                return
+            # Totals across runs; a lost update between two processes only
+            # skews the numbers
+            try:
+                stats = self._load_stats()
+                for key, n in self._pending.items():
+                    stats[key] += n
+                os.makedirs(self.path, exist_ok=True)
+                with open(self.stats_path() + '.new', 'w') as f:
+                    json.dump(stats, f)
+                os.replace(self.stats_path() + '.new', self.stats_path())
+            except OSError:
+                pass
+            self._pending = dict((k, 0) for k in STAT_KEYS)
+            self._pending_ops = 0
+
+    def stats(self):
+        """Totals from stats.json plus the current size of the cache"""
+        self.flush_stats()
+        entries = self.entries()
+        stats = self._load_stats()
+        lookups = stats['hits'] + stats['misses']
+        stats.update({'entries': len(entries),
+                      'bytes': sum(size for mtime, size, path in entries),
+                      'budget': self.budget,
+                      'hit_rate': float(stats['hits']) / lookups if lookups else 0.0,
+                      'session': dict(self.session)})
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            try:
+                os.unlink(self.stats_path())
+            except OSError:
+                pass
+            self.session = dict((k, 0) for k in STAT_KEYS)
+            self._pending = dict((k, 0) for k in STAT_KEYS)
+            self._pending_ops = 0
+
+
+ROM_MAGIC = b'RHROMC02'
+ROM_HEADER = struct.Struct('<8sI')
+DEFAULT_ROM_BUDGET = 4 << 20
+
+
+class RomCache(PatchCache):
+    """
+    Patched ROMs keyed by (pat_sha224, sha224 of the base ROM, ccrom).  The
+    ROM itself is not copied: pb_repatch already writes it to
+    rom/<id>_<shake1>.sfc, so an entry only records that file with the
+    size and SHA-224 of the bytes it holds (the ccSuperMarioWorld.ips result
+    for ccrom entries), plus the caller's dict.  pb_repatch's result_*
+    digests are those of the hack's patch result, before any cc patch.
+    Callers store a ROM only after it matched the hack's result_sha224.
+
+    The rom/ file is outside the cache and its name may be reused, so a hit
+    checks its size and re-hashes it (a few MB at most); a file that changed
+    or is gone makes the entry a miss.  The budget only bounds the entry
+    files.
+
+    Entry files are <cache dir>/<rom_key(...)>.pat:
+
+        magic    8 bytes   b'RHROMC02'
+        metalen  4 bytes   length of the JSON dict
+        meta     ...       {"rom": <path>, "size": ..., "sha224": ..., ...}
+    """
+
+    def __init__(self, path, budget=DEFAULT_ROM_BUDGET):
+        PatchCache.__init__(self, path, budget)
+
+    @staticmethod
+    def rom_key(pat_sha224, base_sha224, ccrom=False):
+        text = '%s:%s:%d' % (pat_sha224.lower(), base_sha224.lower(), 1 if ccrom else 0)
+        return hashlib.sha224(text.encode('ascii')).hexdigest()
+
+    def get(self, key):
+        """(rom, meta) for a rom_key(), or None on a miss"""
+        return self._lookup(key)
+
+    def put(self, key, rom_path, data, meta=None):
+        """Record that ``rom_path`` holds the ROM ``data`` for ``key``"""
+        meta = dict(meta or {})
+        meta.update({'rom': os.path.abspath(rom_path), 'size': len(data),
+                     'sha224': hashlib.sha224(data).hexdigest()})
+        metabytes = json.dumps(meta).encode('utf8')
+        return self._store(key, ROM_HEADER.pack(ROM_MAGIC, len(metabytes)), metabytes)
+
+    def _decode(self, raw, key, rehash=False):
+        if len(raw) < ROM_HEADER.size:
+            return None
+        magic, metalen = ROM_HEADER.unpack_from(raw)
+        if magic != ROM_MAGIC or metalen != len(raw) - ROM_HEADER.size:
+            return None
+        try:
+            meta = json.loads(raw[ROM_HEADER.size:].decode('utf8'))
+            if os.path.getsize(meta['rom']) != meta['size']:
+                return None
+            with open(meta['rom'], 'rb') as f:
+                data = f.read()
+        except (ValueError, KeyError, TypeError, OSError):
+            return None
+        if hashlib.sha224(data).hexdigest() != meta.get('sha224'):
+            return None
+        return data, meta
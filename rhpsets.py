@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+rhpsets.py - Blob manifest for the pset zips in blobs/
+
+When a blob was not in blobs/, get_patch_raw_blob() walked every pset in
+psets.dat (decoded again on every call) with three regexes per entry,
+opened each candidate zip and scanned its infolist() for the blob name.
+
+PsetManifest maps blob name -> (zip key, data offset, compressed size,
+size, CRC32, compression) for every local pset zip, saved as JSON in the
+cache dir.  A zip is indexed once (its central directory and local
+headers) and again only when its size or mtime changes; zips that are no
+longer listed in psets.dat are dropped when psets.dat changes.  Reading a
+blob is one seek and one read on a file handle kept open across calls,
+then inflate (for deflated members) and a CRC32 check.
+
+read_psets() decodes psets.dat once per change of the file.
+
+Usage:
+    manifest = rhpsets.PsetManifest(path_prefix, 'cache/pset_manifest.json')
+    manifest.refresh(psets)                 # after psets.dat changes
+    key = manifest.lookup('pblob_123_abc')
+    data = manifest.read('pblob_123_abc')   # None when not in a local zip
+"""
+
+import os
+import json
+import zlib
+import base64
+import struct
+import threading
+import collections
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, BadZipFile
+
+FORMAT_VERSION = 1
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')   # zipfile's structFileHeader
+LOCAL_MAGIC = b'PK\x03\x04'
+MAX_HANDLES = 8
+
+_psets_memo = {}
+_psets_lock = threading.Lock()
+
+
+def file_stamp(path):
+    """[size, mtime_ns] of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def read_psets(path):
+    """Decoded psets.dat (a list of dicts), cached until the file changes"""
+    stamp = file_stamp(path)
+    if stamp is None:
+        raise FileNotFoundError(path)
+    with _psets_lock:
+        cached = _psets_memo.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    with open(path, 'r') as f:
+        psets = json.loads(base64.b64decode(f.read()))
+    with _psets_lock:
+        _psets_memo[path] = (stamp, psets)
+    return psets
+
+
+def index_zip(path):
+    """{member name: [data offset, compressed size, size, crc, compress type]}"""
+    members = {}
+    with open(path, 'rb') as f:
+        with ZipFile(f) as zf:
+            infos = zf.infolist()
+        for info in infos:
+            if info.is_dir():
+                continue
+            f.seek(info.header_offset)
+            header = f.read(LOCAL_HEADER.size)
+            if len(header) != LOCAL_HEADER.size or header[0:4] != LOCAL_MAGIC:
+                raise BadZipFile('bad local header for ' + info.filename)
+            fields = LOCAL_HEADER.unpack(header)
+            offset = info.header_offset + LOCAL_HEADER.size + fields[-2] + fields[-1]
+            members[info.filename] = [offset, info.compress_size, info.file_size, info.CRC,
+                                      info.compress_type]
+    return members
+
+
+class PsetManifest:
+
+    def __init__(self, path_prefix, path):
+        self.path_prefix = path_prefix
+        self.path = path
+        self._lock = threading.RLock()
+        self._handles = collections.OrderedDict()   # key -> (stamp, file)
+        self.zips = {}
+        self.psets_stamp = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get('version') == FORMAT_VERSION:
+            self.zips = data.get('zips', {})
+            self.psets_stamp = data.get('psets_stamp')
+        self._names = {}
+        for key, entry in self.zips.items():
+            for name in entry['members']:
+                self._names.setdefault(name, key)
+
+    def save(self):
+        with self._lock:
+            data = {'version': FORMAT_VERSION, 'psets_stamp': self.psets_stamp, 'zips': self.zips}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + '.new', 'w') as f:
+                json.dump(data, f)
+            os.replace(self.path + '.new', self.path)
+
+    def zip_path(self, key):
+        return os.path.join(self.path_prefix, key)
+
+    def index(self, key, save=True):
+        """(Re)index one local zip if it is new or changed; True if it is indexed"""
+        with self._lock:
+            path = self.zip_path(key)
+            stamp = file_stamp(path)
+            entry = self.zips.get(key)
+            if stamp is None:
+                if entry is not None:
+                    self._drop(key)
+                    if save:
+                        self.save()
+                return False
+            if entry is not None and entry['stamp'] == stamp:
+                return True
+            try:
+                members = index_zip(path)
+            except (OSError, BadZipFile) as err:
+                print('Unable to index ' + path + ': ' + str(err))
+                if entry is not None:
+                    self._drop(key)
+                return False
+            self._drop(key)
+            self.zips[key] = {'stamp': stamp, 'members': members}
+            for name in members:
+                self._names.setdefault(name, key)
+            if save:
+                self.save()
+            return True
+
+    def _drop(self, key):
+        entry = self.zips.pop(key, None)
+        self._close(key)
+        if entry is None:
+            return
+        for name in entry['members']:
+            if self._names.get(name) == key:
+                del self._names[name]
+                # Another zip may hold the same blob
+                for other, oentry in self.zips.items():
+                    if name in oentry['members']:
+                        self._names[name] = other
+                        break
+
+    def refresh(self, psets, psets_stamp=None):
+        """Index the local .zip psets, forget zips that are no longer listed"""
+        with self._lock:
+            keys = set(uu['key'] for uu in psets if str(uu.get('key', '')).endswith('.zip'))
+            changed = False
+            for key in list(self.zips):
+                if not(key in keys):
+                    self._drop(key)
+                    changed = True
+            for key in sorted(keys):
+                before = self.zips.get(key)
+                self.index(key, save=False)
+                changed = changed or self.zips.get(key) is not before
+            if psets_stamp != self.psets_stamp:
+                self.psets_stamp = psets_stamp
+                changed = True
+            if changed:
+                self.save()
+
+    def lookup(self, name):
+        """Key of a local zip holding ``name``, or None"""
+        return self._names.get(name)
+
+    def _handle(self, key, stamp):
+        handle = self._handles.get(key)
+        if handle is not None and handle[0] == stamp:
+            self._handles.move_to_end(key)
+            return handle[1]
+        self._close(key)
+        f = open(self.zip_path(key), 'rb')
+        self._handles[key] = (stamp, f)
+        while len(self._handles) > MAX_HANDLES:
+            oldkey, (oldstamp, oldf) = self._handles.popitem(last=False)
+            oldf.close()
+        return f
+
+    def _close(self, key):
+        handle = self._handles.pop(key, None)
+        if handle is not None:
+            handle[1].close()
+
+    def close(self):
+        with self._lock:
+            for key in list(self._handles):
+                self._close(key)
+
+    def read(self, name, key=None):
+        """Contents of blob ``name`` from a local zip (``key`` or any), or None"""
+        with self._lock:
+            key = key or self.lookup(name)
+            if key is None:
+                return None
+            stamp = file_stamp(self.zip_path(key))
+            entry = self.zips.get(key)
+            if entry is None or entry['stamp'] != stamp:
+                if not self.index(key):
+                    return None
+                entry = self.zips[key]
+            member = entry['members'].get(name)
+            if member is None:
+                return None
+            offset, csize, size, crc, ctype = member
+            f = self._handle(key, stamp)
+            f.seek(offset)
+            raw = f.read(csize)
+        if ctype == ZIP_STORED:
+            data = raw
+        elif ctype == ZIP_DEFLATED:
+            data = zlib.decompressobj(-15).decompress(raw)
+        else:
+            # bzip2/lzma members: let zipfile handle them
+            with ZipFile(self.zip_path(key)) as zf:
+                data = zf.read(name)
+        if len(data) != size or (zlib.crc32(data) & 0xffffffff) != crc:
+            print('Bad CRC-32 for ' + name + ' in ' + key)
+            return None
+        return data
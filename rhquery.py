@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+rhquery.py - Client side of the warm catalog query server (rhcatalogd.py)
+
+Kept to the standard library on purpose: a CLI that gets its answer from a
+running rhcatalogd never imports cryptography/requests/compress or decodes
+rhmd.dat.  When no server is listening (or RHTOOLS_CATALOGD=0 is set), the
+same operation runs in-process through rhcatalogd.handle(), so callers do
+not need a fallback path of their own.
+
+Protocol: one JSON object per line in each direction over a Unix domain
+socket (default <RHTOOLS_PATH>/cache/catalogd.sock, or
+RHTOOLS_CATALOGD_SOCKET):
+
+    -> {"op": "search", "args": {"query": "star road"}, "rhmd_file": null}
+    <- {"ok": true, "result": {...}}
+    <- {"ok": false, "error": "..."}
+
+Usage:
+    import rhquery
+    result = rhquery.call('search', query='star road', fuzzy=10)
+"""
+
+import os
+import json
+import socket
+
+TIMEOUT = 30
+
+
+class QueryError(Exception):
+    pass
+
+
+class Unavailable(Exception):
+    pass
+
+
+def socket_path():
+    if os.environ.get('RHTOOLS_CATALOGD_SOCKET'):
+        return os.environ['RHTOOLS_CATALOGD_SOCKET']
+    return os.path.join(os.environ.get('RHTOOLS_PATH', ''), 'cache', 'catalogd.sock')
+
+
+def enabled():
+    return not(os.environ.get('RHTOOLS_CATALOGD', '1') in ['', '0', 'no'])
+
+
+def catalog_file():
+    """The catalog the caller would load: only an explicit RHMD_FILE differs"""
+    if os.environ.get('RHMD_FILE'):
+        return os.path.abspath(os.environ['RHMD_FILE'])
+    return None
+
+
+def request(op, args, path=None, timeout=TIMEOUT):
+    """
+    Send one request to the server and return its result.  Raises
+    Unavailable when nothing answers on the socket (or the server serves a
+    different catalog), QueryError when the server reports an error.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path or socket_path())
+        except OSError as err:
+            raise Unavailable(str(err))
+        line = json.dumps({'op': op, 'args': args, 'rhmd_file': catalog_file()}) + '\n'
+        sock.sendall(line.encode('utf8'))
+        with sock.makefile('rb') as f:
+            reply = f.readline()
+    finally:
+        sock.close()
+    if not reply:
+        raise Unavailable('connection closed')
+    reply = json.loads(reply.decode('utf8'))
+    if reply.get('ok'):
+        return reply.get('result')
+    if reply.get('unavailable'):
+        raise Unavailable(reply.get('error'))
+    raise QueryError(reply.get('error'))
+
+
+def call(op, **args):
+    """Result of ``op`` from the server when one is running, else computed in-process"""
+    if enabled():
+        try:
+            return request(op, args)
+        except Unavailable:
+            pass
+    import rhcatalogd
+    return rhcatalogd.handle(op, args)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+rhrecords.py - Compact in-memory store for hack records
+
+A decoded catalog is a list of full dicts, each carrying twenty-odd string
+fields of which only a handful (id, name, authors, type, length, tags,
+description, ...) are read when listing, filtering or picking hacks.  RecordStore keeps those
+"hot" fields in __slots__ attributes with the repetitive values (type,
+authors, tags, demo, length, rating) interned, and packs every other field
+of a record into one marshal blob that is only decoded when a cold field
+is actually read.
+
+Records and the store keep dict-style access so code written against
+get_hackdict() / the plain record dicts keeps working:
+
+    store = rhrecords.RecordStore.from_list(loadsmwrh.get_hacklist_data(readonly=True))
+    rec = store['12345']
+    rec['name'], rec['tags'], rec.get('description'), 'xdata' in rec
+    json.dumps(rec.to_dict())
+
+Records are read-only; use to_dict() for a mutable copy.
+"""
+
+import sys
+import marshal
+
+# Fields kept as attributes; everything else goes to the cold blob
+HOT_FIELDS = ('id', 'name', 'authors', 'type', 'length', 'demo', 'tags', 'added', 'rating',
+              'description')
+
+# Hot fields whose values repeat a lot across the catalog
+INTERNED_FIELDS = ('authors', 'type', 'length', 'demo', 'rating')
+
+_MISSING = object()
+
+
+def _intern(value):
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+class HackRecord:
+    """Read-only, dict-like hack record with hot fields in slots"""
+
+    __slots__ = HOT_FIELDS + ('_cold',)
+
+    def __init__(self, data):
+        for field in HOT_FIELDS:
+            value = data.get(field, _MISSING)
+            if field in INTERNED_FIELDS:
+                value = _intern(value)
+            elif field == 'tags' and isinstance(value, (list, tuple)):
+                value = tuple(_intern(t) for t in value)
+            object.__setattr__(self, field, value)
+        cold = {k: v for k, v in data.items() if k not in HOT_FIELDS}
+        object.__setattr__(self, '_cold', marshal.dumps(_plain(cold)) if cold else None)
+
+    def __setattr__(self, name, value):
+        raise TypeError('HackRecord is read-only; use to_dict() for a mutable copy')
+
+    def cold(self):
+        """Decode the rarely used fields of this record"""
+        if self._cold is None:
+            return {}
+        return marshal.loads(self._cold)
+
+    def __getitem__(self, key):
+        if key in HOT_FIELDS:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            if key == 'tags' and type(value) is tuple:
+                return list(value)
+            return value
+        return self.cold()[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key in HOT_FIELDS:
+            return getattr(self, key) is not _MISSING
+        return key in self.cold()
+
+    def keys(self):
+        return [f for f in HOT_FIELDS if getattr(self, f) is not _MISSING] + list(self.cold().keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def to_dict(self):
+        data = {}
+        for field in HOT_FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                data[field] = list(value) if field == 'tags' and type(value) is tuple else value
+        data.update(self.cold())
+        return data
+
+    def __repr__(self):
+        return 'HackRecord(%r)' % (self.to_dict(),)
+
+
+def _plain(value):
+    """marshal only accepts exact builtin types; undo read-only wrappers"""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+class RecordStore:
+    """
+    Compact replacement for get_hackdict(): maps hack id -> HackRecord and
+    keeps catalog order.  Iterating the store yields ids, like a dict.
+    """
+
+    def __init__(self, records=()):
+        self._records = []
+        self._index = {}
+        for data in records:
+            self.add(data)
+
+    @classmethod
+    def from_list(cls, hacklist):
+        return cls(hacklist)
+
+    def add(self, data):
+        """Add (or replace, if the id is already present) one record"""
+        rec = data if isinstance(data, HackRecord) else HackRecord(data)
+        idstr = str(rec['id'])
+        pos = self._index.get(idstr)
+        if pos is None:
+            self._index[idstr] = len(self._records)
+            self._records.append(rec)
+        else:
+            self._records[pos] = rec
+        return rec
+
+    def records(self):
+        """Records in catalog order"""
+        return self._records
+
+    def filter(self, predicate):
+        """Records matching ``predicate`` (shared objects, nothing is copied)"""
+        return [rec for rec in self._records if predicate(rec)]
+
+    def find_id(self, idval):
+        return self._index.get(str(idval))
+
+    def __getitem__(self, idval):
+        pos = self._index.get(str(idval))
+        if pos is None:
+            raise KeyError(idval)
+        return self._records[pos]
+
+    def get(self, idval, default=None):
+        pos = self._index.get(str(idval))
+        if pos is None:
+            return default
+        return self._records[pos]
+
+    def __contains__(self, idval):
+        return str(idval) in self._index
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return list(self._records)
+
+    def items(self):
+        return [(str(rec['id']), rec) for rec in self._records]
+
+    def to_list(self):
+        """Plain list-of-dicts copy, as returned by get_hacklist_data()"""
+        return [rec.to_dict() for rec in self._records]
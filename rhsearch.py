@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+rhsearch.py - Inverted full-text index over the hack catalog
+
+search.py, the GUI filter (doesMatch / loadsmwrh.hinfoMatch) and the
+chatbot's !rhsearch each ran re.search() over every field of every hack,
+recompiling the pattern and lowercasing the fields on every pass.
+SearchIndex tokenizes name, authors, type, tags, description, id and added
+once and keeps, per field, a posting list (token -> catalog positions).
+
+Query syntax:
+    mario world         every word must match; words match as prefixes
+                        ("mar" finds "Mario")
+    "star road"         phrase: consecutive whole words
+    kaizo "star road"   both combined
+    ^Super.*World$      anything with regex characters outside quotes is
+                        run as a case-insensitive regex over the raw field
+                        values (compiled once, quotes removed)
+
+Results are catalog positions in catalog order.  The index is built once
+per decode of the catalog (loadsmwrh.get_search_index()) and can be
+extended with add() without a rebuild.
+
+Usage:
+    index = rhsearch.SearchIndex(hacklist)
+    for rec in index.search_records('kaizo "star road"', fields=('name', 'type')):
+        print(rec['id'], rec['name'])
+"""
+
+import re
+import array
+import bisect
+import threading
+
+SEARCH_FIELDS = ('name', 'authors', 'type', 'tags', 'description', 'id', 'added')
+
+_WORD = re.compile(r'\w+')
+_REGEX_CHARS = re.compile(r'[\\^$.|?*+()\[\]{}]')
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+_QUOTED = re.compile(r'"[^"]*"')
+
+
+def tokenize(value):
+    """Lowercased word tokens of a field value (lists such as tags are flattened)"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        tokens = []
+        for v in value:
+            tokens.extend(tokenize(v))
+        return tokens
+    return _WORD.findall(str(value).lower())
+
+
+def field_text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(v) for v in value)
+    return '' if value is None else str(value)
+
+
+def looks_like_regex(query):
+    # Punctuation inside a quoted phrase ("dr. pete") is part of the phrase
+    return _REGEX_CHARS.search(_QUOTED.sub(' ', query).replace('"', '')) is not None
+
+
+def parse_query(query):
+    """(words, phrases): plain words and lists of phrase words"""
+    words = []
+    phrases = []
+    for m in _QUERY_PART.finditer(query):
+        if m.group(1) is not None:
+            tokens = tokenize(m.group(1))
+            if tokens:
+                phrases.append(tokens)
+        else:
+            words.extend(tokenize(m.group(2)))
+    return words, phrases
+
+
+def _pairs(tokens):
+    return [tokens[i] + ' ' + tokens[i + 1] for i in range(len(tokens) - 1)]
+
+
+def _field_pairs(value):
+    # Pairs never span two entries of a list field such as tags
+    if isinstance(value, (list, tuple)):
+        pairs = []
+        for v in value:
+            pairs.extend(_field_pairs(v))
+        return pairs
+    return _pairs(tokenize(value))
+
+
+def _add_postings(postings, tokens, pos):
+    """Add pos under each distinct token; True if a new token was seen"""
+    new = False
+    for token in set(tokens):
+        plist = postings.get(token)
+        if plist is None:
+            postings[token] = array.array('i', (pos,))
+            new = True
+        else:
+            plist.append(pos)
+    return new
+
+
+class SearchIndex:
+
+    def __init__(self, records=(), fields=SEARCH_FIELDS):
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self._records = []
+        self._postings = {f: {} for f in self.fields}
+        self._pairs = {f: {} for f in self.fields}     # "word next" -> positions
+        self._vocab = {f: None for f in self.fields}
+        self._vocab_text = {f: None for f in self.fields}   # (joined vocab, token starts)
+        for rec in records:
+            self.add(rec)
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record):
+        """Index one more record (appended at the end of the catalog order)"""
+        with self._lock:
+            pos = len(self._records)
+            self._records.append(record)
+            for field in self.fields:
+                tokens = tokenize(record.get(field))
+                if _add_postings(self._postings[field], tokens, pos):
+                    self._vocab[field] = None
+                    self._vocab_text[field] = None
+                _add_postings(self._pairs[field], _field_pairs(record.get(field)), pos)
+            return pos
+
+    def record(self, pos):
+        return self._records[pos]
+
+    def _sorted_vocab(self, field):
+        vocab = self._vocab[field]
+        if vocab is None:
+            vocab = self._vocab[field] = sorted(self._postings[field])
+        return vocab
+
+    def _containing(self, part, field):
+        """Records with a token of ``field`` that contains ``part``"""
+        cached = self._vocab_text[field]
+        if cached is None:
+            vocab = self._sorted_vocab(field)
+            starts = array.array('i')
+            offset = 0
+            for token in vocab:
+                starts.append(offset)
+                offset += len(token) + 1
+            cached = self._vocab_text[field] = ('\n'.join(vocab), starts)
+        text, starts = cached
+        vocab = self._vocab[field]
+        postings = self._postings[field]
+        result = set()
+        i = text.find(part)
+        while i >= 0:
+            n = bisect.bisect_right(starts, i) - 1
+            result.update(postings[vocab[n]])
+            if n + 1 >= len(starts):
+                break
+            i = text.find(part, starts[n + 1])
+        return result
+
+    def _substring(self, text, fields):
+        # Same matches as a case-insensitive re.search(re.escape(text)) over
+        # each field, but only records holding a token that contains every
+        # word of the text are looked at: the vocabulary is searched, not
+        # the records
+        parts = tokenize(text)
+        if not parts:
+            return self._regex(re.escape(text), fields)
+        exact = len(parts) == 1 and parts[0] == text.lower()
+        pattern = re.compile(re.escape(text), re.I)
+        result = set()
+        for field in fields:
+            candidates = None
+            for part in parts:
+                found = self._containing(part, field)
+                candidates = found if candidates is None else candidates & found
+                if not candidates:
+                    break
+            if not candidates:
+                continue
+            if exact:
+                result |= candidates
+                continue
+            for pos in candidates:
+                if not(pos in result) and pattern.search(field_text(self._records[pos].get(field))):
+                    result.add(pos)
+        return result
+
+    def _prefix(self, prefix, fields):
+        result = set()
+        for field in fields:
+            vocab = self._sorted_vocab(field)
+            postings = self._postings[field]
+            i = bisect.bisect_left(vocab, prefix)
+            while i < len(vocab) and vocab[i].startswith(prefix):
+                result.update(postings[vocab[i]])
+                i += 1
+        return result
+
+    def _exact(self, token, fields, table=None):
+        table = self._postings if table is None else table
+        result = set()
+        for field in fields:
+            plist = table[field].get(token)
+            if plist is not None:
+                result.update(plist)
+        return result
+
+    def _phrase(self, tokens, fields):
+        if len(tokens) == 1:
+            return self._exact(tokens[0], fields)
+        if len(fields) > 1:
+            result = set()
+            for field in fields:
+                result |= self._phrase(tokens, (field,))
+            return result
+        # Records holding every adjacent word pair of the phrase in this field
+        candidates = None
+        for pair in _pairs(tokens):
+            found = self._exact(pair, fields, self._pairs)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return set()
+        if len(tokens) == 2:
+            return candidates
+        # Longer phrases: the pairs may come from different places in the field
+        pattern = re.compile(r'(?<!\w)' + r'\W+'.join(re.escape(t) for t in tokens) + r'(?!\w)', re.I)
+        result = set()
+        for pos in candidates:
+            rec = self._records[pos]
+            for field in fields:
+                value = rec.get(field)
+                if value is not None and pattern.search(field_text(value)):
+                    result.add(pos)
+                    break
+        return result
+
+    def _regex(self, pattern, fields):
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, re.I)
+        result = set()
+        for pos, rec in enumerate(self._records):
+            for field in fields:
+                value = rec.get(field)
+                if value is not None and pattern.search(field_text(value)):
+                    result.add(pos)
+                    break
+        return result
+
+    def search(self, query, fields=None, regex=None, fallback=False):
+        """
+        Catalog positions of records matching ``query``, in catalog order.
+
+        regex=None decides from the query (regex characters outside quotes
+        -> regex scan), True/False force it.  With fallback=True the
+        records containing the query as a case-insensitive substring (what
+        the old re.search() based filters matched) are always added, so
+        text inside a word ("world" in "Underworld") is still found; the
+        substring search goes through the vocabulary (_substring()).
+        """
+        fields = self.fields if fields is None else tuple(fields)
+        with self._lock:
+            if regex is None:
+                regex = looks_like_regex(query)
+            if regex:
+                pattern = query.replace('"', '')
+                try:
+                    return sorted(self._regex(pattern, fields))
+                except re.error:
+                    return sorted(self._regex(re.escape(pattern), fields))
+            words, phrases = parse_query(query)
+            substring = set()
+            if fallback and query.replace('"', '').strip():
+                substring = self._substring(query.replace('"', '').strip(), fields)
+            if not(words) and not(phrases):
+                return sorted(substring)
+            result = None
+            for word in words:
+                found = self._prefix(word, fields)
+                result = found if result is None else result & found
+                if not result:
+                    break
+            for tokens in phrases:
+                if result is not None and not result:
+                    break
+                found = self._phrase(tokens, fields)
+                result = found if result is None else result & found
+            return sorted((result or set()) | substring)
+
+    def search_records(self, query, fields=None, regex=None, fallback=False):
+        return [self._records[pos] for pos in self.search(query, fields, regex, fallback)]
+
+    def search_ids(self, query, fields=None, regex=None, fallback=False):
+        return set(str(self._records[pos].get('id')) for pos in self.search(query, fields, regex, fallback))
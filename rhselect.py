@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+rhselect.py - Compiled selection queries over the facet index
+
+!rhrandom's %races%demos%contests%nofilters modifiers, pb_randomhack.py and
+pb_randomlevel.py each hand-rolled their filters.  A selection query is
+compiled once into a Plan (cached, LRU, by query text) whose terms are
+bitset operations on an rhfacets.FacetIndex; the Plan also remembers its
+last result, so repeating a query against an unchanged catalog is a cache
+hit.
+
+Syntax - terms are ANDed, "-term" or "not term" negates, a,b means either:
+
+    kaizo                       bare word: type matches the regex (as before);
+                                * or any matches everything
+    type:kaizo|pit              type regex
+    tag:castle,water            has one of the tags
+    author:carol                authors regex
+    length:10..30 length:>=50   exits
+    rating:>=4 rating:3..4.5
+    added:2020 added:2019..2021-06 added:<2015
+    id:123,456
+    demo racelevel contest      flags (demos, race, races, contests also work)
+    pnum playable               has a patch number / playable log.txt levels
+    with:racelevel              keep a flag the defaults would exclude
+    all                         with:demo with:racelevel with:contest
+    nofilters                   drop the tags the defaults would exclude
+
+Callers pass ``defaults`` (e.g. RANDOM_DEFAULTS); a default term is skipped
+when the query mentions the same flag or tag.
+
+Usage:
+    plan = rhselect.compile_query('kaizo rating:>=4 -tag:water', rhselect.RANDOM_DEFAULTS)
+    bits = plan.bits(loadsmwrh.get_facet_index(), loadsmwrh.level_store)
+"""
+
+import re
+import weakref
+import functools
+import threading
+from collections import namedtuple
+
+# !rhrandom: no demos, race or contest levels, nor hacks with these tags
+EXCLUDED_TAGS = ('adult content', 'sexual content', 'epilepsy warning')
+RANDOM_DEFAULTS = '-demo -racelevel -contest -tag:' + ','.join('"%s"' % t for t in EXCLUDED_TAGS)
+
+FLAGS = {
+    'demo': 'demo', 'demos': 'demo', 'demolevels': 'demo',
+    'racelevel': 'racelevel', 'racelevels': 'racelevel', 'race': 'racelevel', 'races': 'racelevel',
+    'contest': 'contest', 'contests': 'contest', 'contestlevel': 'contest', 'contestlevels': 'contest',
+    'pnum': 'pnum', 'playable': 'playable',
+}
+LEVEL_FLAGS = ('pnum', 'playable')
+RANGE_FIELDS = ('length', 'rating', 'added')
+
+# !rhrandom's old %modifier%...%type syntax
+LEGACY_MODIFIERS = {
+    'races': 'racelevel', 'racelevels': 'racelevel', 'racelevel': 'racelevel',
+    'demos': 'demo', 'demolevels': 'demo',
+    'contests': 'contest', 'contestlevels': 'contest',
+    'racestoo': 'with:racelevel', 'nofilters': 'nofilters',
+    'all': 'all', 'anything': 'all',
+}
+
+Term = namedtuple('Term', ['negate', 'kind', 'value'])
+
+_TOKEN = re.compile(r'(?:[^\s"]|"[^"]*")+')
+_RANGE = re.compile(r'^(>=|<=|>|<|=)?(.+?)(?:\.\.(.+))?$')
+
+
+class SelectError(ValueError):
+    pass
+
+
+def legacy_query(text):
+    """'%races%kaizo' -> 'racelevel kaizo' (text without % is returned as is)"""
+    if not('%' in text):
+        return text
+    parts = text.split('%')
+    words = [LEGACY_MODIFIERS[p] for p in parts[0:-1] if p in LEGACY_MODIFIERS]
+    return ' '.join(words + [parts[-1]]).strip()
+
+
+def _values(value):
+    return [v.strip().strip('"') for v in value.split(',') if v.strip().strip('"')]
+
+
+def _convert(field, value):
+    try:
+        if field == 'length':
+            return int(value)
+        if field == 'rating':
+            return float(value)
+    except ValueError:
+        raise SelectError('bad %s value: %s' % (field, value))
+    return value
+
+
+def parse_range(field, text):
+    """(lo, hi, lo_open, hi_open) for length:/rating:/added: values"""
+    m = _RANGE.match(text)
+    if not m:
+        raise SelectError('bad %s range: %s' % (field, text))
+    op, first, second = m.groups()
+    if second is None and op is None and field != 'added' and re.match(r'^[\d.]+-[\d.]+$', first):
+        first, second = first.split('-')
+    # Dates are prefixes: added:2020 covers every 2020-... value
+    end = '\x7f' if field == 'added' else None
+    lo = _convert(field, first)
+    if second is not None:
+        hi = _convert(field, second)
+        return lo, (hi + end if end else hi), False, False
+    if op == '>=':
+        return lo, None, False, False
+    if op == '>':
+        return (lo + end if end else lo), None, True, False
+    if op == '<=':
+        return None, (lo + end if end else lo), False, False
+    if op == '<':
+        return None, lo, False, True
+    return lo, (lo + end if end else lo), False, False
+
+
+def parse_query(text):
+    terms = []
+    negate_next = False
+    for token in _TOKEN.findall(text):
+        if token.lower() == 'not':
+            negate_next = True
+            continue
+        negate = negate_next
+        negate_next = False
+        if token.startswith('-') and len(token) > 1:
+            negate = not negate
+            token = token[1:]
+        key, sep, value = token.partition(':')
+        key = key.lower()
+        if sep and key in ('type', 'author', 'authors'):
+            pattern = value.strip('"')
+            try:
+                re.compile(pattern)
+            except re.error as err:
+                raise SelectError('bad pattern %s: %s' % (pattern, err))
+            terms.append(Term(negate, 'author' if key.startswith('author') else 'type', pattern))
+        elif sep and key in ('tag', 'tags'):
+            terms.append(Term(negate, 'tag', tuple(_values(value))))
+        elif sep and key in RANGE_FIELDS:
+            terms.append(Term(negate, key, parse_range(key, value.strip('"'))))
+        elif sep and key == 'id':
+            terms.append(Term(negate, 'id', tuple(_values(value))))
+        elif sep and key == 'with':
+            flag = FLAGS.get(value.lower())
+            if flag is None:
+                raise SelectError('unknown flag: ' + value)
+            terms.append(Term(False, 'with', flag))
+        elif not(sep) and key in FLAGS:
+            terms.append(Term(negate, 'flag', FLAGS[key]))
+        elif not(sep) and key in ('all', 'nofilters'):
+            terms.append(Term(False, key, None))
+        elif not(sep) and key in ('*', 'any'):
+            terms.append(Term(negate, 'everything', None))
+        else:
+            pattern = token.strip('"')
+            try:
+                re.compile(pattern)
+            except re.error as err:
+                raise SelectError('bad pattern %s: %s' % (pattern, err))
+            terms.append(Term(negate, 'type', pattern))
+    return terms
+
+
+def _apply_defaults(terms, defaults):
+    flags = set(t.value for t in terms if t.kind in ('flag', 'with'))
+    if any(t.kind == 'all' for t in terms):
+        flags.update(('demo', 'racelevel', 'contest'))
+    tags = set()
+    for t in terms:
+        if t.kind == 'tag':
+            tags.update(t.value)
+    nofilters = any(t.kind == 'nofilters' for t in terms)
+    result = list(terms)
+    for t in defaults:
+        if t.kind == 'flag' and t.value in flags:
+            continue
+        if t.kind == 'tag':
+            if nofilters:
+                continue
+            t = t._replace(value=tuple(v for v in t.value if not(v in tags)))
+            if not t.value:
+                continue
+        result.append(t)
+    return result
+
+
+class Plan:
+
+    def __init__(self, text, terms):
+        self.text = text
+        self.terms = tuple(t for t in terms if not(t.kind in ('with', 'all', 'nofilters')))
+        self.uses_levels = any(t.kind == 'flag' and t.value in LEVEL_FLAGS for t in self.terms)
+        self._lock = threading.Lock()
+        self._last = None   # (weakref to facets, level store version, bits)
+
+    def __repr__(self):
+        return 'Plan(%r, %r)' % (self.text, self.terms)
+
+    def bits(self, facets, levelstore=None):
+        """
+        Bitset of the matching hacks.  ``levelstore`` (an rhlevellog store, or
+        a function returning one) is only needed for pnum/playable terms.
+        """
+        store = None
+        version = None
+        if self.uses_levels:
+            store = levelstore() if callable(levelstore) else levelstore
+            if store is None:
+                raise SelectError('pnum/playable need the level store')
+            store.ensure_loaded()
+            version = (id(store), store.version)
+        with self._lock:
+            last = self._last
+            if last is not None and last[0]() is facets and last[1] == version:
+                return last[2]
+        bits = facets.all
+        for term in self.terms:
+            tbits = self._term_bits(term, facets, store)
+            bits = bits & ~tbits if term.negate else bits & tbits
+        with self._lock:
+            self._last = (weakref.ref(facets), version, bits)
+        return bits
+
+    def _term_bits(self, term, facets, store):
+        kind = term.kind
+        if kind == 'type':
+            return facets.type_bits(term.value)
+        if kind == 'author':
+            return facets.value_bits('authors', term.value)
+        if kind == 'tag':
+            return facets.tag_bits(term.value)
+        if kind == 'id':
+            return facets.id_bits(term.value)
+        if kind in RANGE_FIELDS:
+            lo, hi, lo_open, hi_open = term.value
+            return facets.range_bits(kind, lo, hi, lo_open, hi_open)
+        if kind == 'everything':
+            return facets.all
+        if term.value in LEVEL_FLAGS:
+            pnum, playable = facets.level_bits(store)
+            return pnum if term.value == 'pnum' else playable
+        return facets.flags[term.value]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_query(text, defaults=''):
+    """Plan for a query (and caller defaults), compiled once per distinct text"""
+    terms = _apply_defaults(parse_query(text), parse_query(defaults))
+    return Plan(text, terms)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+rhsidecar.py - Persistent decoded-catalog sidecar files
+
+Every CLI start (search.py, rhinfo.py, pb_randomhack.py, gui.py, ...)
+otherwise has to Fernet-decrypt, LZMA-decompress and JSON-parse the whole
+of rhmd.dat.  The sidecar is a local, already-decoded copy of a catalog
+file stored as a memory-mappable record table and keyed by the SHA-224 of
+the catalog ciphertext.  When the hash matches, records are read straight
+from the table; when it does not, the catalog is decoded the slow way and
+the sidecar is rebuilt.
+
+The sidecar holds decoded metadata, so it is opt-in: set RHTOOLS_SIDECAR=1
+or put "catalog_sidecar": true in rhtools_options.dat.
+
+File layout (little endian):
+    header   64 bytes   magic, marshal version, source SHA-224, record
+                        count, offset of record table, offset of id index
+    records  ...        marshal.dumps(record) back to back
+    table    count*12   (offset u64, length u32) per record
+    index    ...        marshal.dumps({id: position})
+
+Usage:
+    import rhsidecar
+    hacklist = rhsidecar.load_or_build('rhmd.dat', decoder, 'cache')
+    table = rhsidecar.SidecarTable(path)        # random access
+    record = table.get_id('12345')
+"""
+
+import os
+import mmap
+import struct
+import marshal
+import hashlib
+
+MAGIC = b'RHSIDE01'
+HEADER = struct.Struct('<8sI28sIQQ4x')
+ENTRY = struct.Struct('<QI')
+
+
+def file_sha224(filename):
+    h = hashlib.sha224()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def sidecar_path(filename, cache_dir):
+    """Sidecar file name for a catalog file: <basename>-<hash of its path>.rhsc"""
+    absname = os.path.abspath(filename)
+    tag = hashlib.sha224(absname.encode('utf8')).hexdigest()[0:8]
+    return os.path.join(cache_dir, '%s-%s.rhsc' % (os.path.basename(absname), tag))
+
+
+def write_sidecar(path, source_sha224, records):
+    """Write ``records`` (a list of JSON-style dicts) as a sidecar table"""
+    blobs = [marshal.dumps(rec) for rec in records]
+    index = {}
+    for pos, rec in enumerate(records):
+        if isinstance(rec, dict) and 'id' in rec:
+            index.setdefault(str(rec['id']), pos)
+
+    table = bytearray()
+    offset = HEADER.size
+    for blob in blobs:
+        table += ENTRY.pack(offset, len(blob))
+        offset += len(blob)
+    table_offset = offset
+    index_offset = table_offset + len(table)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.new', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, marshal.version, source_sha224, len(blobs),
+                            table_offset, index_offset))
+        for blob in blobs:
+            f.write(blob)
+        f.write(table)
+        f.write(marshal.dumps(index))
+    os.replace(path + '.new', path)
+
+
+class SidecarTable:
+    """
+    Read-only view of a sidecar file.  Records are unmarshalled on access,
+    so looking up a single id does not decode the rest of the catalog.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, mversion, self.source_sha224, self.count,
+             self._table_offset, self._index_offset) = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or mversion != marshal.version:
+                raise ValueError('Not a usable sidecar file: ' + path)
+        except Exception:
+            self._mm.close()
+            raise
+        self._index = None
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += self.count
+        if pos < 0 or pos >= self.count:
+            raise IndexError(pos)
+        offset, length = ENTRY.unpack_from(self._mm, self._table_offset + pos * ENTRY.size)
+        return marshal.loads(self._mm[offset:offset + length])
+
+    def records(self):
+        return [self[pos] for pos in range(self.count)]
+
+    def find_id(self, idval):
+        if self._index is None:
+            self._index = marshal.loads(self._mm[self._index_offset:])
+        return self._index.get(str(idval))
+
+    def get_id(self, idval, default=None):
+        pos = self.find_id(idval)
+        if pos is None:
+            return default
+        return self[pos]
+
+
+def load_or_build(filename, decoder, cache_dir):
+    """
+    Return the decoded list for ``filename`` from its sidecar when the
+    sidecar matches the SHA-224 of the file, otherwise call
+    ``decoder(filename)`` and rebuild the sidecar from the result.
+    """
+    digest = file_sha224(filename)
+    path = sidecar_path(filename, cache_dir)
+    if os.path.exists(path):
+        try:
+            with SidecarTable(path) as table:
+                if table.source_sha224 == digest:
+                    return table.records()
+        except Exception as xerr:
+            print('Ignoring unreadable sidecar ' + path + ': ' + str(xerr))
+
+    data = decoder(filename)
+    if isinstance(data, list):
+        try:
+            write_sidecar(path, digest, data)
+        except Exception as xerr:
+            print('Could not write sidecar ' + path + ': ' + str(xerr))
+    return data
+
+
+def refresh(filename, data, cache_dir):
+    """Rewrite the sidecar right after ``filename`` was saved with ``data``"""
+    if isinstance(data, list):
+        write_sidecar(sidecar_path(filename, cache_dir), file_sha224(filename), data)
@@ -1,39 +1,26 @@
 # Copyright C Belthasar 2023 All Rights Reserved
 
-import os
-import json
-import random
 import sys
-import re
-import loadsmwrh
-
-import repatch
+import rhquery
+# rhquery answers from a running rhcatalogd.py when there is one, so the
+# catalog is only decoded here when no server is up
 typenames = {}
 
-#listfile = open(loadsmwrh.hacklist_path(), 'r')
-#hacklist = json.load(listfile)
-hacklist = loadsmwrh.get_hacklist_data()
 argvstr =  ' '.join(sys.argv[1:])
 selection = []
 hackdata = {}
 
-for x in hacklist:
-     if re.search(argvstr.lower(), x["name"].lower(), re.I):
-         selection = selection + [x["id"]]
-         hackdata[ str(x["id"]) ] = x
-         continue
-     if re.search(argvstr.lower(), x["authors"].lower(), re.I):
-         selection = selection + [x["id"]]
-         hackdata[ str(x["id"]) ] = x
-         continue
-     if re.search(argvstr.lower(), x["type"].lower(), re.I):
-         selection = selection + [x["id"]]
-         hackdata[ str(x["id"]) ] = x
-         continue
+result = rhquery.call('search', query=argvstr, fields=['name', 'authors', 'type'], fuzzy=10,
+                      project=['id', 'name', 'authors', 'type'])
+if result['fuzzy']:
+    # Nothing spelled like that: show the closest names/authors instead
+    print('No exact matches, closest:')
+for x in result['records']:
+     selection = selection + [x["id"]]
+     hackdata[ str(x["id"]) ] = x
 
 for u in selection:
     chosen = u
     chosenrecord = hackdata[str(chosen)]
     print(str(chosen)  +  '  -  '  + chosenrecord["name"]   + "  - " + chosenrecord["authors"] +  "  - " + chosenrecord["type"] + " - " )
 #    print(json.dumps(chosenrecord, indent=4, sort_keys=True))
-
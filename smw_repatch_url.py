@@ -8,7 +8,9 @@ import os
 import json
 import sys
 import loadsmwrh
-import requests
+import rhpatch
+import rhhash
+import rhdownload
 import platform
 import pb_sendtosnes
 import traceback
@@ -21,28 +23,26 @@ def repatch_url_function(args,ccrom=False,noexit=False):
     if not loadsmwrh.path_rerequisites():
         return None
 
-    if os.path.exists("flips"):
-       flips_cmd = os.path.join('.','flips')
-    elif os.path.exists("flips.exe"):
-       flips_cmd = 'flips.exe'
-    elif os.path.exists("/mnt/c/snesgaming/bin/flips"):
-       flips_cmd = '/mnt/c/snesgaming/bin/flips'
-    elif os.path.exists("/usr/local/bin/flips"):
-       flips_cmd = 'flips'
-    else:
-       print('Please put flips or flips.exe and smw.sfc in start directory ' + os.getcwd())
-       return None
+    # Patches are applied in-process (rhpatch.py); flips is only a fallback
+    flips_cmd = rhpatch.find_flips()
         
 
     filename = os.path.join(path_prefix,os.path.join("temp","in.zip"))
     
     bpsurl = (args[1])
     if re.search(r'https?:', bpsurl):
-        req = requests.get(bpsurl)
-        if not(req.status_code == 200):
-            sys.stderr.write(f'ERR: HTTP Response {req.status_code} for URL')
-            raise Exception(f'ERR: HTTP Response {req.status_code} for URL')
-        dldata = req.content
+        # One file (and .part) per URL, so a partial download of one URL is
+        # never resumed against another
+        dlfile = os.path.join(path_prefix, "temp", "download_" + hashlib.sha224(bpsurl.encode('utf-8')).hexdigest() + ".dat")
+        try:
+            loadsmwrh.get_downloader().fetch(bpsurl, dlfile)
+        except rhdownload.DownloadError as xerr:
+            sys.stderr.write(f'ERR: {xerr}')
+            raise Exception(f'ERR: {xerr}')
+        f_handle = open(dlfile, 'rb')
+        dldata = f_handle.read()
+        f_handle.close()
+        os.remove(dlfile)
     elif re.match('[^.]+.(zip|bps)$',bpsurl, re.I):
         f_handle = open(bpsurl, 'rb')
         dldata = f_handle.read()
@@ -50,7 +50,6 @@ def repatch_url_function(args,ccrom=False,noexit=False):
     else:
         dldata = None
         raise ValueError('Invalid filename')
-    shake1 = (base64.b64encode(hashlib.shake_128(dldata).digest(24), b"_-")).decode('latin1')
 
     iszipfile = False
     try:
@@ -60,9 +59,6 @@ def repatch_url_function(args,ccrom=False,noexit=False):
                     continue
                 if re.match('.*\.bps', info.filename) :
                     dldata = zip.read(info)
-                    shake1 = (base64.b64encode(hashlib.shake_128(dldata).digest(24), b"_-")).decode('latin1')
-                    sha1 = (hashlib.sha1(dldata).hexdigest())
-                    xsha224 = hashlib.sha224(dldata).hexdigest()
                     break
         iszipfile = True
     except zipfile.BadZipFile: 
@@ -70,9 +66,7 @@ def repatch_url_function(args,ccrom=False,noexit=False):
 
     #filename = os.path.join(path_prefix,os.path.join("zips", "")) + str(shake1) + ".b"
     #data = loadsmwrh.get_patch_blob( str(hackid), blobinfo  )
-    shake1 = (base64.b64encode(hashlib.shake_128(dldata).digest(24), b"_-")).decode('latin1')
-    sha1 = (hashlib.sha1(dldata).hexdigest())
-    xsha224 = hashlib.sha224(dldata).hexdigest()
+    shake1, sha1, xsha224 = rhhash.triple(dldata)
     
     f1 = open(os.path.join(path_prefix, "temp",  xsha224) + ".new" , "wb")
     f1.write(dldata)
@@ -82,19 +76,18 @@ def repatch_url_function(args,ccrom=False,noexit=False):
     if not os.path.exists(os.path.join(path_prefix,'smw.sfc')):
         print('Could not find ' + os.path.join(path_prefix, 'smw.sfc') + ': SMW Romfile required - Unable to patch')
         return None
+    smwf = open(os.path.join(path_prefix, 'smw.sfc'), 'rb')
+    smwdata = smwf.read()
+    smwf.close()
     print('')
-    print('Running command: '+flips_cmd+' --apply ' + os.path.join(path_prefix,'patch', shake1) +"  "+os.path.join(path_prefix,'smw.sfc') +" " + os.path.join(path_prefix,'temp', 'result'))
-    os.system(flips_cmd+" --apply " + os.path.join(path_prefix,'patch', shake1) +"  "+os.path.join(path_prefix,'smw.sfc') +" " + os.path.join(path_prefix,'temp', 'result'))
-    ##data = bytearray()
-    ##with open(os.path.join("temp", "result"), "rb") as patched:
-    ##    data += patched.read(1)
-    resultf = open(os.path.join(path_prefix, "temp", "result"), "rb")
-    data = resultf.read()
-    resultf.close()
+    print('Applying ' + os.path.join(path_prefix,'patch', shake1) + ' to ' + os.path.join(path_prefix,'smw.sfc'))
+    try:
+        data = rhpatch.apply_patch(dldata, smwdata, flips_cmd)
+    except rhpatch.PatchError as err:
+        print('Error: Unable to apply patch: ' + str(err))
+        return None
     
-    shake1_patched = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
-    sha1_patched = (hashlib.sha1(data).hexdigest())
-    xsha224_patched = hashlib.sha224(data).hexdigest()
+    shake1_patched, sha1_patched, xsha224_patched = rhhash.triple(data)
 
     print(f'patchBPSURL={bpsurl}')
     urltrailer = re.split(r'/', bpsurl)[-1]
@@ -104,15 +97,16 @@ def repatch_url_function(args,ccrom=False,noexit=False):
     #SuperMarioWorld.ips
 
     namesuffix=''
-    resultfile=os.path.join('temp','result')
     if ccrom:
         namesuffix='.cc'
-        #
-        os.system(flips_cmd+" --apply " + os.path.join(path_prefix,'zips', 'ccSuperMarioWorld.ips') +"  "+os.path.join(path_prefix,'temp', 'result')+" "+os.path.join(path_prefix,'temp', 'result2'))
-        resultfile=os.path.join('temp','result2')
-        resultf = open(os.path.join(path_prefix, "temp", "result2"), "rb")
-        data = resultf.read()
-        resultf.close()
+        ccf = open(os.path.join(path_prefix,'zips', 'ccSuperMarioWorld.ips'), 'rb')
+        ccpatch = ccf.read()
+        ccf.close()
+        try:
+            data = rhpatch.apply_patch(ccpatch, data, flips_cmd)
+        except rhpatch.PatchError as err:
+            print('Error: Unable to apply ccSuperMarioWorld.ips: ' + str(err))
+            return None
         #shake1_patched = (base64.b64encode(hashlib.shake_128(data).digest(24), b"_-")).decode('latin1')
 
     jsonfilename = ''
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+bench_blob_decode.py - Peak memory and time of blob decoding: the
+in-memory path (read the file, lzma.decompress, Fernet.decrypt,
+lzma.decompress, then hash both ends) against blob_crypto.decode_blob_file()
+(mmap, chunked LZMA/base64/Fernet stages, hashing on the way; tokens up
+to blob_crypto.STAGE_LIMIT are decompressed whole before decrypting).
+
+Builds blobs with encrypt_blob() from synthetic patches of each size (half
+random, half zeros, so the inner LZMA stage has work to do) plus one
+LZMA-only resource blob, and reports the peak traced allocation
+(tracemalloc) per blob and as a multiple of the patch size.
+
+Usage:
+    python3 tests/bench_blob_decode.py [size_mb ...]      (default 0.25 1 4 16)
+"""
+
+import os
+import sys
+import lzma
+import time
+import base64
+import hashlib
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import blob_crypto
+from cryptography.fernet import Fernet
+
+
+def decode_in_memory(path, key, blob_sha224, pat_sha224):
+    # What decrypt_blob() / get_patch_blob() did before decode_blob()
+    with open(path, 'rb') as f:
+        blob_data = f.read()
+    if hashlib.sha224(blob_data).hexdigest() != blob_sha224:
+        raise ValueError('blob hash mismatch')
+    decomp_blob = lzma.decompress(blob_data)
+    if key is None:
+        decoded = decomp_blob
+    else:
+        frn = Fernet(base64.urlsafe_b64decode(key.encode('ascii')))
+        decrypted_blob = frn.decrypt(decomp_blob)
+        decoded = lzma.decompress(decrypted_blob)
+    if hashlib.sha224(decoded).hexdigest() != pat_sha224:
+        raise ValueError('patch hash mismatch')
+    return decoded
+
+
+def decode_streaming(path, key, blob_sha224, pat_sha224):
+    return blob_crypto.decode_blob_file(path, key, blob_sha224, pat_sha224)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(result)
+    del result
+    return peak, elapsed, size
+
+
+def make_patch(size):
+    return os.urandom(size // 2) + bytes(size - size // 2)
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [0.25, 1, 4, 16]
+    tmp = tempfile.mkdtemp(prefix='rhtools-bench-')
+    cases = []
+    for size_mb in sizes:
+        patch = make_patch(int(size_mb * (1 << 20)))
+        pat_sha224 = hashlib.sha224(patch).hexdigest()
+        blob, metadata = blob_crypto.encrypt_blob(patch, pat_sha224)
+        path = os.path.join(tmp, 'pblob_%g' % size_mb)
+        with open(path, 'wb') as f:
+            f.write(blob)
+        cases.append(('patch %gMB' % size_mb, path, metadata['patchblob1_key'],
+                      metadata['patchblob1_sha224'], pat_sha224))
+    # Resource blobs may be LZMA only: highly compressible, no Fernet stage
+    data = (b'resource data ' * 64 + os.urandom(64)) * int(max(sizes) * (1 << 20) / 960)
+    blob = lzma.compress(data)
+    path = os.path.join(tmp, 'resblob')
+    with open(path, 'wb') as f:
+        f.write(blob)
+    cases.append(('resource %.0fMB (lzma)' % (len(data) / (1 << 20)), path, None,
+                  hashlib.sha224(blob).hexdigest(), hashlib.sha224(data).hexdigest()))
+
+    print('%-24s %10s  %-22s %-22s %s' % ('blob', 'blob size', 'in-memory peak', 'streaming peak', 'time (mem/stream)'))
+    try:
+        for name, path, key, blob_sha224, pat_sha224 in cases:
+            old_peak, old_time, size = measure(decode_in_memory, path, key, blob_sha224, pat_sha224)
+            new_peak, new_time, size2 = measure(decode_streaming, path, key, blob_sha224, pat_sha224)
+            assert size == size2
+            print('%-24s %9.1fM  %7.1fM (%4.1fx patch)  %7.1fM (%4.1fx patch)  %.2fs / %.2fs'
+                  % (name, os.path.getsize(path) / 1e6, old_peak / 1e6, old_peak / size,
+                     new_peak / 1e6, new_peak / size, old_time, new_time))
+    finally:
+        for name, path, key, blob_sha224, pat_sha224 in cases:
+            os.remove(path)
+        os.rmdir(tmp)
+
+
+if __name__ == '__main__':
+    main()
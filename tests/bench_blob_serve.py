@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_blob_serve.py - N blob decrypts as N ``python3 blob_crypto.py
+decrypt`` subprocesses (what the Node side's execSync calls do) against one
+``blob_crypto.py serve`` process fed N JSON-lines requests, with 1 and 4
+worker threads.  Serve timings include starting the process.
+
+Usage:
+    python3 tests/bench_blob_serve.py [count] [patch_kb]     (default 50 blobs, 256 KB)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import blob_crypto
+
+SCRIPT = os.path.join(ROOT, 'blob_crypto.py')
+
+
+def run_subprocesses(jobs):
+    for job in jobs:
+        subprocess.run([sys.executable, SCRIPT, 'decrypt', job['input'], job['output'], job['key'],
+                        job['blob_sha224'], job['pat_sha224']], check=True, stdout=subprocess.DEVNULL)
+
+
+def run_serve(jobs, workers):
+    proc = subprocess.Popen([sys.executable, SCRIPT, 'serve', '--workers', str(workers)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    # Requests are written from a thread while responses are read, so
+    # neither pipe can fill up
+    def send():
+        for i, job in enumerate(jobs):
+            proc.stdin.write(json.dumps(dict(job, id=i, op='decrypt')) + '\n')
+        proc.stdin.close()
+    sender = threading.Thread(target=send)
+    sender.start()
+    failed = 0
+    for line in proc.stdout:
+        if not json.loads(line)['success']:
+            failed += 1
+    sender.join()
+    proc.wait()
+    if failed:
+        raise RuntimeError('%d requests failed' % failed)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    patch_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    tmp = tempfile.mkdtemp(prefix='rhtools-bench-')
+    try:
+        patch = os.urandom(patch_kb * 512) + bytes(patch_kb * 512)
+        pat_sha224 = hashlib.sha224(patch).hexdigest()
+        blob, metadata = blob_crypto.encrypt_blob(patch, pat_sha224)
+        jobs = []
+        for i in range(count):
+            path = os.path.join(tmp, 'pblob_%d' % i)
+            with open(path, 'wb') as f:
+                f.write(blob)
+            jobs.append({'input': path, 'output': path + '.bps', 'key': metadata['patchblob1_key'],
+                         'blob_sha224': metadata['patchblob1_sha224'], 'pat_sha224': pat_sha224})
+
+        print('%d blobs, %d KB patches' % (count, patch_kb))
+        started = time.perf_counter()
+        run_subprocesses(jobs)
+        base = time.perf_counter() - started
+        print('%-22s %7.2fs  %6.1f ms/blob' % ('subprocess per blob', base, base * 1000 / count))
+        for workers in (1, 4):
+            started = time.perf_counter()
+            run_serve(jobs, workers)
+            elapsed = time.perf_counter() - started
+            print('%-22s %7.2fs  %6.1f ms/blob  %5.1fx' % ('serve, %d worker%s' % (workers, 's' if workers > 1 else ''),
+                                                        elapsed, elapsed * 1000 / count, base / elapsed))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
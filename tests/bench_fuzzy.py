@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+bench_fuzzy.py - Build, incremental sync and top-k latency of rhfuzzy.FuzzyIndex
+
+Real catalogs have tens of thousands of distinct names, so names here mix
+a few very common words with random pseudo-words, rather than using
+bench_records' small vocabulary.
+Queries are catalog names/authors with one or two letters changed.
+
+Usage:
+    python3 tests/bench_fuzzy.py [count]            (default 30000)
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rhfuzzy
+
+COMMON = "super mario world kaizo island dream castle star road the of quest bros".split()
+CONSONANTS = "bcdfghjklmnprstvwxyz"
+VOWELS = "aeiou"
+
+
+def word(rnd):
+    if rnd.random() < 0.3:
+        return rnd.choice(COMMON).title()
+    return ''.join(rnd.choice(CONSONANTS) + rnd.choice(VOWELS)
+                   for _ in range(rnd.randint(2, 4))).title()
+
+
+def make_catalog(count, seed=1):
+    rnd = random.Random(seed)
+    authors = [word(rnd) for _ in range(3000)]
+    return [{'id': str(10000 + i),
+             'name': ' '.join(word(rnd) for _ in range(rnd.randint(1, 4))),
+             'authors': rnd.choice(authors)} for i in range(count)]
+
+
+def misspell(rnd, text):
+    chars = list(text)
+    for _ in range(rnd.randint(1, 2)):
+        i = rnd.randrange(len(chars))
+        chars[i] = rnd.choice('aeioukrst')
+    return ''.join(chars)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    rnd = random.Random(2)
+    hacklist = make_catalog(count)
+
+    started = time.perf_counter()
+    index = rhfuzzy.FuzzyIndex()
+    index.sync(hacklist)
+    print('%d hacks, full build %.2fs' % (count, time.perf_counter() - started))
+
+    path = os.path.join(tempfile.mkdtemp(prefix='rhtools-bench-'), 'fuzzy.rhfz')
+    index.save(path)
+    started = time.perf_counter()
+    loaded = rhfuzzy.FuzzyIndex.load(path)
+    hacklist.append({'id': 'new_1', 'name': 'Brand New Hack', 'authors': 'Someone'})
+    updated = loaded.sync(hacklist)
+    print('load saved index + sync %d added hack: %.3fs (%d KiB on disk)' % (
+          updated, time.perf_counter() - started, os.path.getsize(path) // 1024))
+
+    queries = [misspell(rnd, rnd.choice(hacklist)[rnd.choice(['name', 'authors'])]) for _ in range(500)]
+    hits = 0
+    started = time.perf_counter()
+    for q in queries:
+        if loaded.top(q, k=5):
+            hits += 1
+    per_query = (time.perf_counter() - started) / len(queries)
+    print('top-5 of misspelled names/authors: %.3f ms/query, %d/%d with results' % (
+          per_query * 1000, hits, len(queries)))
+    print('example:', queries[0], '->', loaded.top(queries[0], k=3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+bench_md_prefetch.py - Offline throughput of loadsmwrh.prefetch_hack_metadata()
+
+Runs the prefetch against the local StubMetadataServer from
+test_md_prefetch.py with a fixed per-request latency and compares a
+sequential run (jobs=1, like calling complete_hack_metadata() per hack)
+with concurrent runs.
+
+Usage:
+    python3 tests/bench_md_prefetch.py [count] [latency_ms]     (default 200 25)
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_md_prefetch import StubMetadataServer, CatalogDir, make_hacklist, AUTH
+import loadsmwrh
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 25) / 1000.0
+    print('%d hacks, %.0f ms simulated server latency' % (count, latency * 1000))
+    for jobs in (1, 4, 8, 16, 32):
+        with StubMetadataServer(delay=latency) as server, \
+             CatalogDir(make_hacklist(count), server.url):
+            started = time.perf_counter()
+            result = loadsmwrh.prefetch_hack_metadata(jobs=jobs, adata=AUTH)
+            elapsed = time.perf_counter() - started
+            saves = loadsmwrh.get_md_cache().stats()['saves']
+        print('jobs=%-3d %6.2fs  %7.1f hacks/s  (%d fetched, %d save)' % (
+              jobs, elapsed, result['fetched'] / elapsed, result['fetched'], saves))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_records.py - Memory/speed comparison of rhrecords.RecordStore
+against the plain list-of-dicts returned by get_hacklist_data()
+
+Builds a synthetic catalog shaped like rhmd.dat and reports the bytes
+allocated (tracemalloc) for each representation, plus the time to build
+the store and to scan every record's hot fields.
+
+Usage:
+    python3 tests/bench_records.py [count]          (default 30000)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rhrecords
+
+TYPES = ["Standard: Easy", "Standard: Normal", "Standard: Hard", "Kaizo: Beginner",
+         "Kaizo: Intermediate", "Kaizo: Expert", "Pit", "Misc.: Troll"]
+TAGS = ["vanilla", "castle", "racelevel", "puzzle", "water", "contestlevel", "demo", "boss"]
+WORDS = "mario world island kaizo dream castle star road forest cave luigi yoshi super quest".split()
+AUTHORS = ["author%d" % i for i in range(400)]
+
+
+def make_catalog(count, seed=1):
+    rnd = random.Random(seed)
+    hacklist = []
+    for i in range(count):
+        hid = str(10000 + i)
+        hacklist.append({
+            "id": hid,
+            "name": " ".join(rnd.choice(WORDS).title() for _ in range(3)),
+            "authors": rnd.choice(AUTHORS),
+            "type": rnd.choice(TYPES),
+            "demo": rnd.choice(["Yes", "No"]),
+            "featured": rnd.choice(["Yes", "No"]),
+            "tags": rnd.sample(TAGS, 2),
+            "length": "%d exit(s)" % rnd.randint(1, 120),
+            "description": " ".join(rnd.choice(WORDS) for _ in range(25)),
+            "added": "20%02d-%02d-%02d 10:00:00 AM" % (rnd.randint(10, 25), rnd.randint(1, 12), rnd.randint(1, 28)),
+            "rating": str(rnd.randint(0, 50) / 10),
+            "size": "%d.%d MiB" % (rnd.randint(0, 9), rnd.randint(0, 9)),
+            "downloaded_count": str(rnd.randint(0, 90000)),
+            "url": "https://www.smwcentral.net/?p=section&a=details&id=" + hid,
+            "name_href": "//www.smwcentral.net/?p=section&a=details&id=" + hid,
+            "author_href": "//www.smwcentral.net/?p=profile&id=" + str(rnd.randint(1, 9999)),
+            "download_url": "//dl.smwcentral.net/" + hid + "/patch.zip",
+            "patchblob1_name": "pblob_%s_%032x" % (hid, rnd.getrandbits(128)),
+            "pat_sha224": "%056x" % rnd.getrandbits(224),
+            "result_sha224": "%056x" % rnd.getrandbits(224),
+        })
+    return hacklist
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size, peak
+
+
+def scan(records):
+    n = 0
+    for rec in records:
+        if rec['type'].startswith('Kaizo') and 'castle' in rec['tags'] and rec['name']:
+            n += 1
+    return n
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    text = json.dumps(make_catalog(count))
+
+    hacklist, list_bytes, _ = measure(lambda: json.loads(text))
+    t0 = time.perf_counter()
+    store, store_bytes, store_peak = measure(lambda: rhrecords.RecordStore.from_list(hacklist))
+    build_s = time.perf_counter() - t0
+    del hacklist
+    hacklist = json.loads(text)
+
+    t0 = time.perf_counter()
+    nlist = scan(hacklist)
+    list_scan = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    nstore = scan(store.records())
+    store_scan = time.perf_counter() - t0
+    assert nlist == nstore
+    assert store[hacklist[-1]['id']].to_dict() == hacklist[-1]
+
+    print('records:            %d' % count)
+    print('list of dicts:      %8.1f MiB' % (list_bytes / 1048576.0))
+    print('RecordStore:        %8.1f MiB  (peak %.1f MiB while building, %.2fs)'
+          % (store_bytes / 1048576.0, store_peak / 1048576.0, build_s))
+    print('ratio:              %8.2fx' % (list_bytes / float(store_bytes)))
+    print('hot-field scan:     list %.3fs, store %.3fs' % (list_scan, store_scan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+bench_search.py - rhsearch.SearchIndex against the old per-record re.search() scan
+
+Builds a synthetic catalog (bench_records.make_catalog) and times, for
+prefix, multi-word, phrase and regex queries, the old filter loop
+(re.search over every lowercased field of every hack) and the index with
+fallback=True (substring matches added, as the GUI filter, search.py and
+rhcatalogd query it), plus the one-off index build.
+
+Usage:
+    python3 tests/bench_search.py [count]           (default 50000)
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bench_records import make_catalog
+import rhsearch
+
+FIELDS = ('id', 'name', 'type', 'authors', 'description', 'tags')
+QUERIES = ['cas', 'kaizo castle', '"star road"', 'author12', '^dream.*quest$']
+REPEAT = 5
+
+
+def old_scan(hacklist, text):
+    # What loadsmwrh.hinfoMatch() / search.py did per record
+    result = []
+    for h in hacklist:
+        for field in FIELDS:
+            if field in h and re.search(text.lower(), str(h[field]).lower()):
+                result.append(h)
+                break
+    return result
+
+
+def timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        value = fn()
+    return (time.perf_counter() - started) / REPEAT, value
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    hacklist = make_catalog(count)
+    started = time.perf_counter()
+    index = rhsearch.SearchIndex(hacklist)
+    print('%d hacks, index build %.2fs' % (count, time.perf_counter() - started))
+    print('%-18s %10s %10s %8s %8s' % ('query', 're.search', 'index', 'speedup', 'hits'))
+    for query in QUERIES:
+        old_text = query.replace('"', '')
+        if old_text == 'kaizo castle':
+            old_text = 'kaizo.*castle|castle.*kaizo'  # nearest single-regex equivalent
+        old_t, old_hits = timed(lambda: old_scan(hacklist, old_text))
+        new_t, new_hits = timed(lambda: index.search(query, fields=FIELDS, fallback=True))
+        print('%-18s %9.1fms %9.1fms %7.0fx %8d' % (query, old_t * 1000, new_t * 1000,
+              old_t / max(new_t, 1e-9), len(new_hits)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Shared pieces of the local stand-in HTTP servers used by the Python tests
+(StubMetadataServer, StubFileServer, StubGateway).
+
+Usage:
+    from tests.stubserver import StubHTTPServer
+    httpd = StubHTTPServer(('127.0.0.1', 0), Handler)
+"""
+
+from http.server import ThreadingHTTPServer
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # Tests open many connections at once (pools, hedged requests), and a
+    # stuck handler thread must not keep the test process alive
+    request_queue_size = 64
+    daemon_threads = True
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming decoder in blob_crypto.py (decode_blob,
+decode_blob_file, BlobDecoder): Python and JavaScript blob formats at
+several chunk sizes, staged and streamed Fernet tokens, LZMA-only blobs, and which error wins when a blob is
+damaged or the key is wrong.  Also the JSON-lines ``serve`` mode, in
+process and as a subprocess.
+
+Usage:
+    python3 -m pytest tests/test_blob_crypto.py
+    python3 -m unittest tests.test_blob_crypto
+"""
+
+import io
+import os
+import sys
+import json
+import lzma
+import base64
+import shutil
+import hashlib
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import blob_crypto
+from cryptography.fernet import InvalidToken
+
+PATCH = os.urandom(200000) + bytes(300000)
+PAT_SHA224 = hashlib.sha224(PATCH).hexdigest()
+
+
+class DecodeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # encrypt_*() run PBKDF2, so each blob is made once
+        cls.py_blob, cls.py_meta = blob_crypto.encrypt_blob(PATCH, PAT_SHA224)
+        cls.js_blob, cls.js_meta = blob_crypto.encrypt_for_javascript(PATCH, PAT_SHA224)
+        cls.other_blob, cls.other_meta = blob_crypto.encrypt_blob(b'x' * 10, PAT_SHA224)
+
+    def test_formats_and_chunk_sizes(self):
+        for blob, meta, fmt in ((self.py_blob, self.py_meta, 'python'), (self.js_blob, self.js_meta, 'javascript')):
+            for chunk_size in (1, 1000, blob_crypto.CHUNK_SIZE):
+                if chunk_size == 1 and fmt == 'javascript':
+                    continue
+                info = {}
+                out = blob_crypto.decode_blob(blob, meta['patchblob1_key'], meta['patchblob1_sha224'],
+                                              PAT_SHA224, info=info, chunk_size=chunk_size)
+                self.assertEqual(out, PATCH)
+                self.assertEqual(info['format'], fmt)
+                self.assertEqual(info['blob_sha224'], meta['patchblob1_sha224'])
+                self.assertEqual(info['pat_sha224'], PAT_SHA224)
+                self.assertEqual(info['blob_size'], len(blob))
+
+    def test_stage_limit(self):
+        # Small tokens are decompressed whole before decrypting; a token
+        # past STAGE_LIMIT goes on to the Fernet stage as it arrives
+        saved = blob_crypto.STAGE_LIMIT
+        try:
+            for limit in (0, 1000, saved):
+                blob_crypto.STAGE_LIMIT = limit
+                for blob, meta in ((self.py_blob, self.py_meta), (self.js_blob, self.js_meta)):
+                    out = blob_crypto.decode_blob(blob, meta['patchblob1_key'], meta['patchblob1_sha224'],
+                                                  PAT_SHA224, chunk_size=1000)
+                    self.assertEqual(out, PATCH)
+                with self.assertRaises(InvalidToken):
+                    blob_crypto.decode_blob(self.py_blob, self.other_meta['patchblob1_key'])
+        finally:
+            blob_crypto.STAGE_LIMIT = saved
+
+    def test_decrypt_blob_and_file(self):
+        meta = self.py_meta
+        self.assertEqual(blob_crypto.decrypt_blob(self.py_blob, meta['patchblob1_key'],
+                                                  meta['patchblob1_sha224'], PAT_SHA224), PATCH)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.py_blob)
+            f.flush()
+            self.assertEqual(blob_crypto.decode_blob_file(f.name, meta['patchblob1_key'],
+                                                          meta['patchblob1_sha224'], PAT_SHA224), PATCH)
+
+    def test_lzma_only(self):
+        data = b'resource' * 10000
+        blob = lzma.compress(data) + lzma.compress(b'!')
+        for key in (None, '', 'none'):
+            self.assertEqual(blob_crypto.decode_blob(blob, key), data + b'!')
+
+    def test_damaged_blob(self):
+        meta = self.py_meta
+        damaged = bytearray(self.py_blob)
+        damaged[len(damaged) // 2] ^= 0x01
+        # With the expected hash: a hash mismatch, like hashing first
+        with self.assertRaisesRegex(blob_crypto.BlobHashError, 'Blob hash mismatch'):
+            blob_crypto.decode_blob(bytes(damaged), meta['patchblob1_key'], meta['patchblob1_sha224'])
+        # Without it: the decode error
+        with self.assertRaises((ValueError, InvalidToken)):
+            blob_crypto.decode_blob(bytes(damaged), meta['patchblob1_key'])
+        with self.assertRaisesRegex(ValueError, 'Cannot decode blob'):
+            blob_crypto.decode_blob(self.py_blob[0:-100], meta['patchblob1_key'])
+
+    def test_wrong_key(self):
+        # Garbage plaintext must not surface as an LZMA error before the HMAC is checked
+        with self.assertRaises(InvalidToken):
+            blob_crypto.decode_blob(self.py_blob, self.other_meta['patchblob1_key'])
+
+    def test_patch_hash_mismatch(self):
+        with self.assertRaisesRegex(ValueError, 'Patch hash mismatch'):
+            blob_crypto.decode_blob(self.py_blob, self.py_meta['patchblob1_key'], pat_sha224='0' * 56)
+
+    def test_max_size(self):
+        with self.assertRaisesRegex(ValueError, 'larger than'):
+            blob_crypto.decode_blob(self.py_blob, self.py_meta['patchblob1_key'], max_size=1000)
+
+
+class ServeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        cls.patch_path = os.path.join(cls.dir, 'patch.bps')
+        with open(cls.patch_path, 'wb') as f:
+            f.write(PATCH)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+
+    def serve(self, requests, workers=1):
+        infile = io.StringIO(''.join(json.dumps(r) + '\n' for r in requests) + '\nnot json\n')
+        outfile = io.StringIO()
+        blob_crypto.serve(infile, outfile, workers)
+        return [json.loads(line) for line in outfile.getvalue().splitlines()]
+
+    def test_requests(self):
+        blob_path = os.path.join(self.dir, 'patch.blob')
+        encrypted = self.serve([{'id': 'e', 'op': 'encrypt', 'input': self.patch_path, 'output': blob_path,
+                                 'pat_sha224': PAT_SHA224}])[0]
+        self.assertEqual(encrypted['id'], 'e')
+        self.assertTrue(encrypted['success'])
+        meta = encrypted['metadata']
+        with open(blob_path, 'rb') as f:
+            blob_b64 = base64.b64encode(f.read()).decode('ascii')
+        fields = {'key': meta['patchblob1_key'], 'blob_sha224': meta['patchblob1_sha224']}
+        requests = [
+            {'id': 1, 'op': 'ping'},
+            dict(fields, id=2, op='decrypt', input=blob_path, pat_sha224=PAT_SHA224),
+            dict(fields, id=3, op='info', data=blob_b64),
+            dict(fields, id=4, op='decrypt', input=blob_path, blob_sha224='0' * 56),
+            {'id': 5, 'op': 'decrypt', 'input': blob_path},
+            {'id': 6, 'op': 'bogus'},
+        ]
+        for workers in (1, 3):
+            responses = self.serve(requests, workers)
+            self.assertEqual(len(responses), 7)
+            by_id = dict((r['id'], r) for r in responses)
+            self.assertTrue(by_id[1]['success'])
+            self.assertEqual(base64.b64decode(by_id[2]['data']), PATCH)
+            self.assertEqual(by_id[2]['patch_sha224'], PAT_SHA224)
+            self.assertEqual(by_id[3]['patch_size'], len(PATCH))
+            self.assertEqual(by_id[4]['error_type'], 'BlobHashError')
+            self.assertEqual(by_id[5]['error_type'], 'KeyError')
+            self.assertIn('Unknown op', by_id[6]['error'])
+            self.assertFalse(by_id[None]['success'])
+
+    def test_subprocess(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blob_crypto.py')
+        proc = subprocess.Popen([sys.executable, script, 'serve', '--workers', '2'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        # One request at a time: the process answers each line as it arrives
+        for i in range(3):
+            proc.stdin.write(json.dumps({'id': i, 'op': 'ping'}) + '\n')
+            proc.stdin.flush()
+            self.assertEqual(json.loads(proc.stdout.readline()), {'id': i, 'success': True})
+        proc.stdin.close()
+        self.assertEqual(proc.wait(timeout=30), 0)
+        proc.stdout.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for loadsmwrh.prefetch_hack_metadata() against a local stand-in for
+the metadata server (StubMetadataServer), so no network access is needed.
+
+Usage:
+    python3 -m pytest tests/test_md_prefetch.py
+    python3 -m unittest tests.test_md_prefetch
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tests.stubserver import StubHTTPServer
+
+AUTH = {'userkey': 'u1', 'encryptedvalue': 'ev', 'twid': '1', 'twlogin': 'tester'}
+
+
+class StubMetadataServer:
+    """
+    Answers POST /md/<objkey>/<id> like the metadata server does.  Ids in
+    ``fail_ids`` get a 404, ids in ``html_ids`` a 200 with an HTML page;
+    ``delay`` seconds are added to every reply.
+    """
+
+    def __init__(self, delay=0.0, fail_ids=(), html_ids=()):
+        self.delay = delay
+        self.fail_ids = set(fail_ids)
+        self.html_ids = set(html_ids)
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, so the client's connection pool is exercised
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                with stub._lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    parts = self.path.strip('/').split('/')
+                    hackid = parts[-1]
+                    with stub._lock:
+                        stub.requests.append(hackid)
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    if hackid in stub.fail_ids or self.headers.get('userkey') != AUTH['userkey']:
+                        self.send_response(404)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    if hackid in stub.html_ids:
+                        body = b'<html><body>Service unavailable</body></html>'
+                        ctype = 'text/html'
+                    else:
+                        body = json.dumps({'xdata': {'name_href': '//example/' + hackid},
+                                           'patchblob1_name': 'pblob_' + hackid}).encode('utf8')
+                        ctype = 'application/json'
+                    self.send_response(200)
+                    self.send_header('Content-Type', ctype)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = StubHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/md' % self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_hacklist(count):
+    return [{'id': str(100 + i), 'name': 'Hack %d' % i, 'objkey': 'ok%d' % i,
+             'authors': 'someone', 'type': 'Standard: Easy'} for i in range(count)]
+
+
+class CatalogDir:
+    """Temporary RHTOOLS_PATH with an rhmd.dat holding ``hacklist``"""
+
+    def __init__(self, hacklist, md_url):
+        self.hacklist = hacklist
+        self.md_url = md_url
+
+    def __enter__(self):
+        import loadsmwrh
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.saved_env = {k: os.environ.get(k) for k in ('RHTOOLS_PATH', 'RHMD_FILE', 'RHTOOLS_MD_URL')}
+        os.environ['RHTOOLS_PATH'] = self.dir
+        os.environ['RHMD_FILE'] = os.path.join(self.dir, 'rhmd.dat')
+        os.environ['RHTOOLS_MD_URL'] = self.md_url
+        loadsmwrh.save_hacklist_data(list(self.hacklist))
+        return self.dir
+
+    def __exit__(self, *exc):
+        for k, v in self.saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class PrefetchTest(unittest.TestCase):
+
+    def test_prefetch_fills_cache_with_one_save(self):
+        import loadsmwrh
+        with StubMetadataServer(delay=0.02) as server, \
+             CatalogDir(make_hacklist(40), server.url):
+            result = loadsmwrh.prefetch_hack_metadata(jobs=8, adata=AUTH)
+            self.assertEqual(result['fetched'], 40)
+            self.assertEqual(result['failed'], [])
+            self.assertEqual(sorted(server.requests), sorted(h['id'] for h in make_hacklist(40)))
+            self.assertGreater(server.max_active, 1)
+            self.assertEqual(loadsmwrh.get_md_cache().stats()['saves'], 1)
+
+            # Launch path: merged info comes from the cache, no request made
+            seen = len(server.requests)
+            hinfo = loadsmwrh.complete_hack_metadata(loadsmwrh.get_hack_info('105', True))
+            self.assertEqual(hinfo['patchblob1_name'], 'pblob_105')
+            self.assertEqual(hinfo['xdata']['name_href'], '//example/105')
+            self.assertEqual(len(server.requests), seen)
+
+            # Already cached ids are skipped
+            again = loadsmwrh.prefetch_hack_metadata(jobs=8, adata=AUTH)
+            self.assertEqual(again['todo'], 0)
+            self.assertEqual(len(server.requests), seen)
+
+    def test_prefetch_reports_failures_and_skips_complete_hacks(self):
+        import loadsmwrh
+        hacklist = make_hacklist(6)
+        hacklist[0]['patchblob1_name'] = 'already_known'
+        with StubMetadataServer(fail_ids=['102'], html_ids=['104']) as server, \
+             CatalogDir(hacklist, server.url):
+            result = loadsmwrh.prefetch_hack_metadata(['100', '101', '102', '103', '104', 'nosuch'],
+                                                      jobs=4, adata=AUTH)
+            self.assertEqual(result['todo'], 4)
+            self.assertEqual(result['fetched'], 2)
+            self.assertEqual(result['failed'], ['102', '104'])
+            self.assertNotIn('100', server.requests)
+            self.assertIsNone(loadsmwrh.get_md_cache().get('102'))
+            self.assertIsNone(loadsmwrh.get_md_cache().get('104'))
+            self.assertIsNotNone(loadsmwrh.get_md_cache().get('103'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Tests for rhdownload.DownloadManager against a local stand-in file server
+(StubFileServer) that honours Range requests and can drop connections
+part-way, ignore Range, or delay replies.
+
+Usage:
+    python3 -m pytest tests/test_rhdownload.py
+    python3 -m unittest tests.test_rhdownload
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhdownload
+from tests.stubserver import StubHTTPServer
+
+
+class StubFileServer:
+    """
+    Serves GET /<name> from ``files``.  The first ``drop_after`` replies of
+    a file stop after that many bytes and close the connection; with
+    ``ignore_range`` every reply is a full 200; ``delay`` seconds are added
+    to every reply.
+    """
+
+    def __init__(self, files, drop_after=None, drops=1, ignore_range=False, delay=0.0):
+        self.files = files
+        self.drop_after = drop_after
+        self.drops = drops
+        self.ignore_range = ignore_range
+        self.delay = delay
+        self.requests = []
+        self.sent = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    stub.requests.append((self.path, self.headers.get('Range')))
+                try:
+                    self._reply()
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def _reply(self):
+                if stub.delay:
+                    time.sleep(stub.delay)
+                data = stub.files.get(self.path.lstrip('/'))
+                if data is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                start = 0
+                rng = self.headers.get('Range')
+                if rng and not stub.ignore_range:
+                    start = int(rng.split('=')[1].split('-')[0])
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header('Content-Range', 'bytes */%d' % len(data))
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, len(data) - 1, len(data)))
+                else:
+                    self.send_response(200)
+                body = data[start:]
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                with stub._lock:
+                    drop = stub.drop_after is not None and stub.drops > 0
+                    if drop:
+                        stub.drops -= 1
+                if drop:
+                    body = body[0:stub.drop_after]
+                    self.close_connection = True
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = StubHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/' % self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+DATA = os.urandom(300000)
+SHA224 = hashlib.sha224(DATA).hexdigest()
+
+
+class DownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.dest = os.path.join(self.dir, 'sub', 'pset.zip')
+        self.dl = rhdownload.DownloadManager(backoff=0.01, chunk_size=8192)
+
+    def tearDown(self):
+        self.dl.close()
+        shutil.rmtree(self.dir)
+
+    def read_dest(self):
+        with open(self.dest, 'rb') as f:
+            return f.read()
+
+    def write_part(self, data, url):
+        # A .part file left by an earlier run that was fetching ``url``
+        os.makedirs(os.path.dirname(self.dest), exist_ok=True)
+        with open(self.dest + '.part', 'wb') as f:
+            f.write(data)
+        with open(self.dest + '.part.json', 'w') as f:
+            json.dump({'url': url}, f)
+
+    def test_simple(self):
+        with StubFileServer({'a': DATA}) as server:
+            self.assertEqual(self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224},
+                                           size=len(DATA)), self.dest)
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+        self.assertFalse(os.path.exists(self.dest + '.part.json'))
+        self.assertEqual(self.dl.stats['requests'], 1)
+
+    def test_resume_after_drop(self):
+        with StubFileServer({'a': DATA}, drop_after=100000) as server:
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+            # Resumed from what reached the .part file, not from zero
+            self.assertEqual(len(server.requests), 2)
+            self.assertRegex(server.requests[1][1], r'^bytes=\d+-$')
+            self.assertGreater(int(server.requests[1][1][6:-1]), 0)
+            self.assertLess(server.sent, len(DATA) + 100000)
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertEqual(self.dl.stats['resumed'], 1)
+        self.assertEqual(self.dl.stats['retries'], 1)
+
+    def test_existing_part(self):
+        with StubFileServer({'a': DATA}) as server:
+            self.write_part(DATA[0:250000], server.url + 'a')
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+            self.assertEqual(server.sent, len(DATA) - 250000)
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_complete_part(self):
+        with StubFileServer({'a': DATA}) as server:
+            self.write_part(DATA, server.url + 'a')
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_overlong_part(self):
+        with StubFileServer({'a': DATA}) as server:
+            self.write_part(DATA + b'junk', server.url + 'a')
+            self.dl.fetch(server.url + 'a', self.dest)
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_range_ignored(self):
+        with StubFileServer({'a': DATA}, ignore_range=True) as server:
+            self.write_part(b'x' * 1000, server.url + 'a')
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertEqual(self.dl.stats['restarted'], 1)
+
+    def test_part_from_other_url(self):
+        # Same dest, different URL: the old .part is not resumed
+        with StubFileServer({'a': DATA, 'b': DATA[::-1]}) as server:
+            self.write_part(DATA[::-1][0:100000], server.url + 'b')
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+            self.assertEqual(server.requests, [('/a', None)])
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertEqual(self.dl.stats['restarted'], 1)
+
+    def test_part_without_record(self):
+        os.makedirs(os.path.dirname(self.dest))
+        with open(self.dest + '.part', 'wb') as f:
+            f.write(b'x' * 1000)
+        with StubFileServer({'a': DATA}) as server:
+            self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': SHA224})
+            self.assertEqual(server.requests, [('/a', None)])
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_checksum_mismatch(self):
+        with StubFileServer({'a': DATA}) as server:
+            with self.assertRaisesRegex(rhdownload.ContentError, 'sha224'):
+                self.dl.fetch(server.url + 'a', self.dest, checksums={'sha224': '0' * 56})
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+        self.assertFalse(os.path.exists(self.dest + '.part.json'))
+
+    def test_validator(self):
+        with StubFileServer({'a': DATA}) as server:
+            with self.assertRaisesRegex(rhdownload.ContentError, 'validator'):
+                self.dl.fetch(server.url + 'a', self.dest, validate=lambda path: False)
+        self.assertFalse(os.path.exists(self.dest + '.part'))
+
+    def test_not_found(self):
+        with StubFileServer({}) as server:
+            with self.assertRaisesRegex(rhdownload.DownloadError, '404'):
+                self.dl.fetch(server.url + 'missing', self.dest)
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_per_host_limit(self):
+        files = dict(('f%d' % i, DATA[i:i + 1000]) for i in range(8))
+        jobs = [{'url': None, 'dest': os.path.join(self.dir, name)} for name in sorted(files)]
+        dl = rhdownload.DownloadManager(per_host=2, max_workers=6)
+        try:
+            with StubFileServer(files, delay=0.1) as server:
+                for job, name in zip(jobs, sorted(files)):
+                    job['url'] = server.url + name
+                results = dl.fetch_many(jobs + [{'url': server.url + 'nope', 'dest': self.dest}])
+                self.assertLessEqual(server.max_active, 2)
+        finally:
+            dl.close()
+        self.assertEqual(results[0:8], [job['dest'] for job in jobs])
+        self.assertIsInstance(results[8], rhdownload.DownloadError)
+        for name in files:
+            with open(os.path.join(self.dir, name), 'rb') as f:
+                self.assertEqual(f.read(), files[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
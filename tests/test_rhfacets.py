@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for rhfacets.FacetIndex: the type/tag/flag bitsets built from a
+catalog, type (difficulty) and tag intersections, range and value
+queries, level bits from an rhlevellog store, sample(), and a rebuild
+through rhcatalog.CatalogCache.load_derived() after the catalog changes.
+
+Usage:
+    python3 -m pytest tests/test_rhfacets.py
+    python3 -m unittest tests.test_rhfacets
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhcatalog
+import rhfacets
+import rhlevellog
+
+HACKS = [
+    {'id': '10', 'name': 'Star Road', 'type': 'Kaizo: Expert', 'tags': ['castle'], 'length': '12 exits',
+     'rating': '4.5', 'added': '2021-05-16 10:00:00 AM'},
+    {'id': '11', 'name': 'Dream Quest', 'type': 'Standard: Easy', 'demo': 'Yes', 'length': '3 exits',
+     'rating': '2.0', 'added': '2019-01-02'},
+    {'id': '12', 'name': 'Pit Stop', 'type': 'Kaizo: Light', 'tags': ['racelevel', 'adult content'],
+     'length': '1 exit', 'added': '2022-11-30'},
+    {'id': '13', 'name': 'Cave Run', 'type': 'Kaizo: Expert', 'contest': 'SMWC 2020', 'length': 'n/a',
+     'rating': '3.9'},
+    {'id': '14', 'name': 'Long Walk', 'type': 'Standard: Normal', 'tags': ['castle'], 'length': '40',
+     'rating': '', 'added': '2020-07-01'},
+]
+
+
+def ids(facets, bits):
+    return [rec['id'] for rec in facets.records(bits)]
+
+
+class FacetIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facets = rhfacets.FacetIndex(HACKS)
+
+    def test_build(self):
+        f = self.facets
+        self.assertEqual(len(f), 5)
+        self.assertEqual(f.all, 0b11111)
+        self.assertEqual(list(f.types), ['Kaizo: Expert', 'Standard: Easy', 'Kaizo: Light', 'Standard: Normal'])
+        self.assertEqual(ids(f, f.types['Kaizo: Expert']), ['10', '13'])
+        self.assertEqual(ids(f, f.tags['castle']), ['10', '14'])
+        self.assertEqual(ids(f, f.flags['demo']), ['11'])
+        self.assertEqual(ids(f, f.flags['racelevel']), ['12'])
+        self.assertEqual(ids(f, f.flags['contest']), ['13'])
+        self.assertEqual(ids(f, f.id_bits([14, '10', '99'])), ['10', '14'])
+
+    def test_type_and_difficulty(self):
+        f = self.facets
+        kaizo = f.type_bits('kaizo')
+        self.assertEqual(ids(f, kaizo), ['10', '12', '13'])
+        self.assertEqual(ids(f, f.type_bits('expert')), ['10', '13'])
+        self.assertEqual(ids(f, kaizo & f.type_bits('light')), ['12'])
+        self.assertEqual(ids(f, kaizo & ~f.tag_bits(['adult content', 'nope'])), ['10', '13'])
+        self.assertEqual(ids(f, f.type_bits('standard') & ~f.flags['demo'] & f.tag_bits(['castle'])), ['14'])
+        self.assertEqual(f.count(~f.type_bits('kaizo')), 2)
+        self.assertEqual(f.type_counts(kaizo | f.flags['demo']),
+                         [('Kaizo: Expert', 2), ('Standard: Easy', 1), ('Kaizo: Light', 1)])
+        self.assertEqual(f.type_bits('nothing'), 0)
+
+    def test_ranges_and_values(self):
+        f = self.facets
+        self.assertEqual(ids(f, f.range_bits('length', 3, 12)), ['10', '11'])
+        self.assertEqual(ids(f, f.range_bits('length', 3, 12, lo_open=True)), ['10'])
+        self.assertEqual(ids(f, f.range_bits('length', hi=3, hi_open=True)), ['12'])
+        self.assertEqual(ids(f, f.range_bits('rating', lo=3.5)), ['10', '13'])
+        self.assertEqual(ids(f, f.range_bits('added', '2020', '2021-12')), ['10', '14'])
+        self.assertEqual(ids(f, f.value_bits('name', '^(star|cave)')), ['10', '13'])
+        self.assertEqual(ids(f, f.value_bits('type', 'normal')), ['14'])
+
+    def test_level_bits(self):
+        tmp = tempfile.mkdtemp(prefix='rhtools-test-')
+        try:
+            log = os.path.join(tmp, 'log.txt')
+            pnums = os.path.join(tmp, 'pnums.dat')
+            with open(log, 'w') as fh:
+                fh.write('> 10 105 1 261 _ + 0\n> 12 101 1 257 _ X 0\n')
+            with open(pnums, 'w') as fh:
+                fh.write('10 1\n11 0\n13 2\n99 1\n')
+            store = rhlevellog.LevelLogStore(log, pnums)
+            pnum, playable = self.facets.level_bits(store)
+            self.assertEqual(ids(self.facets, pnum), ['10', '13'])
+            self.assertEqual(ids(self.facets, playable), ['10'])
+            with open(log, 'a') as fh:
+                fh.write('> 13 102 2 258 _ G 0\n')
+            store.refresh()
+            pnum, playable = self.facets.level_bits(store)
+            self.assertEqual(ids(self.facets, playable), ['10', '13'])
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_sample(self):
+        f = self.facets
+        rnd = random.Random(1)
+        self.assertIsNone(f.sample(0, rnd))
+        self.assertIsNone(f.sample_record(f.type_bits('nothing'), rnd))
+        bits = f.type_bits('kaizo')
+        seen = {}
+        for i in range(3000):
+            pos = f.sample(bits, rnd)
+            seen[pos] = seen.get(pos, 0) + 1
+        self.assertEqual(sorted(seen), [0, 2, 3])
+        for n in seen.values():
+            self.assertTrue(800 < n < 1200, seen)
+        # Bits past the catalog are ignored
+        self.assertEqual(f.sample_record(bits | (1 << 40), rnd)['type'][0:5], 'Kaizo')
+
+
+class CatalogChangeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.path = os.path.join(self.dir, 'rhmd.json')
+        self.write(HACKS)
+        self.cache = rhcatalog.CatalogCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, hacks, stamp=None):
+        with open(self.path, 'w') as f:
+            json.dump(hacks, f)
+        if stamp is not None:
+            os.utime(self.path, ns=(stamp, stamp))
+
+    def decode(self, filename):
+        with open(filename) as f:
+            return json.load(f)
+
+    def facets(self):
+        return self.cache.load_derived(self.path, self.decode, 'facet_index', rhfacets.FacetIndex)
+
+    def test_rebuilt_after_change(self):
+        facets = self.facets()
+        self.assertIs(self.facets(), facets)
+        self.assertEqual(ids(facets, facets.type_bits('expert')), ['10', '13'])
+        self.write(HACKS + [{'id': '15', 'name': 'New', 'type': 'Kaizo: Expert', 'tags': ['castle']}], stamp=1)
+        newfacets = self.facets()
+        self.assertIsNot(newfacets, facets)
+        self.assertEqual(len(newfacets), 6)
+        self.assertEqual(ids(newfacets, newfacets.type_bits('expert') & newfacets.tag_bits(['castle'])),
+                         ['10', '15'])
+        self.assertEqual(newfacets.id_bits(['15']), 1 << 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
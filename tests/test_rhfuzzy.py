@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for rhfuzzy.FuzzyIndex: misspelled lookups, incremental sync, pruning
+of strings no hack uses after renames and removals, and save/load.
+
+Usage:
+    python3 -m pytest tests/test_rhfuzzy.py
+    python3 -m unittest tests.test_rhfuzzy
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhfuzzy
+
+HACKS = [
+    {'id': '1', 'name': 'Super Mario World', 'authors': 'Nintendo'},
+    {'id': '2', 'name': 'Star Road Quest', 'authors': 'Pete'},
+    {'id': '3', 'name': 'Kaizo Island', 'authors': 'Pete'},
+]
+
+
+class FuzzyTest(unittest.TestCase):
+
+    def test_top(self):
+        index = rhfuzzy.FuzzyIndex()
+        self.assertEqual(index.sync(HACKS), 3)
+        self.assertEqual(index.top('supr mario wrld', k=1)[0].hackid, '1')
+        self.assertEqual(index.top('kaizo island', k=1)[0].score, 1.0)
+        self.assertEqual(sorted(m.hackid for m in index.top('pete', fields=('authors',))), ['2', '3'])
+        self.assertEqual(index.top('kaizo island', k=0), [])
+        self.assertEqual(index.top('kaizo island', k=-1), [])
+        self.assertEqual(index.sync(HACKS), 0)
+
+    def test_sync_prunes_dead_strings(self):
+        index = rhfuzzy.FuzzyIndex()
+        index.sync(HACKS)
+        strings = len(index._strings)
+        renamed = [dict(HACKS[0], name='Mario Bros Deluxe'), HACKS[1]]
+        self.assertEqual(index.sync(renamed), 2)
+        # Old name and the removed hack's name are gone; "Pete" is still used
+        self.assertEqual(sorted(index._strings), ['mario bros deluxe', 'nintendo', 'pete', 'star road quest'])
+        self.assertLess(len(index._strings), strings)
+        for plist in index._postings.values():
+            self.assertTrue(all(0 <= sid < len(index._strings) for sid in plist))
+        self.assertNotIn(' ka', index._postings)
+        self.assertEqual(index.top('super mario world', min_score=0.8), [])
+        self.assertEqual(index.top('mario bros deluxe', k=1)[0].hackid, '1')
+        self.assertEqual(index.top('pete', k=1)[0].hackid, '2')
+
+    def test_save_load(self):
+        tmp = tempfile.mkdtemp(prefix='rhtools-test-')
+        try:
+            path = os.path.join(tmp, 'cache', 'fuzzy.rhfz')
+            index = rhfuzzy.FuzzyIndex()
+            index.sync(HACKS)
+            index.sync(HACKS[1:])
+            index.save(path)
+            loaded = rhfuzzy.FuzzyIndex.load(path)
+            self.assertEqual(len(loaded), 2)
+            self.assertEqual(loaded._strings, index._strings)
+            self.assertEqual(loaded.sync(HACKS[1:]), 0)
+            self.assertEqual(loaded.top('star rood', k=1)[0].hackid, '2')
+            self.assertIsNone(rhfuzzy.FuzzyIndex.load(path, fields=('name',)))
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
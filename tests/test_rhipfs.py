@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for rhipfs.HedgedFetcher and rhipfs.Scoreboard against several local
+stand-in gateways (StubGateway) with different injected delays and faults.
+
+Usage:
+    python3 -m pytest tests/test_rhipfs.py
+    python3 -m unittest tests.test_rhipfs
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhipfs
+from tests.stubserver import StubHTTPServer
+
+CID = 'QmTestCid'
+DATA = os.urandom(50000)
+SHA224 = hashlib.sha224(DATA).hexdigest()
+
+
+def verify(data):
+    return hashlib.sha224(data).hexdigest() == SHA224
+
+
+class StubGateway:
+    """
+    Answers GET /ipfs/<cid> with ``body`` after ``delay`` seconds, or with
+    ``status`` when it is not 200.
+    """
+
+    def __init__(self, delay=0.0, status=200, body=DATA):
+        self.delay = delay
+        self.status = status
+        self.body = body
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = stub.body if stub.status == 200 else b''
+                self.send_response(stub.status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = StubHTTPServer(('127.0.0.1', 0), Handler)
+        self.gateway = 'http://127.0.0.1:%d/ipfs/%%CID%%' % self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class HedgedFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.board_path = os.path.join(self.dir, 'ipfs_gateways.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_gateway_url(self):
+        self.assertEqual(rhipfs.gateway_url('https://a/ipfs/%CID%', 'Qm1'), 'https://a/ipfs/Qm1')
+        self.assertEqual(rhipfs.gateway_url('https://a', 'Qm1'), 'https://a/ipfs/Qm1')
+        self.assertEqual(rhipfs.gateway_url('https://a/ipfs/', 'Qm1'), 'https://a/ipfs/Qm1')
+
+    def test_hedge_beats_slow_first_gateway(self):
+        with StubGateway(delay=2.0) as slow, StubGateway(delay=0.05) as fast:
+            fetcher = rhipfs.HedgedFetcher([slow.gateway, fast.gateway],
+                                           rhipfs.Scoreboard(self.board_path), hedge_delay=0.2)
+            started = time.monotonic()
+            data, gateway = fetcher.fetch(CID, verify)
+            elapsed = time.monotonic() - started
+            fetcher.close()
+        self.assertEqual(data, DATA)
+        self.assertEqual(gateway, fast.gateway)
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(slow.requests, 1)
+
+    def test_no_hedge_when_first_is_fast(self):
+        with StubGateway(delay=0.0) as first, StubGateway(delay=0.0) as second:
+            fetcher = rhipfs.HedgedFetcher([first.gateway, second.gateway], hedge_delay=1.0)
+            data, gateway = fetcher.fetch(CID, verify)
+            fetcher.close()
+        self.assertEqual(gateway, first.gateway)
+        self.assertEqual(second.requests, 0)
+
+    def test_failures_skip_ahead(self):
+        with StubGateway(status=404) as missing, StubGateway(body=b'wrong content') as bad, \
+                StubGateway(delay=0.05) as good:
+            board = rhipfs.Scoreboard(self.board_path)
+            fetcher = rhipfs.HedgedFetcher([missing.gateway, bad.gateway, good.gateway], board,
+                                           hedge_delay=5.0)
+            started = time.monotonic()
+            data, gateway = fetcher.fetch(CID, verify)
+            fetcher.close()
+            # Failures start the next request at once, not after hedge_delay
+            self.assertLess(time.monotonic() - started, 2.0)
+        self.assertEqual(gateway, good.gateway)
+        self.assertEqual(board.gateways[missing.gateway]['errors'], 1)
+        self.assertIn('verification', board.gateways[bad.gateway]['last_error'])
+        self.assertEqual(board.gateways[good.gateway]['ok'], 1)
+
+    def test_all_fail(self):
+        with StubGateway(status=500) as a, StubGateway(body=b'nope') as b:
+            fetcher = rhipfs.HedgedFetcher([a.gateway, b.gateway], hedge_delay=0.1)
+            with self.assertRaisesRegex(rhipfs.IpfsError, 'no gateway returned valid content'):
+                fetcher.fetch(CID, verify)
+            fetcher.close()
+
+    def test_scoreboard_orders_later_fetches(self):
+        with StubGateway(delay=0.6) as slow, StubGateway(delay=0.3) as medium, \
+                StubGateway(delay=0.0) as fast:
+            gateways = [slow.gateway, medium.gateway, fast.gateway]
+            fetcher = rhipfs.HedgedFetcher(gateways, rhipfs.Scoreboard(self.board_path),
+                                           hedge_delay=0.05, max_parallel=3)
+            data, gateway = fetcher.fetch(CID, verify)
+            fetcher.close()
+            self.assertEqual(gateway, fast.gateway)
+
+            # A new process reads the saved scoreboard and asks fast first
+            board = rhipfs.Scoreboard(self.board_path)
+            self.assertEqual(board.order(gateways)[0], fast.gateway)
+            fetcher = rhipfs.HedgedFetcher(gateways, board, hedge_delay=1.0)
+            self.assertEqual(fetcher.best_gateway(), fast.gateway)
+            before = (slow.requests, medium.requests)
+            data, gateway = fetcher.fetch(CID, verify)
+            fetcher.close()
+            self.assertEqual(gateway, fast.gateway)
+            self.assertEqual((slow.requests, medium.requests), before)
+
+    def test_failure_rate_demotes_gateway(self):
+        board = rhipfs.Scoreboard()
+        board.record_success('a', 0.1)
+        board.record_success('b', 0.5)
+        self.assertEqual(board.order(['b', 'a']), ['a', 'b'])
+        board.record_failure('a', 'timeout')
+        board.record_failure('a', 'timeout')
+        self.assertEqual(board.order(['a', 'b']), ['b', 'a'])
+        # Unscored gateways keep their configured order
+        self.assertEqual(board.order(['y', 'x']), ['y', 'x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
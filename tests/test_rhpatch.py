@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tests for rhpatch.py, the in-process BPS/IPS applier.  The BPS patches are
+built here by a small encoder (make_bps) from explicit action lists, so
+every action type, backwards copies and overlapping TargetCopy runs are
+covered without flips or real patch files.
+
+Usage:
+    python3 -m pytest tests/test_rhpatch.py
+    python3 -m unittest tests.test_rhpatch
+"""
+
+import os
+import sys
+import zlib
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhpatch
+
+
+def varint(n):
+    out = bytearray()
+    while True:
+        x = n & 0x7f
+        n >>= 7
+        if n == 0:
+            out.append(0x80 | x)
+            return bytes(out)
+        out.append(x)
+        n -= 1
+
+
+def signed(n):
+    return varint((abs(n) << 1) | (1 if n < 0 else 0))
+
+
+def make_bps(source, actions, metadata=b''):
+    """
+    BPS patch and its target for ``actions``: ('sr', length),
+    ('tr', data), ('sc', source_offset, length), ('tc', target_offset, length)
+    with absolute offsets.
+    """
+    target = bytearray()
+    body = bytearray()
+    source_rel = 0
+    target_rel = 0
+    for action in actions:
+        kind = action[0]
+        if kind == 'sr':
+            length = action[1]
+            body += varint(((length - 1) << 2) | 0)
+            target += source[len(target):len(target) + length]
+        elif kind == 'tr':
+            data = action[1]
+            body += varint(((len(data) - 1) << 2) | 1) + data
+            target += data
+        elif kind == 'sc':
+            offset, length = action[1], action[2]
+            body += varint(((length - 1) << 2) | 2) + signed(offset - source_rel)
+            target += source[offset:offset + length]
+            source_rel = offset + length
+        else:
+            offset, length = action[1], action[2]
+            body += varint(((length - 1) << 2) | 3) + signed(offset - target_rel)
+            for i in range(length):
+                target.append(target[offset + i])
+            target_rel = offset + length
+    patch = bytearray(b'BPS1' + varint(len(source)) + varint(len(target)) + varint(len(metadata)) + metadata)
+    patch += body
+    patch += (zlib.crc32(source) & 0xffffffff).to_bytes(4, 'little')
+    patch += (zlib.crc32(bytes(target)) & 0xffffffff).to_bytes(4, 'little')
+    patch += (zlib.crc32(bytes(patch)) & 0xffffffff).to_bytes(4, 'little')
+    return bytes(patch), bytes(target)
+
+
+SOURCE = bytes(range(256)) * 8
+
+ACTIONS = [
+    ('sr', 10),
+    ('tr', b'hello'),
+    ('sc', 1500, 20),
+    ('sc', 100, 4),          # backwards
+    ('tc', 10, 5),           # 'hello' again
+    ('tc', 43, 300),         # overlapping: repeats the last byte
+    ('tr', b'abc'),
+    ('tc', 344, 100),        # overlapping with a period of 3
+    ('sr', 50),
+]
+
+
+class BPSTest(unittest.TestCase):
+
+    def test_all_actions(self):
+        patch, target = make_bps(SOURCE, ACTIONS, metadata=b'<meta/>')
+        self.assertEqual(rhpatch.patch_format(patch), 'bps')
+        self.assertEqual(rhpatch.bps_header(patch)[0:3], (len(SOURCE), len(target), b'<meta/>'))
+        self.assertEqual(rhpatch.apply(patch, SOURCE), target)
+        self.assertEqual(rhpatch.apply(memoryview(bytearray(patch)), memoryview(SOURCE)), target)
+
+    def test_large_sizes(self):
+        source = os.urandom(600000)
+        patch, target = make_bps(source, [('sc', 300000, 200000), ('tr', b'x' * 1000), ('tc', 0, 50000)])
+        self.assertEqual(rhpatch.apply(patch, source), target)
+
+    def test_wrong_source(self):
+        patch, target = make_bps(SOURCE, ACTIONS)
+        with self.assertRaisesRegex(rhpatch.PatchError, 'source CRC32'):
+            rhpatch.apply(patch, SOURCE[0:-1] + b'\x00')
+        with self.assertRaisesRegex(rhpatch.PatchError, 'source CRC32'):
+            rhpatch.apply(patch, SOURCE + b'\x00')
+
+    def test_damaged_patch(self):
+        patch, target = make_bps(SOURCE, ACTIONS)
+        damaged = bytearray(patch)
+        damaged[20] ^= 0x01
+        with self.assertRaisesRegex(rhpatch.PatchError, 'patch CRC32'):
+            rhpatch.apply(bytes(damaged), SOURCE)
+        with self.assertRaises(rhpatch.PatchError):
+            rhpatch.apply(patch[0:30], SOURCE)
+
+    def test_wrong_target_crc(self):
+        patch, target = make_bps(SOURCE, ACTIONS)
+        damaged = bytearray(patch[0:-12])
+        damaged += patch[-12:-8] + bytes(4)
+        damaged += (zlib.crc32(bytes(damaged)) & 0xffffffff).to_bytes(4, 'little')
+        with self.assertRaisesRegex(rhpatch.PatchError, 'target CRC32'):
+            rhpatch.apply(bytes(damaged), SOURCE)
+        self.assertEqual(rhpatch.apply_bps(bytes(damaged), SOURCE, verify=False), target)
+
+
+class IPSTest(unittest.TestCase):
+
+    def test_records(self):
+        patch = (b'PATCH'
+                 + (5).to_bytes(3, 'big') + (3).to_bytes(2, 'big') + b'xyz'
+                 + (100).to_bytes(3, 'big') + (0).to_bytes(2, 'big') + (10).to_bytes(2, 'big') + b'\xee'
+                 + (len(SOURCE) + 2).to_bytes(3, 'big') + (2).to_bytes(2, 'big') + b'!!'
+                 + b'EOF')
+        expected = bytearray(SOURCE)
+        expected[5:8] = b'xyz'
+        expected[100:110] = b'\xee' * 10
+        expected += b'\x00\x00!!'
+        self.assertEqual(rhpatch.patch_format(patch), 'ips')
+        self.assertEqual(rhpatch.apply(patch, SOURCE), bytes(expected))
+
+    def test_truncation(self):
+        patch = b'PATCH' + (0).to_bytes(3, 'big') + (1).to_bytes(2, 'big') + b'Z' + b'EOF' + (64).to_bytes(3, 'big')
+        self.assertEqual(rhpatch.apply(patch, SOURCE), b'Z' + SOURCE[1:64])
+
+    def test_malformed(self):
+        with self.assertRaises(rhpatch.PatchError):
+            rhpatch.apply(b'PATCH' + (0).to_bytes(3, 'big') + (5).to_bytes(2, 'big') + b'ab', SOURCE)
+        with self.assertRaises(rhpatch.PatchError):
+            rhpatch.apply(b'PATCH', SOURCE)
+        with self.assertRaisesRegex(rhpatch.PatchError, 'unknown'):
+            rhpatch.apply(b'UPS1....', SOURCE)
+
+
+class FallbackTest(unittest.TestCase):
+
+    def test_no_flips_raises(self):
+        with self.assertRaises(rhpatch.PatchError):
+            rhpatch.apply_patch(b'garbage', SOURCE, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
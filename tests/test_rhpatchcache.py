@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for rhpatchcache.PatchCache: hits and misses, the header-only check
+on a hit against the full re-hash of verify(), batched stats.json writes
+and least-recently-used eviction.  RomCache entries that point at rom/
+files instead of holding a copy.
+
+Usage:
+    python3 -m pytest tests/test_rhpatchcache.py
+    python3 -m unittest tests.test_rhpatchcache
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhpatchcache
+
+
+def sha224(data):
+    return hashlib.sha224(data).hexdigest()
+
+
+class PatchCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.cache = rhpatchcache.PatchCache(os.path.join(self.dir, 'patches'), budget=1 << 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_put(self):
+        data = os.urandom(5000)
+        self.assertIsNone(self.cache.get(sha224(data)))
+        self.assertFalse(self.cache.put('0' * 56, data))
+        self.assertTrue(self.cache.put(sha224(data), data))
+        self.assertEqual(self.cache.get(sha224(data)), data)
+        self.assertEqual(self.cache.session['hits'], 1)
+        self.assertEqual(self.cache.session['misses'], 1)
+
+    def test_hit_checks_header_verify_rehashes(self):
+        data = os.urandom(5000)
+        key = sha224(data)
+        self.cache.put(key, data)
+        path = self.cache.entry_path(key)
+        with open(path, 'r+b') as f:
+            f.seek(-10, 2)
+            f.write(b'x')
+        # Same size and stored digest: a hit does not read the patch twice
+        self.assertEqual(len(self.cache.get(key)), len(data))
+        self.assertEqual(self.cache.verify(), (1, 1))
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.cache.get(key))
+
+        # A truncated entry or one stored under another name is a miss
+        self.cache.put(key, data)
+        with open(path, 'r+b') as f:
+            f.truncate(1000)
+        self.assertIsNone(self.cache.get(key))
+        other = os.urandom(100)
+        self.cache.put(sha224(other), other)
+        shutil.copy(self.cache.entry_path(sha224(other)), path)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.session['corrupt'], 3)
+
+    def test_stats_batched(self):
+        data = os.urandom(100)
+        self.cache.put(sha224(data), data)
+        self.cache.get(sha224(data))
+        self.assertFalse(os.path.exists(self.cache.stats_path()))
+        for i in range(rhpatchcache.STATS_FLUSH_EVERY):
+            self.cache.get(sha224(data))
+        with open(self.cache.stats_path()) as f:
+            self.assertGreater(json.load(f)['hits'], 0)
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], rhpatchcache.STATS_FLUSH_EVERY + 1)
+        self.assertEqual(stats['stores'], 1)
+        self.assertEqual(stats['entries'], 1)
+        # A new instance (a later run) sees the totals
+        self.assertEqual(rhpatchcache.PatchCache(self.cache.path).stats()['hits'], stats['hits'])
+
+    def test_lru_eviction(self):
+        blobs = [os.urandom(300000) for i in range(3)]
+        for i, data in enumerate(blobs):
+            self.cache.put(sha224(data), data)
+            stamp = time.time() - 100 + i
+            os.utime(self.cache.entry_path(sha224(data)), (stamp, stamp))
+        # A hit makes the oldest entry the most recently used
+        self.cache.get(sha224(blobs[0]))
+        self.assertEqual(self.cache.trim(400000), 2)
+        self.assertIsNotNone(self.cache.get(sha224(blobs[0])))
+        self.assertIsNone(self.cache.get(sha224(blobs[1])))
+        # put() keeps the cache within its budget
+        for data in blobs:
+            self.cache.put(sha224(data), data)
+        self.assertLessEqual(self.cache.stats()['bytes'], 1 << 20)
+
+
+
+class RomCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.cache = rhpatchcache.RomCache(os.path.join(self.dir, 'cache', 'roms'))
+        self.rom_path = os.path.join(self.dir, 'rom', '123_abc.cc.sfc')
+        os.makedirs(os.path.dirname(self.rom_path))
+        self.rom = os.urandom(1 << 19)
+        with open(self.rom_path, 'wb') as f:
+            f.write(self.rom)
+        self.key = self.cache.rom_key('a' * 56, 'b' * 56, ccrom=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_entry_points_at_rom_file(self):
+        self.assertNotEqual(self.key, self.cache.rom_key('a' * 56, 'b' * 56, ccrom=False))
+        self.assertTrue(self.cache.put(self.key, self.rom_path, self.rom, {'result_sha224': 'c' * 56}))
+        # No second copy of the ROM in the cache
+        self.assertLess(self.cache.stats()['bytes'], 1000)
+        rom, meta = self.cache.get(self.key)
+        self.assertEqual(rom, self.rom)
+        self.assertEqual(meta['result_sha224'], 'c' * 56)
+        # Digests describe the bytes in the rom/ file
+        self.assertEqual(meta['sha224'], sha224(self.rom))
+        self.assertEqual(meta['size'], len(self.rom))
+        self.assertEqual(self.cache.verify(), (1, 0))
+
+    def test_changed_or_missing_rom_file(self):
+        self.cache.put(self.key, self.rom_path, self.rom)
+        with open(self.rom_path, 'r+b') as f:
+            f.write(b'changed')
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertFalse(os.path.exists(self.cache.entry_path(self.key)))
+        self.cache.put(self.key, self.rom_path, self.rom)
+        os.unlink(self.rom_path)
+        self.assertIsNone(self.cache.get(self.key))
+
+
+if __name__ == '__main__':
+    unittest.main()
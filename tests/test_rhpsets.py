@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for rhpsets.py: index_zip() offsets for stored, deflated and LZMA
+members, PsetManifest lookups and reads (also after a reload from the
+saved JSON), a zip rewritten in place, a zip dropped from psets.dat, a
+member whose data no longer matches its CRC-32, and read_psets().
+
+Usage:
+    python3 -m pytest tests/test_rhpsets.py
+    python3 -m unittest tests.test_rhpsets
+"""
+
+import os
+import sys
+import json
+import base64
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_LZMA
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhpsets
+
+BLOBS = {
+    'pblob_1_aaaa': (os.urandom(3000), ZIP_STORED),
+    'pblob_2_bbbb': (b'deflate me ' * 500, ZIP_DEFLATED),
+    'pblob_3_cccc': (b'lzma me ' * 500 + os.urandom(100), ZIP_LZMA),
+}
+
+
+class PsetManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.mpath = os.path.join(self.dir, 'cache', 'pset_manifest.json')
+        self.write_zip('pset_a.zip', BLOBS)
+        self.write_zip('pset_b.zip', {'pblob_4_dddd': (b'other', ZIP_STORED),
+                                      'pblob_1_aaaa': BLOBS['pblob_1_aaaa']})
+        self.psets = [{'key': 'pset_a.zip'}, {'key': 'pset_b.zip'}, {'key': 'notes.txt'}]
+        self.manifest = self.new_manifest()
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(self.dir)
+
+    def new_manifest(self):
+        manifest = rhpsets.PsetManifest(self.dir, self.mpath)
+        self.addCleanup(manifest.close)
+        return manifest
+
+    def write_zip(self, key, members, stamp=None):
+        path = os.path.join(self.dir, key)
+        with ZipFile(path, 'w') as zf:
+            zf.writestr('readme/', b'')
+            for name, (data, ctype) in members.items():
+                zf.writestr(name, data, compress_type=ctype)
+        if stamp is not None:
+            os.utime(path, ns=(stamp, stamp))
+        return path
+
+    def test_index_zip(self):
+        path = os.path.join(self.dir, 'pset_a.zip')
+        members = rhpsets.index_zip(path)
+        self.assertEqual(sorted(members), sorted(BLOBS))
+        with open(path, 'rb') as f:
+            raw = f.read()
+        for name, (data, ctype) in BLOBS.items():
+            offset, csize, size, crc, mtype = members[name]
+            self.assertEqual((size, mtype), (len(data), ctype))
+            if ctype == ZIP_STORED:
+                self.assertEqual(raw[offset:offset + csize], data)
+
+    def test_lookup_and_read(self):
+        self.manifest.refresh(self.psets, [1, 2])
+        self.assertEqual(sorted(self.manifest.zips), ['pset_a.zip', 'pset_b.zip'])
+        for name, (data, ctype) in BLOBS.items():
+            self.assertEqual(self.manifest.lookup(name), 'pset_a.zip')
+            self.assertEqual(self.manifest.read(name), data)
+        self.assertEqual(self.manifest.read('pblob_1_aaaa', 'pset_b.zip'), BLOBS['pblob_1_aaaa'][0])
+        self.assertEqual(self.manifest.read('pblob_4_dddd'), b'other')
+        self.assertIsNone(self.manifest.lookup('pblob_9_none'))
+        self.assertIsNone(self.manifest.read('pblob_9_none'))
+        self.assertIsNone(self.manifest.read('pblob_4_dddd', 'pset_a.zip'))
+        # The saved manifest is used without indexing again
+        loaded = self.new_manifest()
+        self.assertEqual(loaded.zips, self.manifest.zips)
+        self.assertEqual(loaded.psets_stamp, [1, 2])
+        saved = rhpsets.index_zip
+        rhpsets.index_zip = None
+        try:
+            self.assertEqual(loaded.read('pblob_2_bbbb'), BLOBS['pblob_2_bbbb'][0])
+            loaded.refresh(self.psets, [1, 2])
+        finally:
+            rhpsets.index_zip = saved
+
+    def test_restamped_zip(self):
+        self.manifest.refresh(self.psets)
+        self.assertEqual(self.manifest.read('pblob_4_dddd'), b'other')
+        old = self.manifest.zips['pset_b.zip']['stamp']
+        self.write_zip('pset_b.zip', {'pblob_5_eeee': (b'padding' * 10, ZIP_STORED),
+                                      'pblob_4_dddd': (b'changed', ZIP_DEFLATED)}, stamp=1)
+        # read() notices the new size/mtime and re-indexes the zip
+        self.assertEqual(self.manifest.read('pblob_4_dddd'), b'changed')
+        self.assertNotEqual(self.manifest.zips['pset_b.zip']['stamp'], old)
+        self.assertEqual(self.manifest.lookup('pblob_5_eeee'), 'pset_b.zip')
+        self.assertEqual(self.manifest.lookup('pblob_1_aaaa'), 'pset_a.zip')
+
+    def test_removed_from_psets(self):
+        self.manifest.refresh(self.psets)
+        self.manifest.read('pblob_1_aaaa', 'pset_a.zip')
+        self.manifest.refresh([{'key': 'pset_b.zip'}], [3, 4])
+        self.assertEqual(list(self.manifest.zips), ['pset_b.zip'])
+        # A blob in both zips is now found in the one still listed
+        self.assertEqual(self.manifest.lookup('pblob_1_aaaa'), 'pset_b.zip')
+        self.assertIsNone(self.manifest.lookup('pblob_2_bbbb'))
+        self.assertIsNone(self.manifest.read('pblob_2_bbbb'))
+        with open(self.mpath) as f:
+            self.assertEqual(sorted(json.load(f)['zips']), ['pset_b.zip'])
+        # A listed zip that is gone from disk is dropped as well
+        os.remove(os.path.join(self.dir, 'pset_b.zip'))
+        self.manifest.refresh([{'key': 'pset_b.zip'}], [3, 4])
+        self.assertEqual(self.manifest.zips, {})
+        self.assertIsNone(self.manifest.read('pblob_1_aaaa'))
+
+    def test_crc_mismatch(self):
+        self.manifest.refresh(self.psets)
+        path = os.path.join(self.dir, 'pset_a.zip')
+        offset = self.manifest.zips['pset_a.zip']['members']['pblob_1_aaaa'][0]
+        stamp = os.stat(path).st_mtime_ns
+        with open(path, 'r+b') as f:
+            f.seek(offset + 10)
+            byte = f.read(1)
+            f.seek(offset + 10)
+            f.write(bytes([byte[0] ^ 0xff]))
+        # Same size and mtime: the stored offsets are used as they are
+        os.utime(path, ns=(stamp, stamp))
+        self.assertIsNone(self.manifest.read('pblob_1_aaaa', 'pset_a.zip'))
+        self.assertEqual(self.manifest.read('pblob_2_bbbb'), BLOBS['pblob_2_bbbb'][0])
+
+    def test_read_psets(self):
+        path = os.path.join(self.dir, 'psets.dat')
+        with open(path, 'w') as f:
+            f.write(base64.b64encode(json.dumps(self.psets).encode()).decode())
+        psets = rhpsets.read_psets(path)
+        self.assertEqual(psets, self.psets)
+        self.assertIs(rhpsets.read_psets(path), psets)
+        with open(path, 'w') as f:
+            f.write(base64.b64encode(json.dumps(self.psets[0:1]).encode()).decode())
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(rhpsets.read_psets(path), self.psets[0:1])
+        with self.assertRaises(FileNotFoundError):
+            rhpsets.read_psets(os.path.join(self.dir, 'missing.dat'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for rhrecords.RecordStore / HackRecord (dict-style access to hot and
+cold fields, read-only records, duplicate ids, to_list()) and for
+rhcatalog.CatalogCache.load_standalone(), which builds the store without
+keeping the decoded list of dicts.
+
+Usage:
+    python3 -m pytest tests/test_rhrecords.py
+    python3 -m unittest tests.test_rhrecords
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhcatalog
+import rhrecords
+
+HACKS = [
+    {'id': '100', 'name': 'Star Road', 'authors': 'Pete', 'type': 'Kaizo', 'tags': ['castle', 'water'],
+     'url': 'https://example/100', 'xdata': {'name_href': '//example/100'}},
+    {'id': '101', 'name': 'Dream Quest', 'authors': 'Pete', 'type': 'Standard', 'demo': 'No'},
+    {'id': '100', 'name': 'Star Road 2', 'authors': 'Pete', 'type': 'Kaizo'},
+]
+
+
+class RecordStoreTest(unittest.TestCase):
+
+    def test_hot_and_cold_fields(self):
+        rec = rhrecords.HackRecord(HACKS[0])
+        self.assertEqual(rec['name'], 'Star Road')
+        self.assertEqual(rec['tags'], ['castle', 'water'])
+        self.assertEqual(rec['xdata'], {'name_href': '//example/100'})
+        self.assertEqual(rec.get('description', 'none'), 'none')
+        self.assertIn('url', rec)
+        self.assertNotIn('demo', rec)
+        with self.assertRaises(KeyError):
+            rec['demo']
+        self.assertEqual(sorted(rec.keys()), sorted(HACKS[0].keys()))
+        self.assertEqual(rec.to_dict(), HACKS[0])
+        self.assertEqual(json.loads(json.dumps(rec.to_dict())), HACKS[0])
+
+    def test_read_only(self):
+        rec = rhrecords.HackRecord(HACKS[1])
+        with self.assertRaises(TypeError):
+            rec.name = 'x'
+        copy = rec.to_dict()
+        copy['name'] = 'x'
+        self.assertEqual(rec['name'], 'Dream Quest')
+
+    def test_interned(self):
+        a = rhrecords.HackRecord(dict(HACKS[1], authors=''.join(['Pe', 'te'])))
+        b = rhrecords.HackRecord(HACKS[1])
+        self.assertIs(a.authors, b.authors)
+
+    def test_store(self):
+        store = rhrecords.RecordStore.from_list(HACKS)
+        # Duplicate ids keep the last record, in the first one's place
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store), ['100', '101'])
+        self.assertEqual(store['100']['name'], 'Star Road 2')
+        self.assertEqual(store.get(101)['name'], 'Dream Quest')
+        self.assertIsNone(store.get('999'))
+        self.assertIn(100, store)
+        with self.assertRaises(KeyError):
+            store['999']
+        self.assertEqual([r['id'] for r in store.filter(lambda r: r['type'] == 'Kaizo')], ['100'])
+        self.assertEqual(store.to_list(), [HACKS[2], HACKS[1]])
+
+
+class StandaloneLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rhtools-test-')
+        self.path = os.path.join(self.dir, 'rhmd.json')
+        with open(self.path, 'w') as f:
+            json.dump(HACKS, f)
+        self.cache = rhcatalog.CatalogCache()
+        self.decodes = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def decode(self, filename):
+        self.decodes += 1
+        with open(filename) as f:
+            return json.load(f)
+
+    def store(self):
+        return self.cache.load_standalone(self.path, self.decode, 'record_store',
+                                          rhrecords.RecordStore.from_list)
+
+    def test_view_not_kept(self):
+        store = self.store()
+        self.assertIs(self.store(), store)
+        self.assertEqual(self.decodes, 1)
+        # Only the store is cached, not the decoded list
+        self.assertIsNone(self.cache.current(self.path))
+        # A later full load decodes again and keeps the store
+        view = self.cache.load(self.path, self.decode)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(self.decodes, 2)
+        self.assertIs(self.store(), store)
+        self.assertIs(self.cache.current(self.path), view)
+
+    def test_uses_cached_view(self):
+        self.cache.load(self.path, self.decode)
+        self.store()
+        self.assertEqual(self.decodes, 1)
+
+    def test_file_change(self):
+        store = self.store()
+        with open(self.path, 'w') as f:
+            json.dump(HACKS[0:2] + [{'id': '102', 'name': 'New'}], f)
+        os.utime(self.path, ns=(1, 1))
+        newstore = self.store()
+        self.assertIsNot(newstore, store)
+        self.assertEqual(newstore['102']['name'], 'New')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for rhsearch.SearchIndex query handling: prefix words, quoted
+phrases containing regex punctuation (as the chatbot's !rhsearch sends
+them), regex queries and the substring fallback used by the GUI filter.
+
+Usage:
+    python3 -m pytest tests/test_rhsearch.py
+    python3 -m unittest tests.test_rhsearch
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhsearch
+
+HACKS = [
+    {'id': '100', 'name': 'Super Mario World 2+', 'authors': 'Dr. Pete', 'type': 'Kaizo: Light'},
+    {'id': '101', 'name': 'Underworld', 'authors': 'someone', 'type': 'Standard'},
+    {'id': '102', 'name': 'Star Road World', 'authors': 'Pete, Mario', 'type': 'Standard'},
+    {'id': '103', 'name': 'Marioland (demo)', 'authors': 'x.y', 'type': 'Kaizo'},
+]
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = rhsearch.SearchIndex(HACKS)
+
+    def test_words_and_phrases(self):
+        self.assertEqual(self.index.search('mar'), [0, 2, 3])
+        self.assertEqual(self.index.search('"star road"', fields=('name',)), [2])
+        self.assertEqual(self.index.search('"road star"', fields=('name',)), [])
+
+    def test_quoted_punctuation_is_a_phrase(self):
+        self.assertFalse(rhsearch.looks_like_regex('"dr. pete"'))
+        self.assertTrue(rhsearch.looks_like_regex('kaizo "x" ^Super'))
+        self.assertEqual(self.index.search('"dr. pete"', fields=('authors',)), [0])
+        self.assertEqual(self.index.search('"super mario world 2+"', fields=('name',)), [0])
+        self.assertEqual(self.index.search('"marioland (demo)"', fields=('name',)), [3])
+        self.assertEqual(self.index.search('"x.y"', fields=('authors',)), [3])
+
+    def test_regex(self):
+        self.assertEqual(self.index.search('^Super.*World', fields=('name',)), [0])
+        # Quotes are not part of the compiled pattern
+        self.assertEqual(self.index.search('"world" 2.', fields=('name',), regex=True), [0])
+        self.assertEqual(self.index.search('"World"$', fields=('name',), regex=True), [1, 2])
+        # A pattern that does not compile is matched literally
+        self.assertEqual(self.index.search('2+(', fields=('name',)), [])
+
+    def test_fallback_adds_substring_matches(self):
+        self.assertEqual(self.index.search('world', fields=('name',)), [0, 2])
+        self.assertEqual(self.index.search('world', fields=('name',), fallback=True), [0, 1, 2])
+        self.assertEqual(self.index.search_ids('"ario"', fields=('name',), fallback=True), {'100', '103'})
+
+    def test_fallback_matches_substring_scan(self):
+        # The index-backed substring search finds what re.search() over every field did
+        for text in ('orld', 'r. pe', 'world 2+', 'io w', '(demo', ', m', '+', 'Pete, Mario', 'zzz'):
+            expected = [pos for pos, h in enumerate(HACKS)
+                        if any(text.lower() in str(h[f]).lower() for f in ('name', 'authors'))]
+            self.assertEqual(self.index._substring(text, ('name', 'authors')), set(expected), text)
+        self.index.add({'id': '104', 'name': 'Worldly Hack', 'authors': 'new'})
+        self.assertEqual(self.index.search('orld', fields=('name',), fallback=True), [0, 1, 2, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
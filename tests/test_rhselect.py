@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for rhselect.py: query parsing (ranges, * / any, negation with "-"
+and "not", flags, with:/all/nofilters against caller defaults), the
+legacy !rhrandom %modifier% forms, Plan caching by query text and by
+catalog, and sampling a Plan's result.
+
+Usage:
+    python3 -m pytest tests/test_rhselect.py
+    python3 -m unittest tests.test_rhselect
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rhfacets
+import rhlevellog
+import rhselect
+
+HACKS = [
+    {'id': '1', 'name': 'Star Road', 'authors': 'Carol', 'type': 'Kaizo: Expert', 'tags': ['castle'],
+     'length': '12 exits', 'rating': '4.5', 'added': '2021-05-16'},
+    {'id': '2', 'name': 'Dream Quest', 'authors': 'Pete', 'type': 'Standard: Easy', 'demo': 'Yes',
+     'length': '3 exits', 'rating': '2.0', 'added': '2019-01-02'},
+    {'id': '3', 'name': 'Pit Stop', 'authors': 'Carol, Pete', 'type': 'Kaizo: Light',
+     'tags': ['racelevel', 'water'], 'length': '1 exit', 'rating': '3.0', 'added': '2022-11-30'},
+    {'id': '4', 'name': 'Cave Run', 'authors': 'Dee', 'type': 'Kaizo: Expert', 'contest': 'SMWC 2020',
+     'length': '30', 'rating': '3.9', 'added': '2020-03-01'},
+    {'id': '5', 'name': 'Long Walk', 'authors': 'Eve', 'type': 'Standard: Normal',
+     'tags': ['adult content'], 'length': '40', 'rating': '4.0', 'added': '2020-07-01'},
+    {'id': '6', 'name': 'Pit Fall', 'authors': 'Eve', 'type': 'Pit', 'length': '5', 'rating': '1.5',
+     'added': '2015-07-01'},
+]
+
+
+class SelectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.facets = rhfacets.FacetIndex(HACKS)
+
+    def select(self, text, defaults='', levelstore=None):
+        plan = rhselect.compile_query(text, defaults)
+        return [rec['id'] for rec in self.facets.records(plan.bits(self.facets, levelstore))]
+
+    def test_types_and_everything(self):
+        self.assertEqual(self.select('kaizo'), ['1', '3', '4'])
+        self.assertEqual(self.select('type:light|pit'), ['3', '6'])
+        self.assertEqual(self.select('"kaizo: expert"'), ['1', '4'])
+        self.assertEqual(self.select('*'), ['1', '2', '3', '4', '5', '6'])
+        self.assertEqual(self.select('any'), ['1', '2', '3', '4', '5', '6'])
+        self.assertEqual(self.select('any', rhselect.RANDOM_DEFAULTS), ['1', '6'])
+        self.assertEqual(self.select('author:pete'), ['2', '3'])
+        self.assertEqual(self.select('tag:castle,water'), ['1', '3'])
+        self.assertEqual(self.select('id:2,6,99'), ['2', '6'])
+
+    def test_ranges(self):
+        self.assertEqual(self.select('length:10..30'), ['1', '4'])
+        self.assertEqual(self.select('length:3-12'), ['1', '2', '6'])
+        self.assertEqual(self.select('length:>=30'), ['4', '5'])
+        self.assertEqual(self.select('length:<3'), ['3'])
+        self.assertEqual(self.select('length:5'), ['6'])
+        self.assertEqual(self.select('rating:>=4'), ['1', '5'])
+        self.assertEqual(self.select('rating:>3.0'), ['1', '4', '5'])
+        self.assertEqual(self.select('rating:3..4'), ['3', '4', '5'])
+        self.assertEqual(self.select('added:2020'), ['4', '5'])
+        self.assertEqual(self.select('added:2019..2020-06'), ['2', '4'])
+        self.assertEqual(self.select('added:<2016'), ['6'])
+        self.assertEqual(self.select('added:>2020'), ['1', '3'])
+        with self.assertRaises(rhselect.SelectError):
+            rhselect.compile_query('length:lots')
+        with self.assertRaises(rhselect.SelectError):
+            rhselect.compile_query('type:(')
+
+    def test_negation(self):
+        self.assertEqual(self.select('kaizo -tag:water'), ['1', '4'])
+        self.assertEqual(self.select('not kaizo'), ['2', '5', '6'])
+        self.assertEqual(self.select('-kaizo'), ['2', '5', '6'])
+        self.assertEqual(self.select('not -kaizo'), ['1', '3', '4'])
+        self.assertEqual(self.select('-*'), [])
+        self.assertEqual(self.select('kaizo -rating:<3.5'), ['1', '4'])
+
+    def test_flags_and_defaults(self):
+        defaults = rhselect.RANDOM_DEFAULTS
+        self.assertEqual(self.select('kaizo', defaults), ['1'])
+        self.assertEqual(self.select('racelevel', defaults), ['3'])
+        self.assertEqual(self.select('kaizo contests', defaults), ['4'])
+        self.assertEqual(self.select('kaizo with:race', defaults), ['1', '3'])
+        self.assertEqual(self.select('kaizo all', defaults), ['1', '3', '4'])
+        self.assertEqual(self.select('standard', defaults), [])
+        self.assertEqual(self.select('standard all nofilters', defaults), ['2', '5'])
+        self.assertEqual(self.select('tag:"adult content"', defaults), ['5'])
+        with self.assertRaises(rhselect.SelectError):
+            rhselect.compile_query('with:nothing')
+
+    def test_legacy_forms(self):
+        self.assertEqual(rhselect.legacy_query('kaizo'), 'kaizo')
+        self.assertEqual(rhselect.legacy_query('%races%kaizo'), 'racelevel kaizo')
+        self.assertEqual(rhselect.legacy_query('%demos%contests%standard'), 'demo contest standard')
+        self.assertEqual(rhselect.legacy_query('%racestoo%nofilters%'), 'with:racelevel nofilters')
+        self.assertEqual(rhselect.legacy_query('%bogus%all%pit'), 'all pit')
+        defaults = rhselect.RANDOM_DEFAULTS
+        self.assertEqual(self.select(rhselect.legacy_query('%races%kaizo'), defaults), ['3'])
+        self.assertEqual(self.select(rhselect.legacy_query('%demos%.'), defaults), ['2'])
+        self.assertEqual(self.select(rhselect.legacy_query('%racestoo%kaizo'), defaults), ['1', '3'])
+        self.assertEqual(self.select(rhselect.legacy_query('%anything%kaizo'), defaults), ['1', '3', '4'])
+        self.assertEqual(self.select(rhselect.legacy_query('%all%nofilters%normal'), defaults), ['5'])
+
+    def test_levels(self):
+        tmp = tempfile.mkdtemp(prefix='rhtools-test-')
+        try:
+            log = os.path.join(tmp, 'log.txt')
+            pnums = os.path.join(tmp, 'pnums.dat')
+            with open(log, 'w') as fh:
+                fh.write('> 1 105 1 261 _ + 0\n')
+            with open(pnums, 'w') as fh:
+                fh.write('1 1\n4 2\n')
+            store = rhlevellog.LevelLogStore(log, pnums)
+            self.assertEqual(self.select('pnum', levelstore=store), ['1', '4'])
+            self.assertEqual(self.select('kaizo -playable', levelstore=lambda: store), ['3', '4'])
+            with self.assertRaises(rhselect.SelectError):
+                self.select('playable')
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_plan_cache(self):
+        plan = rhselect.compile_query('kaizo rating:>=3', rhselect.RANDOM_DEFAULTS)
+        self.assertIs(rhselect.compile_query('kaizo rating:>=3', rhselect.RANDOM_DEFAULTS), plan)
+        self.assertIsNot(rhselect.compile_query('kaizo rating:>=3'), plan)
+        bits = plan.bits(self.facets)
+        self.assertIs(plan._last[2], bits)
+        # Same catalog: the remembered result; a new catalog: recomputed
+        self.facets.range_bits = None
+        self.assertEqual(plan.bits(self.facets), bits)
+        self.assertEqual(bits, 1 << 0)
+        facets = rhfacets.FacetIndex([HACKS[1], HACKS[0]])
+        self.assertEqual(plan.bits(facets), 1 << 1)
+
+    def test_sample(self):
+        plan = rhselect.compile_query('kaizo with:racelevel', rhselect.RANDOM_DEFAULTS)
+        bits = plan.bits(self.facets)
+        rnd = random.Random(7)
+        picked = set(self.facets.sample_record(bits, rnd)['id'] for i in range(200))
+        self.assertEqual(picked, {'1', '3'})
+        self.assertIsNone(self.facets.sample(rhselect.compile_query('-*').bits(self.facets), rnd))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,25 +14,37 @@ Options:
                            files = verify from blob files in blobs/ directory
     --gameid=<id>          Verify specific game ID only
     --file-name=<name>     Verify specific blob file only
-    --full-check           Test patches with flips (slow, comprehensive)
-    --verify-result        Verify flips result hash against result_sha224 (requires --full-check)
+    --full-check           Apply each patch to smw.sfc (rhpatch.py, flips as fallback)
+    --verify-result        Verify patched ROM hash against result_sha224 (requires --full-check)
     --newer-than=<value>   Only verify blobs newer than timestamp or blob file_name
                            (value can be ISO date/timestamp or a patchblob file_name)
     --log-file=<path>      Log results to file (default: verification_results_py.log)
     --failed-file=<path>   Save failed items list (default: failed_blobs_py.json)
+    --jobs=<n>             Verify with n worker processes (default: 1)
+    --ledger=<path>        Verification ledger, SQLite (default: verification_ledger.db;
+                           empty to disable)
+    --incremental          Skip blobs the ledger shows passed the same checks with the
+                           same inputs (file size/mtime or patchbin hash, expected hashes)
+    --rehash               With --incremental, also re-hash each unchanged-looking blob
+                           and skip it only if its SHA-224 matches the ledger
+    --chunk-size=<n>       Blobs per worker task with --jobs (default: 8)
 
 Exit codes:
     0 - All blobs valid
     1 - Some blobs failed verification
     2 - Fatal error
+    130 - Interrupted (Ctrl-C); results so far are in the log and failed file
 """
 
 import sys
 import os
 import json
 import hashlib
+import time
+import signal
 import sqlite3
-import subprocess
+import collections
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Add project root to path
@@ -40,8 +52,10 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 try:
     import blob_crypto
-except ImportError:
-    print("Error: blob_crypto.py not found")
+    import rhpatch
+    import rhhash
+except ImportError as e:
+    print(f"Error: {e}")
     sys.exit(2)
 
 CONFIG = {
@@ -59,9 +73,18 @@ CONFIG = {
     'VERIFY_RESULT': False,
     'NEWER_THAN': None,
     'FLIPS_PATH': None,
-    'BASE_ROM_PATH': None
+    'BASE_ROM_PATH': None,
+    'BASE_ROM': None,
+    'JOBS': 1,
+    'CHUNK_SIZE': 8,
+    'LEDGER': 'verification_ledger.db',
+    'INCREMENTAL': False,
+    'REHASH': False
 }
 
+# How often (seconds) the progress/throughput line is logged
+PROGRESS_INTERVAL = 5.0
+
 class VerificationLogger:
     def __init__(self, log_file):
         self.log_file = log_file
@@ -77,6 +100,152 @@ class VerificationLogger:
         if self.log_stream:
             self.log_stream.close()
 
+class VerificationLedger:
+    """
+    SQLite record of the last verification of each blob, so --incremental
+    can skip blobs whose inputs have not changed since they last passed.
+    
+    Inputs are the blob's fingerprint (file size and mtime, or the patchbin.db
+    file_hash_sha224 and updated_time), the expected hashes and key from the
+    database, and for --full-check the SHA-224 of smw.sfc.
+    
+    The fingerprint reads no blob data, so a plain --incremental run misses
+    a blob rewritten in place with the same size and an mtime that was
+    preserved or set back (rsync -t, cp -p, a restored backup), and bit rot
+    on disk.  --rehash also compares the SHA-224 of the blob data with the
+    one recorded when it passed: every blob is read once, but nothing is
+    decrypted, decompressed or patched.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS verifications (
+            blob_name TEXT NOT NULL,
+            source TEXT NOT NULL,
+            file_size INTEGER,
+            file_stamp TEXT,
+            file_sha224 TEXT,
+            expected TEXT,
+            base_rom_sha224 TEXT,
+            full_check INTEGER,
+            verify_result INTEGER,
+            file_hash_valid INTEGER,
+            decode_success INTEGER,
+            patch_hash_valid INTEGER,
+            flips_test_success INTEGER,
+            result_hash_valid INTEGER,
+            passed INTEGER,
+            errors TEXT,
+            verified_time TEXT,
+            PRIMARY KEY (blob_name, source)
+        )
+    """
+    COMMIT_EVERY = 100
+    
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+        self.pending = 0
+    
+    @staticmethod
+    def expected(patchblob):
+        """Hashes the checks compare against (the key only as a digest)"""
+        key = patchblob.get('patchblob1_key') or ''
+        return json.dumps([patchblob.get('patchblob1_sha224'), patchblob.get('pat_sha224'),
+                           patchblob.get('result_sha224'), hashlib.sha224(key.encode('utf8')).hexdigest()])
+    
+    @staticmethod
+    def fingerprint(patchblob, patchbin_conn, verify_source):
+        """(size, stamp) of the blob's current data, or None when it is missing"""
+        blob_name = patchblob['patchblob1_name']
+        if verify_source == 'db':
+            row = patchbin_conn.execute(
+                "SELECT file_hash_sha224, updated_time, import_time FROM attachments WHERE file_name = ?",
+                (blob_name,)
+            ).fetchone()
+            if not row:
+                return None
+            return None, f"{row[0]}@{row[1] or row[2]}"
+        try:
+            st = os.stat(os.path.join(CONFIG['BLOBS_DIR'], blob_name))
+        except OSError:
+            return None
+        return st.st_size, str(st.st_mtime_ns)
+    
+    @staticmethod
+    def data_sha224(patchblob, patchbin_conn, verify_source):
+        """SHA-224 of the blob's current data (read in full), or None when it is missing"""
+        blob_name = patchblob['patchblob1_name']
+        h = hashlib.sha224()
+        if verify_source == 'db':
+            row = patchbin_conn.execute(
+                "SELECT file_data FROM attachments WHERE file_name = ?", (blob_name,)
+            ).fetchone()
+            if not row or row[0] is None:
+                return None
+            h.update(row[0])
+            return h.hexdigest()
+        try:
+            with open(os.path.join(CONFIG['BLOBS_DIR'], blob_name), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+        except OSError:
+            return None
+        return h.hexdigest()
+    
+    def is_current(self, patchblob, fingerprint, source, full_check, verify_result, base_rom_sha224,
+                   rehash=None):
+        """
+        True when the last verification passed every requested check with the
+        same inputs.  ``rehash()``, when given, returns the blob data's current
+        SHA-224, which must also match the recorded one.
+        """
+        if fingerprint is None:
+            return False
+        row = self.conn.execute(
+            "SELECT file_size, file_stamp, expected, base_rom_sha224, full_check, verify_result, passed, "
+            "file_sha224 FROM verifications WHERE blob_name = ? AND source = ?",
+            (patchblob['patchblob1_name'], source)
+        ).fetchone()
+        if not row or not row[6]:
+            return False
+        if (row[0], row[1]) != tuple(fingerprint) or row[2] != self.expected(patchblob):
+            return False
+        if full_check and not (row[4] and row[3] == base_rom_sha224):
+            return False
+        if verify_result and not row[5]:
+            return False
+        if rehash is not None and (not row[7] or rehash() != row[7]):
+            return False
+        return True
+    
+    def record(self, patchblob, fingerprint, source, result, full_check, verify_result, base_rom_sha224):
+        passed = not result['errors'] and result['patch_hash_valid']
+        if full_check:
+            passed = passed and result['flips_test_success']
+        size, stamp = fingerprint if fingerprint else (None, None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO verifications VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (patchblob['patchblob1_name'], source, size, stamp, result.get('file_sha224'),
+             self.expected(patchblob), base_rom_sha224 if full_check else None,
+             int(bool(full_check)), int(bool(verify_result)),
+             int(bool(result['file_hash_valid'])), int(bool(result['decode_success'])),
+             int(bool(result['patch_hash_valid'])), int(bool(result['flips_test_success'])),
+             None if result['result_hash_valid'] is None else int(bool(result['result_hash_valid'])),
+             int(bool(passed)), json.dumps(result['errors']), datetime.now().isoformat())
+        )
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.commit()
+    
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+    
+    def close(self):
+        self.commit()
+        self.conn.close()
+
 def verify_blob(patchblob, patchbin_conn, logger, full_check=False, verify_result=False, verify_source='files'):
     """Verify a single patchblob"""
     gameid = patchblob.get('gameid', 'N/A')
@@ -131,59 +300,65 @@ def verify_blob(patchblob, patchbin_conn, logger, full_check=False, verify_resul
                 result['errors'].append('Blob file not found on filesystem')
                 return result
             result['file_exists'] = True
-            
-            with open(blob_path, 'rb') as f:
-                file_data = f.read()
-        
-        # Check 2: File hash matches patchblob1_sha224
-        file_hash = hashlib.sha224(file_data).hexdigest()
         
-        if file_hash != patchblob['patchblob1_sha224']:
-            result['errors'].append(f"File hash mismatch: expected {patchblob['patchblob1_sha224']}, got {file_hash}")
-            return result
-        result['file_hash_valid'] = True
-        
-        # Check 3: Blob can be decoded
+        # Checks 2 and 3 in one streaming pass: the blob is hashed while it
+        # is decoded (blob files through mmap), and a blob whose hash is
+        # wrong is reported as a file hash mismatch, not a decode failure
+        decoded = {}
         try:
-            decoded_data = blob_crypto.decrypt_blob(
-                file_data,
-                patchblob['patchblob1_key'],
-                patchblob['patchblob1_sha224'],
-                patchblob.get('pat_sha224'),
-                detect_format=True
-            )
-            result['decode_success'] = True
+            if file_data is None:
+                decoded_data = blob_crypto.decode_blob_file(
+                    blob_path,
+                    patchblob['patchblob1_key'],
+                    patchblob['patchblob1_sha224'],
+                    patchblob.get('pat_sha224'),
+                    detect_format=True,
+                    info=decoded
+                )
+            else:
+                decoded_data = blob_crypto.decode_blob(
+                    file_data,
+                    patchblob['patchblob1_key'],
+                    patchblob['patchblob1_sha224'],
+                    patchblob.get('pat_sha224'),
+                    detect_format=True,
+                    info=decoded
+                )
+        except blob_crypto.BlobHashError:
+            # Check 2: File hash matches patchblob1_sha224
+            result['file_sha224'] = decoded['blob_sha224']
+            result['errors'].append(f"File hash mismatch: expected {patchblob['patchblob1_sha224']}, got {decoded['blob_sha224']}")
+            return result
         except Exception as e:
+            # Check 3: Blob can be decoded
+            result['file_sha224'] = decoded.get('blob_sha224')
+            result['file_hash_valid'] = True
             result['errors'].append(f"Decode failed: {e}")
             return result
+        result['file_sha224'] = decoded['blob_sha224']
+        result['file_hash_valid'] = True
+        result['decode_success'] = True
         
         # Check 4: Decoded hash matches
-        decoded_hash = hashlib.sha224(decoded_data).hexdigest()
+        decoded_hash = decoded['pat_sha224']
         
         if decoded_hash != patchblob['pat_sha224']:
             result['errors'].append(f"Patch hash mismatch: expected {patchblob['pat_sha224']}, got {decoded_hash}")
             return result
         result['patch_hash_valid'] = True
         
-        # Check 5: Full check with flips (optional)
-        if full_check and CONFIG['FLIPS_PATH'] and CONFIG['BASE_ROM_PATH']:
+        # Check 5: Full check - apply the patch (optional)
+        if full_check and CONFIG['BASE_ROM_PATH']:
             try:
-                temp_patch = os.path.join(CONFIG['TEMP_DIR'], f"verify_{blob_name}.patch")
-                temp_rom = os.path.join(CONFIG['TEMP_DIR'], f"verify_{blob_name}.sfc")
-                
-                with open(temp_patch, 'wb') as f:
-                    f.write(decoded_data)
-                
-                flips_cmd = [CONFIG['FLIPS_PATH'], '--apply', temp_patch, CONFIG['BASE_ROM_PATH'], temp_rom]
-                subprocess.run(flips_cmd, check=True, capture_output=True)
+                if CONFIG['BASE_ROM'] is None:
+                    with open(CONFIG['BASE_ROM_PATH'], 'rb') as f:
+                        CONFIG['BASE_ROM'] = f.read()
+                result_data = rhpatch.apply_patch(decoded_data, CONFIG['BASE_ROM'], CONFIG['FLIPS_PATH'])
                 
                 result['flips_test_success'] = True
                 
                 # Check result hash if requested
-                if verify_result and patchblob.get('result_sha224') and os.path.exists(temp_rom):
-                    with open(temp_rom, 'rb') as f:
-                        result_data = f.read()
-                    
+                if verify_result and patchblob.get('result_sha224'):
                     result_hash = hashlib.sha224(result_data).hexdigest()
                     
                     if result_hash == patchblob['result_sha224']:
@@ -195,22 +370,77 @@ def verify_blob(patchblob, patchbin_conn, logger, full_check=False, verify_resul
                     # No expected hash to verify against
                     result['result_hash_valid'] = None
                 
-                # Clean up
-                if os.path.exists(temp_patch):
-                    os.remove(temp_patch)
-                if os.path.exists(temp_rom):
-                    os.remove(temp_rom)
-                
-            except subprocess.CalledProcessError as e:
-                result['errors'].append(f"Flips test failed: exit code {e.returncode}")
             except Exception as e:
-                result['errors'].append(f"Flips test failed: {e}")
+                result['errors'].append(f"Patch test failed: {e}")
         
     except Exception as e:
         result['errors'].append(f"Unexpected error: {e}")
     
     return result
 
+_worker_conn = None
+
+def _init_worker(config):
+    """ProcessPoolExecutor initializer: copy CONFIG, open this worker's own patchbin.db"""
+    global _worker_conn
+    # Ctrl-C is handled by the parent, which cancels outstanding work
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    CONFIG.update(config)
+    if CONFIG['VERIFY_SOURCE'] == 'db':
+        _worker_conn = sqlite3.connect(CONFIG['PATCHBIN_DB_PATH'])
+
+def _verify_chunk(chunk):
+    return [verify_blob(pb, _worker_conn, None, CONFIG['FULL_CHECK'], CONFIG['VERIFY_RESULT'], CONFIG['VERIFY_SOURCE'])
+            for pb in chunk]
+
+def iter_results(patchblobs, patchbin_conn, jobs=1, chunk_size=8):
+    """
+    Yield (patchblob, result) in patchblobs order.  With jobs > 1 the work
+    goes to a process pool in chunks of chunk_size, at most 2 * jobs chunks
+    in flight; results are still yielded in order as their chunk completes.
+    """
+    if jobs <= 1:
+        for pb in patchblobs:
+            yield pb, verify_blob(pb, patchbin_conn, None, CONFIG['FULL_CHECK'], CONFIG['VERIFY_RESULT'], CONFIG['VERIFY_SOURCE'])
+        return
+    config = dict(CONFIG)
+    config['BASE_ROM'] = None  # each worker reads smw.sfc once
+    chunks = [patchblobs[i:i + chunk_size] for i in range(0, len(patchblobs), chunk_size)]
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(config,))
+    pending = collections.deque()
+    next_chunk = 0
+    try:
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < 2 * jobs:
+                pending.append((chunks[next_chunk], executor.submit(_verify_chunk, chunks[next_chunk])))
+                next_chunk += 1
+            chunk, future = pending.popleft()
+            for pb, result in zip(chunk, future.result()):
+                yield pb, result
+    finally:
+        # Normal end, Ctrl-C or the caller stopping early: drop queued chunks
+        executor.shutdown(wait=False, cancel_futures=True)
+
+class Progress:
+    """Progress and throughput line, logged at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, logger, total):
+        self.logger = logger
+        self.total = total
+        self.started = time.time()
+        self.last = self.started
+
+    def update(self, done, force=False):
+        now = time.time()
+        if not force and now - self.last < PROGRESS_INTERVAL:
+            return
+        self.last = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = done / elapsed
+        eta = (self.total - done) / rate if rate > 0 else 0
+        self.logger.log(f"  ... {done}/{self.total} verified, {rate:.1f} blobs/s, "
+                        f"elapsed {elapsed:.0f}s, ETA {eta:.0f}s")
+
 def get_patchblobs_from_sqlite(gameid=None, file_name=None, newer_than=None):
     """Get patchblobs from SQLite database"""
     conn = sqlite3.connect(CONFIG['DB_PATH'])
@@ -289,7 +519,7 @@ def get_patchblobs_from_rhmd(gameid=None, file_name=None, newer_than=None):
     try:
         import loadsmwrh
         
-        hacklist = loadsmwrh.get_hacklist_data()
+        hacklist = loadsmwrh.get_hacklist_data(readonly=True)
         patchblobs = []
         
         for hack in hacklist:
@@ -419,11 +649,17 @@ def main():
     parser.add_argument('--verify-blobs', choices=['db', 'files'], default='files', help='Blob source: db or files')
     parser.add_argument('--gameid', help='Verify specific game ID only')
     parser.add_argument('--file-name', help='Verify specific blob file only')
-    parser.add_argument('--full-check', action='store_true', help='Test with flips (slow)')
+    parser.add_argument('--full-check', action='store_true', help='Apply each patch to smw.sfc')
     parser.add_argument('--verify-result', action='store_true', help='Verify result hash (requires --full-check)')
     parser.add_argument('--newer-than', help='Only verify blobs newer than timestamp or blob file_name')
     parser.add_argument('--log-file', default='verification_results_py.log', help='Log file path')
     parser.add_argument('--failed-file', default='failed_blobs_py.json', help='Failed items file')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=8, help='Blobs per worker task (with --jobs)')
+    parser.add_argument('--ledger', default='verification_ledger.db', help='Verification ledger (SQLite), empty to disable')
+    parser.add_argument('--incremental', action='store_true', help='Skip blobs unchanged since they last passed (uses the ledger)')
+    parser.add_argument('--rehash', action='store_true',
+                        help='With --incremental, re-hash blobs and compare with the ledger instead of trusting size/mtime')
     
     args = parser.parse_args()
     
@@ -436,6 +672,19 @@ def main():
     CONFIG['NEWER_THAN'] = args.newer_than
     CONFIG['LOG_FILE'] = args.log_file
     CONFIG['FAILED_FILE'] = args.failed_file
+    CONFIG['JOBS'] = max(1, args.jobs)
+    CONFIG['CHUNK_SIZE'] = max(1, args.chunk_size)
+    CONFIG['LEDGER'] = args.ledger
+    CONFIG['INCREMENTAL'] = args.incremental
+    CONFIG['REHASH'] = args.rehash
+    
+    if CONFIG['INCREMENTAL'] and not CONFIG['LEDGER']:
+        print('Error: --incremental requires --ledger')
+        sys.exit(2)
+    
+    if CONFIG['REHASH'] and not CONFIG['INCREMENTAL']:
+        print('Error: --rehash requires --incremental')
+        sys.exit(2)
     
     # Verify-result requires full-check
     if CONFIG['VERIFY_RESULT'] and not CONFIG['FULL_CHECK']:
@@ -446,33 +695,30 @@ def main():
     print('BLOB VERIFICATION UTILITY (Python)')
     print('=' * 70)
     print(f"Database type: {CONFIG['DBTYPE']}")
-    print(f"Verification source: {'patchbin.db file_data' if CONFIG['VERIFY_SOURCE'] == 'db' else 'blob files'}\n")
+    print(f"Verification source: {'patchbin.db file_data' if CONFIG['VERIFY_SOURCE'] == 'db' else 'blob files'}")
+    print(f"Worker processes: {CONFIG['JOBS']}\n")
     
     if CONFIG['FULL_CHECK']:
-        print('⚠️  FULL CHECK MODE - Will test patches with flips (SLOW)')
+        print('⚠️  FULL CHECK MODE - Will apply every patch to smw.sfc')
         if CONFIG['VERIFY_RESULT']:
             print('⚠️  VERIFY RESULT MODE - Will verify result_sha224 hash\n')
         else:
             print()
         
-        # Find flips and base ROM
+        # Find base ROM (flips is optional, used only for patches rhpatch rejects)
         try:
-            # Try to find flips
-            for flips_path in ['/usr/local/bin/flips', './flips', 'flips']:
-                if os.path.exists(flips_path) or subprocess.run(['which', 'flips'], capture_output=True).returncode == 0:
-                    CONFIG['FLIPS_PATH'] = flips_path
-                    break
+            CONFIG['FLIPS_PATH'] = rhpatch.find_flips()
             
             # Find base ROM
             if os.path.exists('smw.sfc'):
                 CONFIG['BASE_ROM_PATH'] = 'smw.sfc'
             
-            if CONFIG['FLIPS_PATH'] and CONFIG['BASE_ROM_PATH']:
-                print(f"✓ Flips: {CONFIG['FLIPS_PATH']}")
+            if CONFIG['BASE_ROM_PATH']:
+                print(f"✓ Patcher: rhpatch (flips fallback: {CONFIG['FLIPS_PATH'] or 'none'})")
                 print(f"✓ Base ROM: {CONFIG['BASE_ROM_PATH']}\n")
             else:
-                print('✗ Cannot run full check: flips or smw.sfc not found')
-                print('Continuing without flips verification...\n')
+                print('✗ Cannot run full check: smw.sfc not found')
+                print('Continuing without patch verification...\n')
                 CONFIG['FULL_CHECK'] = False
                 
         except Exception as e:
@@ -489,6 +735,8 @@ def main():
     if CONFIG['VERIFY_SOURCE'] == 'db':
         patchbin_conn = sqlite3.connect(CONFIG['PATCHBIN_DB_PATH'])
     
+    ledger = None
+    
     try:
         # Get patchblobs from appropriate source
         if CONFIG['DBTYPE'] == 'sqlite':
@@ -496,55 +744,100 @@ def main():
         else:  # rhmd
             patchblobs = get_patchblobs_from_rhmd(CONFIG['GAMEID'], CONFIG['FILE_NAME'], CONFIG['NEWER_THAN'])
         
+        base_rom_sha224 = None
+        if CONFIG['FULL_CHECK']:
+            base_rom_sha224 = rhhash.file_sha224(CONFIG['BASE_ROM_PATH'])
+        
+        # Fingerprints are taken before verifying, so a blob changed during
+        # the run is verified again next time
+        fingerprints = {}
+        skipped = 0
+        if CONFIG['LEDGER']:
+            ledger = VerificationLedger(CONFIG['LEDGER'])
+            for pb in patchblobs:
+                fingerprints[pb['patchblob1_name']] = VerificationLedger.fingerprint(pb, patchbin_conn, CONFIG['VERIFY_SOURCE'])
+            if CONFIG['INCREMENTAL']:
+                found = len(patchblobs)
+                def rehash(pb):
+                    if not CONFIG['REHASH']:
+                        return None
+                    return lambda: VerificationLedger.data_sha224(pb, patchbin_conn, CONFIG['VERIFY_SOURCE'])
+                patchblobs = [pb for pb in patchblobs
+                              if not ledger.is_current(pb, fingerprints[pb['patchblob1_name']], CONFIG['VERIFY_SOURCE'],
+                                                       CONFIG['FULL_CHECK'], CONFIG['VERIFY_RESULT'], base_rom_sha224,
+                                                       rehash(pb))]
+                skipped = found - len(patchblobs)
+                logger.log(f"\nIncremental: {skipped} of {found} patchblobs unchanged since they last passed "
+                           f"({CONFIG['LEDGER']}{', re-hashed' if CONFIG['REHASH'] else ''})")
+        
         logger.log(f"\nFound {len(patchblobs)} patchblobs to verify\n")
         logger.log('=' * 70)
         
         verified = 0
         failed = 0
         failures = []
+        checked = 0
+        interrupted = False
+        progress = Progress(logger, len(patchblobs))
         
-        for i, pb in enumerate(patchblobs):
-            progress = f"[{i + 1}/{len(patchblobs)}]"
-            logger.log(f"\n{progress} Game {pb.get('gameid', 'N/A')}: {pb['patchblob1_name']}")
-            
-            result = verify_blob(pb, patchbin_conn, logger, CONFIG['FULL_CHECK'], CONFIG['VERIFY_RESULT'], CONFIG['VERIFY_SOURCE'])
-            
-            if not result['errors'] and result['patch_hash_valid']:
-                status_msg = '  ✅ VALID'
-                if CONFIG['FULL_CHECK'] and result['flips_test_success']:
-                    status_msg += ' (flips test passed'
-                    if CONFIG['VERIFY_RESULT'] and result['result_hash_valid']:
-                        status_msg += ', result hash verified'
-                    status_msg += ')'
-                logger.log(status_msg)
-                verified += 1
-            else:
-                logger.log(f"  ❌ FAILED:")
-                for err in result['errors']:
-                    logger.log(f"     - {err}")
-                failed += 1
-                failures.append(result)
+        try:
+            for pb, result in iter_results(patchblobs, patchbin_conn, CONFIG['JOBS'], CONFIG['CHUNK_SIZE']):
+                checked += 1
+                if ledger:
+                    ledger.record(pb, fingerprints.get(pb['patchblob1_name']), CONFIG['VERIFY_SOURCE'], result,
+                                  CONFIG['FULL_CHECK'], CONFIG['VERIFY_RESULT'], base_rom_sha224)
+                logger.log(f"\n[{checked}/{len(patchblobs)}] Game {pb.get('gameid', 'N/A')}: {pb['patchblob1_name']}")
+                
+                if not result['errors'] and result['patch_hash_valid']:
+                    status_msg = '  ✅ VALID'
+                    if CONFIG['FULL_CHECK'] and result['flips_test_success']:
+                        status_msg += ' (patch test passed'
+                        if CONFIG['VERIFY_RESULT'] and result['result_hash_valid']:
+                            status_msg += ', result hash verified'
+                        status_msg += ')'
+                    logger.log(status_msg)
+                    verified += 1
+                else:
+                    logger.log(f"  ❌ FAILED:")
+                    for err in result['errors']:
+                        logger.log(f"     - {err}")
+                    failed += 1
+                    failures.append(result)
+                progress.update(checked)
+        except KeyboardInterrupt:
+            interrupted = True
+            logger.log(f"\n⚠️  Interrupted after {checked} of {len(patchblobs)} blobs")
+        progress.update(checked, force=True)
+        if ledger:
+            ledger.close()
+            ledger = None
         
         logger.log('\n' + '=' * 70)
-        logger.log('VERIFICATION SUMMARY')
+        logger.log('VERIFICATION SUMMARY' + (' (INTERRUPTED)' if interrupted else ''))
         logger.log('=' * 70)
-        logger.log(f"Total blobs:    {len(patchblobs)}")
+        logger.log(f"Total blobs:    {len(patchblobs) + skipped}")
+        if skipped:
+            logger.log(f"⏭️  Unchanged:    {skipped} (skipped, --incremental)")
+        if interrupted:
+            logger.log(f"Checked:        {checked}")
         logger.log(f"✅ Valid:        {verified}")
         logger.log(f"❌ Failed:       {failed}")
         logger.log('=' * 70)
         
-        # Save failures
-        if failures:
+        # Save failures (partial results too when interrupted)
+        if failures or interrupted:
             failed_data = {
                 'timestamp': datetime.now().isoformat(),
                 'dbtype': CONFIG['DBTYPE'],
-                'total_checked': len(patchblobs),
+                'total_checked': checked,
                 'failed_count': failed,
+                'interrupted': interrupted,
                 'failures': failures
             }
             
-            with open(CONFIG['FAILED_FILE'], 'w') as f:
+            with open(CONFIG['FAILED_FILE'] + '.new', 'w') as f:
                 json.dump(failed_data, f, indent=2)
+            os.replace(CONFIG['FAILED_FILE'] + '.new', CONFIG['FAILED_FILE'])
             
             logger.log(f"\n❌ Failed blobs saved to: {CONFIG['FAILED_FILE']}")
         
@@ -552,6 +845,8 @@ def main():
             patchbin_conn.close()
         
         logger.close()
+        if interrupted:
+            sys.exit(130)
         sys.exit(1 if failed > 0 else 0)
         
     except Exception as e:
@@ -559,6 +854,8 @@ def main():
         import traceback
         logger.log(traceback.format_exc())
         
+        if ledger:
+            ledger.close()
         if patchbin_conn:
             patchbin_conn.close()
         